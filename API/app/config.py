@@ -18,13 +18,27 @@ class Settings(BaseSettings):
     OPENSEARCH_PIPELINE: str # optional ingest pipeline for embeddings
     OPENSEARCH_MAX_CHARS: int # Titan v2 ~8k tokens ≈50k chars per chunk
     OPENSEARCH_REGION: str
+    OPENSEARCH_PORT: int = 443
     OPENSEARCH_TIMEOUT: int = 180
+    # Shared client pools (app/services/os_client.py)
+    OPENSEARCH_SEARCH_TIMEOUT: int = 120
+    OPENSEARCH_SEARCH_MAX_RETRIES: int = 2
+    OPENSEARCH_POOL_MAXSIZE: int = 25
+    OPENSEARCH_BULK_POOL_MAXSIZE: int = 8
+    OPENSEARCH_QUERY_TIMEOUT: float = 120.0  # per-call budget for async searches (seconds); same as the old search timeout, lower via env
+    # Hybrid (BM25 + neural kNN) retrieval: vector field written by OPENSEARCH_PIPELINE + its ML model id
+    OPENSEARCH_VECTOR_FIELD: str = "embedding"
+    OPENSEARCH_EMBED_MODEL_ID: str = ""
     # Optional tuning knobs (ingest/search)
     OPENSEARCH_REQUEST_TIMEOUT: int = 300
     OPENSEARCH_CLIENT_TIMEOUT: int = 300
     OPENSEARCH_CHUNK_SIZE: int = 10
     OPENSEARCH_MAX_RETRIES: int = 5
     OPENSEARCH_MAX_CHUNK_BYTES: int = 1_000_000  # ~1 MB per bulk request
+    # Policy chunking (app/services/chunker.py): 조/항/호 경계 기준, 토큰 목표 + 겹침
+    POLICY_CHUNK_TARGET_TOKENS: int = 450
+    POLICY_CHUNK_MAX_TOKENS: int = 800
+    POLICY_CHUNK_OVERLAP_TOKENS: int = 60
 
     #왓슨 Setting값
     WATSONX_API_KEY: str
@@ -38,6 +52,9 @@ class Settings(BaseSettings):
     NON_BENEFIT_IMPORT_MODE: Literal["replace", "upsert"] = Field(default="replace")
     NON_BENEFIT_SKIP_IF_EXISTS: bool = Field(default=True)
 
+    # 유료 LLM을 호출하는 디버그 엔드포인트(/debug/rag-ab, /debug/ocr-bench) 허용 여부 (운영 기본 off)
+    DEBUG_PAID_ENDPOINTS: bool = Field(default=False)
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 settings = Settings()
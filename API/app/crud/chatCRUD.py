@@ -58,7 +58,7 @@ async def get_chat_list(db: AsyncSession, user_id: int):
 # SELECT id, role, content, created_at FROM messages WHERE chat_id = '123' ORDER BY created_at ASC;
 async def get_messages(db:AsyncSession, chat_id: int):
     result = await db.execute(
-        select(chatModel.Message).where(chatModel.Message.chat_id == chat_id).order_by(chatModel.Message.created_at.asc())
+        select(chatModel.Message).where(chatModel.Message.chat_id == chat_id).order_by(chatModel.Message.created_at.asc(), chatModel.Message.id.asc())
     )
     return result.scalars().all()
 
@@ -70,7 +70,7 @@ async def get_last_user_message(db: AsyncSession, chat_id: int):
             chatModel.Message.chat_id == chat_id,
             chatModel.Message.role == "user",
         )
-        .order_by(chatModel.Message.created_at.desc())
+        .order_by(chatModel.Message.created_at.desc(), chatModel.Message.id.desc())
     )
     return result.scalars().first()
 
@@ -0,0 +1,142 @@
+from sqlalchemy import update
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional
+import datetime
+import logging
+
+from app.models import chatModel
+from app.crud import chatCRUD
+
+logger = logging.getLogger(__name__)
+
+
+class ChatTurnRepository:
+    """
+    채팅 1턴(user 질문 + assistant 응답)의 DB 쓰기를 한 단위로 묶음.
+      - start(): chat(필요 시 생성) + user/assistant 메시지를 한 번에 저장 → 커밋 1회
+      - load(): 백그라운드에서 message id로 chat/메시지를 한 번만 로드 (조회 후 트랜잭션 종료)
+      - set_type()/complete(): 메모리에서만 변경
+      - flush(db): 턴 종료 시 커밋 1회
+    "마지막 메시지"를 매번 다시 조회하지 않고 id를 명시적으로 넘긴다.
+    백그라운드 턴은 load/flush를 각각 짧은 세션에서 호출한다 → LLM 호출 동안 커넥션을 잡고 있지 않음
+    (expire_on_commit=False라 세션이 닫혀도 로드한 값과 메모리 변경은 그대로 유지되고, flush에서 다시 붙여 저장).
+    """
+
+    def __init__(self, db: Optional[AsyncSession], chat: Optional[chatModel.Chat],
+                 user_message: Optional[chatModel.Message], assistant_message: chatModel.Message):
+        self.db = db
+        self.chat = chat
+        self.user_message = user_message
+        self.assistant_message = assistant_message
+        # start()에서 조회한 직전 assistant의 attached_policy_id (로그용)
+        self.attached_policy_id: Optional[str] = None
+
+    @property
+    def chat_id(self) -> int:
+        return self.assistant_message.chat_id
+
+    @property
+    def user_message_id(self) -> Optional[int]:
+        return self.user_message.id if self.user_message is not None else None
+
+    @property
+    def assistant_message_id(self) -> int:
+        return self.assistant_message.id
+
+    @property
+    def effective_policy_id(self) -> Optional[str]:
+        return self.assistant_message.attached_policy_id
+
+    # ================ CREATE ================
+    @classmethod
+    async def start(cls, db: AsyncSession, *, user_id: int, chat_id: Optional[int], text: str,
+                    product_id: Optional[str] = None) -> "ChatTurnRepository":
+        chat = None
+        if not chat_id:
+            now = datetime.datetime.now()
+            chat = chatModel.Chat(user_id=user_id, title=text[:30], type=[], created_at=now, updated_at=now)
+            db.add(chat)
+            await db.flush()  # chat.id 확보 (커밋은 아래에서 1회)
+            chat_id = chat.id
+            attached_policy_id = None
+        else:
+            attached_policy_id = await chatCRUD.get_attached_policy_id(db, chat_id)
+
+        effective_policy_id = attached_policy_id if attached_policy_id is not None else product_id
+        now = datetime.datetime.now()
+        user_message = chatModel.Message(
+            chat_id=chat_id, role="user", content=text, type="general", state="done",
+            attached_policy_id=effective_policy_id, created_at=now,
+        )
+        # 같은 시각이면 created_at 정렬에서 답변이 질문보다 앞설 수 있어 1µs 뒤로
+        assistant_message = chatModel.Message(
+            chat_id=chat_id, role="assistant", content="", type="", state="commencing",
+            attached_policy_id=effective_policy_id, created_at=now + datetime.timedelta(microseconds=1),
+        )
+        db.add_all([user_message, assistant_message])
+        await db.commit()
+        turn = cls(db, chat, user_message, assistant_message)
+        turn.attached_policy_id = attached_policy_id
+        return turn
+
+    # ================ RETREIVE ================
+    @classmethod
+    async def load(cls, db: AsyncSession, *, chat_id: int, user_message_id: Optional[int] = None,
+                   assistant_message_id: Optional[int] = None) -> "ChatTurnRepository":
+        chat = await chatCRUD.get_chat(db, chat_id)
+        if assistant_message_id is None:
+            # (하위호환) id 없이 호출되면 마지막 메시지 기준
+            assistant = await chatCRUD.get_last_assistant_message(db, chat_id)
+            user_msg = await chatCRUD.get_last_user_message(db, chat_id)
+        else:
+            ids = [i for i in (user_message_id, assistant_message_id) if i is not None]
+            result = await db.execute(select(chatModel.Message).where(chatModel.Message.id.in_(ids)))
+            rows = {m.id: m for m in result.scalars().all()}
+            assistant = rows.get(assistant_message_id)
+            user_msg = rows.get(user_message_id) if user_message_id is not None else None
+        if assistant is None:
+            raise LookupError(f"assistant message not found (chat={chat_id}, id={assistant_message_id})")
+        # 읽기 트랜잭션을 바로 끝냄 (idle in transaction 방지). 이후 변경은 flush(db)에서 저장
+        await db.commit()
+        return cls(None, chat, user_msg, assistant)
+
+    # ================ UPDATE (메모리) ================
+    def set_type(self, message_type: str) -> None:
+        """assistant/user 메시지 type + chat.type 목록(중복 없이) 갱신"""
+        self.assistant_message.type = message_type
+        if self.user_message is not None:
+            self.user_message.type = message_type
+        if self.chat is not None and message_type:
+            current = list(self.chat.type or [])
+            if message_type not in current:
+                current.append(message_type)
+                self.chat.type = current
+
+    def complete(self, content: str, state: str = "done") -> None:
+        self.assistant_message.content = content
+        self.assistant_message.state = state
+
+    def _objects(self) -> List[Any]:
+        return [o for o in (self.chat, self.user_message, self.assistant_message) if o is not None]
+
+    async def flush(self, db: Optional[AsyncSession] = None) -> None:
+        """메모리 변경분을 커밋. db를 넘기면(load로 만든 턴) 그 세션에 다시 붙여 저장."""
+        if db is not None:
+            db.add_all(self._objects())
+            self.db = db
+        await self.db.commit()
+        logger.info("[STATE] chat=%s msg=%s -> %s", self.chat_id, self.assistant_message_id,
+                    self.assistant_message.state)
+
+    async def fail(self, db: Optional[AsyncSession] = None) -> None:
+        """오류 시: 세션을 되돌린 뒤 assistant 메시지 state만 failed로 저장"""
+        msg_id, chat_id = self.assistant_message_id, self.chat_id
+        if db is None:
+            db = self.db
+            await db.rollback()
+        await db.execute(
+            update(chatModel.Message).where(chatModel.Message.id == msg_id).values(state="failed")
+        )
+        await db.commit()
+        logger.info("[STATE] chat=%s msg=%s -> failed", chat_id, msg_id)
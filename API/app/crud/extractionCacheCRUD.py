@@ -0,0 +1,68 @@
+# app/crud/extractionCacheCRUD.py
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.extractionCacheModel import ExtractionCache
+
+
+# 키 목록으로 캐시 조회 + LRU 갱신(last_used_at/hit_count)
+async def get_many(db: AsyncSession, keys: List[str]) -> Dict[str, str]:
+    if not keys:
+        return {}
+    res = await db.execute(
+        select(ExtractionCache.cache_key, ExtractionCache.output)
+        .where(ExtractionCache.cache_key.in_(keys))
+    )
+    found = {k: v for k, v in res.all()}
+    if found:
+        await db.execute(
+            update(ExtractionCache)
+            .where(ExtractionCache.cache_key.in_(list(found.keys())))
+            .values(last_used_at=datetime.utcnow(), hit_count=ExtractionCache.hit_count + 1)
+        )
+        await db.commit()
+    return found
+
+
+# 새 결과 upsert (같은 키면 출력/사용시각만 갱신)
+async def put_many(db: AsyncSession, rows: List[Dict]) -> int:
+    if not rows:
+        return 0
+    now = datetime.utcnow()
+    for r in rows:
+        stmt = insert(ExtractionCache).values(
+            cache_key=r["cache_key"],
+            kind=r["kind"],
+            model_id=r["model_id"],
+            prompt_version=r["prompt_version"],
+            output=r["output"],
+            hit_count=0,
+            created_at=now,
+            last_used_at=now,
+        ).on_conflict_do_update(
+            index_elements=[ExtractionCache.cache_key],
+            set_={"output": r["output"], "last_used_at": now},
+        )
+        await db.execute(stmt)
+    await db.commit()
+    return len(rows)
+
+
+# LRU 정리: 가장 오래 안 쓰인 행부터 max_rows 초과분 삭제
+async def evict_lru(db: AsyncSession, max_rows: int) -> int:
+    total = (await db.execute(select(func.count()).select_from(ExtractionCache))).scalar() or 0
+    excess = int(total) - int(max_rows)
+    if excess <= 0:
+        return 0
+    victims = (
+        select(ExtractionCache.cache_key)
+        .order_by(ExtractionCache.last_used_at.asc())
+        .limit(excess)
+    )
+    await db.execute(delete(ExtractionCache).where(ExtractionCache.cache_key.in_(victims.scalar_subquery())))
+    await db.commit()
+    return excess
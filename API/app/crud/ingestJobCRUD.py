@@ -0,0 +1,180 @@
+# app/crud/ingestJobCRUD.py
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.ingestJobModel import IngestJob
+
+
+# 작업 등록 (원본 파일은 DB에 보관 → 어느 워커 프로세스든 처리 가능)
+async def create_job(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    kind: str,
+    filename: Optional[str],
+    mime: Optional[str],
+    data: bytes,
+    meta: Dict[str, Any],
+    max_attempts: int = 3,
+) -> IngestJob:
+    job = IngestJob(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        kind=kind,
+        status="queued",
+        filename=filename,
+        mime=mime,
+        meta=meta,
+        file_data=data,
+        max_attempts=max_attempts,
+    )
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def get_job(db: AsyncSession, job_id: str) -> Optional[IngestJob]:
+    return (await db.execute(select(IngestJob).where(IngestJob.id == job_id))).scalar_one_or_none()
+
+
+async def list_for_user(db: AsyncSession, user_id: int, limit: int = 20) -> List[IngestJob]:
+    res = await db.execute(
+        select(IngestJob)
+        .where(IngestJob.user_id == user_id)
+        .order_by(IngestJob.created_at.desc())
+        .limit(limit)
+    )
+    return list(res.scalars().all())
+
+
+async def get_file(db: AsyncSession, job_id: str) -> Optional[bytes]:
+    return (await db.execute(select(IngestJob.file_data).where(IngestJob.id == job_id))).scalar_one_or_none()
+
+
+# 다음 작업 하나를 가져와 running으로 표시
+# - SKIP LOCKED: 여러 워커/프로세스가 같은 행을 잡지 않음
+# - 사용자별 동시 실행 상한(user_limit)을 넘긴 사용자의 작업은 건너뜀
+#   (busy_users는 1차 거름망일 뿐 — 같은 사용자의 다른 행을 두 워커가 동시에 잡을 수 있으므로
+#    pg_advisory_xact_lock(user_id)로 사용자 단위 직렬화 후 running 수를 다시 세고 나서 running으로 바꿈)
+# - 시도 횟수를 다 쓴 작업은 가져오지 않음
+async def claim_next(db: AsyncSession, user_limit: int, max_tries: int = 5) -> Optional[IngestJob]:
+    skip_users: List[int] = []
+    for _ in range(max_tries):
+        now = datetime.utcnow()
+        busy_users = (
+            select(IngestJob.user_id)
+            .where(IngestJob.status == "running")
+            .group_by(IngestJob.user_id)
+            .having(func.count() >= user_limit)
+        )
+        q = (
+            select(IngestJob)
+            .where(
+                IngestJob.status == "queued",
+                IngestJob.run_after <= now,
+                IngestJob.attempts < IngestJob.max_attempts,
+                IngestJob.user_id.not_in(busy_users),
+            )
+            .order_by(IngestJob.created_at.asc())
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        if skip_users:
+            q = q.where(IngestJob.user_id.not_in(skip_users))
+        job = (await db.execute(q)).scalar_one_or_none()
+        if job is None:
+            await db.rollback()
+            return None
+
+        # 사용자 단위 잠금 (트랜잭션 종료 시 자동 해제) → 잠근 뒤 새 스냅샷으로 다시 셈
+        await db.execute(select(func.pg_advisory_xact_lock(job.user_id)))
+        running = (await db.execute(
+            select(func.count())
+            .select_from(IngestJob)
+            .where(IngestJob.user_id == job.user_id, IngestJob.status == "running")
+        )).scalar_one()
+        if running >= user_limit:
+            await db.rollback()
+            skip_users.append(job.user_id)
+            continue
+
+        job.status = "running"
+        job.attempts = (job.attempts or 0) + 1
+        job.error = None
+        job.started_at = now
+        job.heartbeat_at = now
+        await db.commit()
+        return job
+    return None
+
+
+# 진행 상황 갱신 (하트비트 겸용)
+async def update_progress(db: AsyncSession, job_id: str, **fields: Any) -> None:
+    await db.execute(
+        update(IngestJob)
+        .where(IngestJob.id == job_id)
+        .values(**fields, heartbeat_at=datetime.utcnow())
+    )
+    await db.commit()
+
+
+async def finish_job(db: AsyncSession, job_id: str, result: Dict[str, Any]) -> None:
+    await db.execute(
+        update(IngestJob)
+        .where(IngestJob.id == job_id)
+        .values(status="done", stage=None, result=result, file_data=None, finished_at=datetime.utcnow())
+    )
+    await db.commit()
+
+
+# 실패 처리: 남은 시도 횟수가 있으면 retry_delay 뒤 다시 대기열로, 아니면 failed
+async def fail_job(db: AsyncSession, job_id: str, error: str, retry_delay: float) -> str:
+    job = await get_job(db, job_id)
+    if job is None:
+        return "missing"
+    now = datetime.utcnow()
+    if job.attempts < job.max_attempts:
+        job.status = "queued"
+        job.run_after = now + timedelta(seconds=retry_delay)
+    else:
+        job.status = "failed"
+        job.file_data = None
+        job.finished_at = now
+    job.error = (error or "")[:2000]
+    await db.commit()
+    return job.status
+
+
+# 하트비트가 끊긴 running 작업(워커 프로세스 종료 등)을 다시 대기열로
+# 시도 횟수를 다 쓴 작업은 failed로 (워커를 죽이는 작업이 무한히 재시도되지 않도록)
+# 반환: (다시 대기열로 보낸 수, failed 처리한 수)
+async def requeue_stale(db: AsyncSession, stale_seconds: float) -> Tuple[int, int]:
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=stale_seconds)
+    stale = (IngestJob.status == "running", IngestJob.heartbeat_at < cutoff)
+    failed = await db.execute(
+        update(IngestJob)
+        .where(*stale, IngestJob.attempts >= IngestJob.max_attempts)
+        .values(status="failed", file_data=None, finished_at=now, error="worker heartbeat lost (max attempts reached)")
+    )
+    requeued = await db.execute(
+        update(IngestJob)
+        .where(*stale, IngestJob.attempts < IngestJob.max_attempts)
+        .values(status="queued", run_after=now, error="worker heartbeat lost")
+    )
+    await db.commit()
+    return requeued.rowcount or 0, failed.rowcount or 0
+
+
+# 종료(취소)로 중단된 작업은 시도 횟수를 되돌리고 바로 대기열로
+async def release_job(db: AsyncSession, job_id: str) -> None:
+    await db.execute(
+        update(IngestJob)
+        .where(IngestJob.id == job_id, IngestJob.status == "running")
+        .values(status="queued", attempts=IngestJob.attempts - 1, run_after=datetime.utcnow())
+    )
+    await db.commit()
@@ -1,3 +1,4 @@
+import asyncio
 import os
 import uvicorn
 from datetime import date
@@ -7,7 +8,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.logging_conf import setup_logging
 from app.database import Base, engine, AsyncSessionLocal
 from app.services.non_benefit_seed import maybe_seed_on_start
-from app.routers import user, policy, claim, chat, document, test, non_benefit, ocr, sync
+from app.services.os_client import close_clients as close_os_clients, close_async_clients
+from app.services import message_bus, llm_gateway, ingest_queue, tokenizer, ocr as ocr_service
+from app.routers import user, policy, claim, chat, document, test, non_benefit, ocr, sync, jobs
 from app.routers import assessment as assessment_router
 from app.routers import me as me_router
 from app.crud import userCRUD
@@ -84,8 +87,23 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             (
                 print(f"[non-benefit] seeding failed: {e}"))
+
+    # 3. 메시지 상태 버스 (멀티 워커면 LISTEN/NOTIFY 브리지)
+    await message_bus.start_bridge()
+
+    # 4. 업로드 색인 작업 큐 워커
+    await ingest_queue.start_workers()
+
+    # 5. 토큰 예산용 토크나이저 (허브 다운로드가 있을 수 있어 스레드에서)
+    await asyncio.to_thread(tokenizer.warmup)
     yield
     print("Shutting down...")
+    await ingest_queue.stop_workers()
+    ocr_service.shutdown_render_pool()
+    await message_bus.stop_bridge()
+    await llm_gateway.aclose()
+    await close_async_clients()
+    close_os_clients()
 
 
 
@@ -110,6 +128,7 @@ app.include_router(test.router)
 app.include_router(non_benefit.router)
 app.include_router(ocr.router)
 app.include_router(sync.router)  # include 추가
+app.include_router(jobs.router)
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
@@ -16,6 +16,8 @@ from . import chatModel
 from .assessmentModel import Assessment
 from .attachmentModel import AssessmentAttachment
 from .assessmentMessageModel import AssessmentMessage
+from .extractionCacheModel import ExtractionCache
+from .ingestJobModel import IngestJob
 __all__ = [
     "Base", "Column", "Integer", "String", "Date", "DateTime", "Float", "Text",
     "ForeignKey", "Enum", "PickleType", "relationship", "MutableList",
@@ -30,4 +32,6 @@ __all__ = [
     "Assessment",
     "AssessmentAttachment",
     "AssessmentMessage",
+    "ExtractionCache",
+    "IngestJob",
 ]
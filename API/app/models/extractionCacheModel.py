@@ -0,0 +1,24 @@
+from __future__ import annotations
+from datetime import datetime
+from sqlalchemy import Integer, String, Text, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+# LLM 추출(coverage/premium/meta) 결과 캐시
+# cache_key = sha256(프롬프트 템플릿 버전, 모델 ID, 종류, 배치 텍스트, name group)
+class ExtractionCache(Base):
+    __tablename__ = "llm_extraction_cache"
+
+    cache_key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)  # coverage | premium | meta
+    model_id: Mapped[str] = mapped_column(String(128), nullable=False)
+    prompt_version: Mapped[str] = mapped_column(String(32), nullable=False)
+    output: Mapped[str] = mapped_column(Text, nullable=False)      # watsonx 원문 출력
+    hit_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ExtractionCache key={self.cache_key[:12]} kind={self.kind} hits={self.hit_count}>"
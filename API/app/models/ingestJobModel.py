@@ -0,0 +1,48 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, Index, Integer, LargeBinary, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, deferred, mapped_column
+
+from app.database import Base
+
+
+# 업로드 색인 작업 큐 (OCR → 청킹 → OpenSearch 색인을 요청 밖 워커가 처리)
+# status: queued → running → done | failed  (실패 시 attempts < max_attempts면 run_after 뒤 다시 queued)
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)  # uuid4
+    user_id: Mapped[int] = mapped_column(Integer, nullable=False, index=True)
+    kind: Mapped[str] = mapped_column(String(32), nullable=False)  # document | ocr_policy
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="queued")
+    stage: Mapped[Optional[str]] = mapped_column(String(16))        # ocr | indexing
+    filename: Mapped[Optional[str]] = mapped_column(String(255))
+    mime: Mapped[Optional[str]] = mapped_column(String(100))
+    meta: Mapped[Optional[dict]] = mapped_column(JSONB)              # ingest_policy에 넘길 메타
+    # 원본 파일 (여러 워커 프로세스가 공유하도록 DB에 보관, 완료 후 비움)
+    file_data: Mapped[Optional[bytes]] = deferred(mapped_column(LargeBinary))
+
+    pages_total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    pages_done: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    chunks_total: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    chunks_done: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3, nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    result: Mapped[Optional[dict]] = mapped_column(JSONB)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    run_after: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+    def __repr__(self) -> str:
+        return f"<IngestJob id={self.id} kind={self.kind} status={self.status} user={self.user_id}>"
+
+
+Index("idx_ingest_jobs_status_run_after", IngestJob.status, IngestJob.run_after)
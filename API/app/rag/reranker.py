@@ -0,0 +1,148 @@
+# app/rag/reranker.py
+"""
+컨텍스트 패킹 전 재정렬(rerank) + 유사 청크 중복 제거.
+
+- RERANK_MODEL이 설정되고 sentence-transformers가 있으면 CPU CrossEncoder로 배치 점수화
+- 없으면 문자 bigram 겹침 기반의 가벼운 점수(한국어 조사/띄어쓰기 변형에 강함)
+- RERANK=0 이면 원래 순서 그대로 (재정렬/중복 제거 모두 생략)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+# pip install sentence-transformers (선택)
+try:
+    from sentence_transformers import CrossEncoder
+except Exception:
+    CrossEncoder = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("RERANK", "1") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")  # 예: cross-encoder/mmarco-mMiniLMv2-L12-H384-v1
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "30"))      # 점수화할 후보 수
+RERANK_KEEP = int(os.getenv("RERANK_KEEP", "6"))         # 약관 스니펫 최종 개수
+RERANK_KEEP_USER = int(os.getenv("RERANK_KEEP_USER", "3"))  # 사용자 지식 최종 개수
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", "16"))
+RERANK_MAX_CHARS = int(os.getenv("RERANK_MAX_CHARS", "1500"))  # 점수화에 쓰는 본문 길이
+DEDUP_THRESHOLD = float(os.getenv("RERANK_DEDUP_THRESHOLD", "0.85"))
+
+_lock = threading.Lock()
+_model = None
+_model_loaded = False
+
+_WS_RE = re.compile(r"\s+")
+_STRIP_RE = re.compile(r"[^\w]", re.UNICODE)
+
+
+def _load_model():
+    global _model, _model_loaded
+    if _model_loaded:
+        return _model
+    with _lock:
+        if not _model_loaded:
+            if CrossEncoder is not None and RERANK_MODEL:
+                try:
+                    _model = CrossEncoder(RERANK_MODEL, device="cpu", max_length=512)
+                    logger.info("[RERANK] cross-encoder loaded: %s", RERANK_MODEL)
+                except Exception as e:
+                    logger.warning("[RERANK] model load failed, using lexical scorer: %s", e)
+                    _model = None
+            _model_loaded = True
+    return _model
+
+
+def _text(s: Dict[str, Any]) -> str:
+    title = s.get("section_title") or ""
+    body = s.get("content") or ""
+    return f"{title}\n{body}"[:RERANK_MAX_CHARS]
+
+
+def _bigrams(text: str) -> Counter:
+    t = _STRIP_RE.sub("", _WS_RE.sub("", (text or "").lower()))
+    return Counter(t[i:i + 2] for i in range(len(t) - 1))
+
+
+def lexical_scores(query: str, texts: List[str]) -> List[float]:
+    """질의 bigram이 본문에 얼마나 덮이는지 (idf 비슷하게 후보 간 희소 bigram 가중)."""
+    q = _bigrams(query)
+    if not q:
+        return [0.0] * len(texts)
+    docs = [_bigrams(t) for t in texts]
+    n = len(docs)
+    scores = []
+    for d in docs:
+        sc = 0.0
+        for g in q:
+            if g in d:
+                df = sum(1 for x in docs if g in x)
+                sc += math.log(1 + n / df) * (1 + math.log(d[g]))
+        # 긴 청크가 유리하지 않도록 완만한 길이 정규화
+        scores.append(sc / (1 + math.log(1 + sum(d.values()) / 200)))
+    return scores
+
+
+def _score(query: str, snippets: List[Dict[str, Any]]) -> List[float]:
+    texts = [_text(s) for s in snippets]
+    model = _load_model()
+    if model is not None:
+        try:
+            return [float(x) for x in model.predict([(query, t) for t in texts], batch_size=RERANK_BATCH)]
+        except Exception as e:
+            logger.warning("[RERANK] cross-encoder failed, using lexical scorer: %s", e)
+    return lexical_scores(query, texts)
+
+
+def _shingles(text: str, n: int = 5) -> Set[str]:
+    t = _WS_RE.sub(" ", (text or "").strip())
+    return {t[i:i + n] for i in range(max(1, len(t) - n + 1))}
+
+
+def dedup(snippets: List[Dict[str, Any]], threshold: float = DEDUP_THRESHOLD) -> List[Dict[str, Any]]:
+    """본문이 거의 같은 청크(문자 5-gram Jaccard ≥ threshold)는 앞의 것만 남김."""
+    kept: List[Dict[str, Any]] = []
+    sigs: List[Set[str]] = []
+    for s in snippets:
+        sig = _shingles(s.get("content") or "")
+        dup = False
+        for other in sigs:
+            inter = len(sig & other)
+            if inter and inter / len(sig | other) >= threshold:
+                dup = True
+                break
+        if not dup:
+            kept.append(s)
+            sigs.append(sig)
+    return kept
+
+
+def _rerank_sync(query: str, snippets: List[Dict[str, Any]], keep: int) -> List[Dict[str, Any]]:
+    cands = dedup(snippets[:RERANK_TOP_N])
+    if not cands:
+        return []
+    scores = _score(query, cands)
+    ranked = sorted(zip(cands, scores), key=lambda x: x[1], reverse=True)[:keep]
+    return [{**s, "rerank_score": round(sc, 4)} for s, sc in ranked]
+
+
+async def rerank(
+    query: str,
+    snippets: List[Dict[str, Any]],
+    keep: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """상위 RERANK_TOP_N 후보를 질의 기준으로 재정렬해 keep개만 반환 (CPU 작업은 스레드에서)."""
+    if not ENABLED or not snippets or not (query or "").strip():
+        return snippets
+    keep = RERANK_KEEP if keep is None else keep
+    try:
+        return await asyncio.to_thread(_rerank_sync, query, snippets, keep)
+    except Exception as e:
+        logger.warning("[RERANK] failed, keeping original order: %s", e)
+        return snippets
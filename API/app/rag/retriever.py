@@ -3,16 +3,24 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional, Tuple
 import os
 import logging
-import boto3
+import hashlib
+import random
+import threading
+import time
 import json, re
-from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
 from app.services.common import Mode
+from app.services import search_cache
+from app.rag import reranker
+from app.services.os_client import msearch_async, search_async
+from app.services.tokenizer import count_tokens, count_tokens_batch, truncate_to_tokens
+from app.services.chunker import page_of
 from app.config import settings
 from typing import List, Dict, Any
 from starlette.concurrency import run_in_threadpool
 import asyncio
 from sqlalchemy import select, func
 from app.database import AsyncSessionLocal
+from app.crud import extractionCacheCRUD
 from app.models import (
     InsurancePolicy,
     PolicyCoverage,
@@ -104,29 +112,11 @@ JSON 배열 하나만 출력하고, 객체는 다음 키를 포함해야 해:
 
 # ============================= OpenSearch =============================
 
-def _os_client() -> OpenSearch:
-    region = getattr(settings, "OPENSEARCH_REGION", os.getenv("OPENSEARCH_REGION", "us-east-1"))
-    auth = AWSV4SignerAuth(boto3.Session().get_credentials(), region, "es")
-    host = getattr(settings, "OPENSEARCH_HOST", os.getenv("OPENSEARCH_HOST"))
-    port = int(getattr(settings, "OPENSEARCH_PORT", os.getenv("OPENSEARCH_PORT", "443")))
-    return OpenSearch(
-        hosts=[{"host": host, "port": port}],
-        http_auth=auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=120,
-        max_retries=2,
-        retry_on_timeout=True,
-    )
-
 def _trim(s: str, n: int = 120) -> str:
     s = (s or "").replace("\n", " ").strip()
     return (s[:n] + "…") if len(s) > n else s
 
-def _search_snippets(query: str, k: int = 8, policy_id: Optional[str] = None, policy_ids: Optional[List[str]] = None,) -> List[Dict[str, Any]]:
-    index = getattr(settings, "OPENSEARCH_INDEX", None)
-
+def _snippet_body(query: str, k: int, policy_id: Optional[str] = None, policy_ids: Optional[List[str]] = None) -> Dict[str, Any]:
     must_block: List[Dict[str, Any]] = []
     if (query or "").strip():
         must_block.append(
@@ -149,45 +139,49 @@ def _search_snippets(query: str, k: int = 8, policy_id: Optional[str] = None, po
         filter_block.append({"terms": {"policy_id": policy_ids}})
 
     if policy_id or policy_ids:
-        body: Dict[str, Any] = {
+        return {
             "size": max(1, min(k, 20)),
             "query": {"bool": {"filter": filter_block, "must": must_block}},
             "_source": True,
         }
-    else:
-        body = {
-            "size": max(1, min(k, 20)),
-            "query": {
-                "multi_match": {
-                    "query": query,
-                    "fields": ["section_title^2", "content"],
-                    "type": "best_fields",
-                    "tie_breaker": 0.2,
-                }
-            },
-            "_source": True,
-        }
-
-    resp = _os_client().search(index=index, body=body)
+    return {
+        "size": max(1, min(k, 20)),
+        "query": {
+            "multi_match": {
+                "query": query,
+                "fields": ["section_title^2", "content"],
+                "type": "best_fields",
+                "tie_breaker": 0.2,
+            }
+        },
+        "_source": True,
+    }
+
+def _user_knowledge_body(query: str, k: int, uid: int) -> Dict[str, Any]:
+    return {
+        "size": max(1, min(k, 20)),
+        "query": {
+            "bool": {
+                "filter": [
+                    {"term": {"doc_type": "user_knowledge"}},
+                    {"term": {"user_id": uid}},
+                ],
+                "must": [
+                    {"multi_match": {"query": query, "fields": ["content^3", "section_title^2", "entry"], "type": "best_fields"}}
+                ],
+            }
+        },
+        "_source": True,
+    }
 
-    # total 파싱(버전에 따라 dict/int 혼재)
-    raw_total = (resp.get("hits", {}).get("total", {}) or {})
-    if isinstance(raw_total, dict):
-        total = int(raw_total.get("value", 0))
-    else:
-        total = int(raw_total or 0)
+def _user_id_int(user_id: Optional[int | str]) -> Optional[int]:
+    if not user_id:
+        return None
+    return int(user_id) if isinstance(user_id, (int, str)) and str(user_id).isdigit() else None
 
+def _hits_to_snippets(resp: Dict[str, Any]) -> List[Dict[str, Any]]:
     hits = resp.get("hits", {}).get("hits", []) or []
-
-    if not hits:
-        # ✅ 검색 0건 로그
-        logger.info(
-            "[RAG][OS_EMPTY] index=%s total=%d k=%d query=%s",
-            index, total, k, _trim(query)
-        )
-        return []
-
-    out = []
+    out: List[Dict[str, Any]] = []
     for h in hits:
         s = h.get("_source", {}) or {}
         out.append({
@@ -199,7 +193,132 @@ def _search_snippets(query: str, k: int = 8, policy_id: Optional[str] = None, po
             "version": s.get("version", ""),
             "policy_id": s.get("policy_id", "") or s.get("policy", ""),
             "effective_date": s.get("effective_date", ""),
+            "article": s.get("article") or "",
+            "page_start": s.get("page_start"),
+            "page_end": s.get("page_end"),
         })
+    return out
+
+def _hits_total(resp: Dict[str, Any]) -> int:
+    # total 파싱(버전에 따라 dict/int 혼재)
+    raw_total = (resp.get("hits", {}).get("total", {}) or {})
+    if isinstance(raw_total, dict):
+        return int(raw_total.get("value", 0))
+    return int(raw_total or 0)
+
+# ---------------- 하이브리드 검색 (BM25 + neural kNN, RRF 병합) ----------------
+# lexical: 기존 multi_match만 / hybrid: 같은 필터로 BM25 + kNN을 _msearch 1번에 보내고 RRF로 병합
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "lexical").lower()
+HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "40"))  # 각 검색에서 가져올 후보 수
+HYBRID_LIMIT = int(os.getenv("RAG_HYBRID_LIMIT", "8"))             # 하이브리드일 때 최종 스니펫 수 상한
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+
+def _policy_filter(policy_id: Optional[str], policy_ids: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+    if policy_id:
+        return {"term": {"policy_id": policy_id}}
+    if policy_ids:
+        return {"terms": {"policy_id": policy_ids}}
+    return None
+
+
+def _knn_body(query: str, k: int, policy_id: Optional[str] = None, policy_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    field = settings.OPENSEARCH_VECTOR_FIELD
+    neural: Dict[str, Any] = {"query_text": query, "model_id": settings.OPENSEARCH_EMBED_MODEL_ID, "k": k}
+    flt = _policy_filter(policy_id, policy_ids)
+    if flt:
+        neural["filter"] = flt  # kNN 탐색 중 필터 (후필터보다 결과 수가 안정적)
+    return {"size": k, "query": {"neural": {field: neural}}, "_source": {"excludes": [field]}}
+
+
+def _rrf_fuse(responses: List[Dict[str, Any]], size: int) -> Dict[str, Any]:
+    """Reciprocal Rank Fusion: score = Σ 1/(RRF_K + rank). _id 기준 중복 제거."""
+    scores: Dict[str, float] = {}
+    first: Dict[str, Dict[str, Any]] = {}
+    for resp in responses:
+        if not resp or resp.get("error"):
+            continue
+        for rank, h in enumerate(resp.get("hits", {}).get("hits", []) or [], start=1):
+            hid = h.get("_id") or f"{id(resp)}:{rank}"
+            scores[hid] = scores.get(hid, 0.0) + 1.0 / (RRF_K + rank)
+            first.setdefault(hid, h)
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:size]
+    hits = [{**first[hid], "_score": round(sc, 6)} for hid, sc in ranked]
+    total = max((_hits_total(r) for r in responses if r and not r.get("error")), default=0)
+    return {"hits": {"hits": hits, "total": {"value": total}}}
+
+
+async def _hybrid_search(
+    index: Optional[str],
+    query: str,
+    k: int,
+    policy_id: Optional[str],
+    policy_ids: Optional[List[str]],
+    timeout: Optional[float],
+) -> Dict[str, Any]:
+    cand = max(k, HYBRID_CANDIDATES)
+    lexical = _snippet_body(query, cand, policy_id=policy_id, policy_ids=policy_ids)
+    knn = _knn_body(query, cand, policy_id=policy_id, policy_ids=policy_ids)
+    responses = await msearch_async(index=index, bodies=[lexical, knn], timeout=timeout)
+    for name, r in zip(("bm25", "knn"), responses):
+        if r.get("error"):
+            logger.warning("[RAG][HYBRID] %s leg failed: %s", name, str(r.get("error"))[:300])
+    return _rrf_fuse(responses, size=k)
+
+
+def _use_hybrid(search_mode: Optional[str]) -> bool:
+    mode = (search_mode or RAG_SEARCH_MODE).lower()
+    if mode != "hybrid":
+        return False
+    if not settings.OPENSEARCH_EMBED_MODEL_ID:
+        logger.warning("[RAG][HYBRID] OPENSEARCH_EMBED_MODEL_ID not set; using lexical search")
+        return False
+    return True
+
+
+async def _search_snippets(
+    query: str,
+    k: int = 8,
+    policy_id: Optional[str] = None,
+    policy_ids: Optional[List[str]] = None,
+    timeout: Optional[float] = None,
+    hybrid: bool = False,
+) -> List[Dict[str, Any]]:
+    index = getattr(settings, "OPENSEARCH_INDEX", None)
+    # 같은 (질의, 정책 스코프, k, 모드)는 캐시에서 (색인 시 무효화)
+    return await search_cache.cached(
+        index,
+        ("snippets", query, policy_id, tuple(sorted(policy_ids or [])), k, hybrid),
+        lambda: _search_snippets_os(index, query, k, policy_id, policy_ids, timeout, hybrid),
+    )
+
+
+async def _search_snippets_os(
+    index: Optional[str],
+    query: str,
+    k: int,
+    policy_id: Optional[str],
+    policy_ids: Optional[List[str]],
+    timeout: Optional[float],
+    hybrid: bool,
+) -> List[Dict[str, Any]]:
+    # 이벤트 루프를 막지 않는 비동기 검색 (호출별 타임아웃/취소 지원)
+    if hybrid and (query or "").strip():
+        resp = await _hybrid_search(index, query, k, policy_id, policy_ids, timeout)
+    else:
+        body = _snippet_body(query, k, policy_id=policy_id, policy_ids=policy_ids)
+        resp = await search_async(index=index, body=body, timeout=timeout)
+    total = _hits_total(resp)
+    out = _hits_to_snippets(resp)
+
+    if not out:
+        # ✅ 검색 0건 로그
+        logger.info(
+            "[RAG][OS_EMPTY] index=%s total=%d k=%d query=%s",
+            index, total, k, _trim(query)
+        )
+        return []
+
     logger.info(out)
     # 검색 결과 요약 로그(상위 1개만 제목 찍기)
     logger.debug(
@@ -208,50 +327,26 @@ def _search_snippets(query: str, k: int = 8, policy_id: Optional[str] = None, po
     )
     return out
 
-def _search_user_knowledge(query: str, k: int, user_id: Optional[int | str]) -> List[Dict[str, Any]]:
+async def _search_user_knowledge(query: str, k: int, user_id: Optional[int | str], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
     """Search user-specific knowledge (indexed from uploads) for the given user_id."""
     try:
-        if not user_id:
-            return []
-        index = getattr(settings, "OPENSEARCH_INDEX", None)
-        uid = int(user_id) if isinstance(user_id, (int, str)) and str(user_id).isdigit() else None
+        uid = _user_id_int(user_id)
         if uid is None:
             return []
-        body: Dict[str, Any] = {
-            "size": max(1, min(k, 20)),
-            "query": {
-                "bool": {
-                    "filter": [
-                        {"term": {"doc_type": "user_knowledge"}},
-                        {"term": {"user_id": uid}},
-                    ],
-                    "must": [
-                        {"multi_match": {"query": query, "fields": ["content^3", "section_title^2", "entry"], "type": "best_fields"}}
-                    ],
-                }
-            },
-            "_source": True,
-        }
-        resp = _os_client().search(index=index, body=body)
-        hits = resp.get("hits", {}).get("hits", []) or []
-        out: List[Dict[str, Any]] = []
-        for h in hits:
-            s = h.get("_source", {}) or {}
-            out.append({
-                "score": h.get("_score", 0.0),
-                "section_title": s.get("section_title", "") or "",
-                "content": s.get("content", "") or "",
-                "filename": s.get("filename", ""),
-                "insurer": s.get("insurer", ""),
-                "version": s.get("version", ""),
-                "policy_id": s.get("policy_id", "") or s.get("policy", ""),
-                "effective_date": s.get("effective_date", ""),
-            })
+        index = getattr(settings, "OPENSEARCH_INDEX", None)
+
+        async def _run() -> List[Dict[str, Any]]:
+            resp = await search_async(index=index, body=_user_knowledge_body(query, k, uid), timeout=timeout)
+            return _hits_to_snippets(resp)
+
+        out = await search_cache.cached(index, ("user_knowledge", uid, query, k), _run)
         if not out:
             logger.debug("[RAG][UK_EMPTY] user_id=%s query=%s", uid, _trim(query))
         else:
             logger.debug("[RAG][UK_OK] user_id=%s top_title=%s", uid, _trim(out[0].get("section_title")))
         return out
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
         logger.warning("[RAG][UK_ERROR] search failed: %s", e)
         return []
@@ -259,33 +354,100 @@ def _search_user_knowledge(query: str, k: int, user_id: Optional[int | str]) ->
 # ============================= Token Utils =============================
 
 def _rough_tokens(text: str) -> int:
-    """보수 근사(한글 포함): ~1토큰=3문자."""
-    if not text:
-        return 0
-    return max(1, len(text) // 3)
-
-def _wx_model() -> Optional[ModelInference]:
-    if ModelInference is None:
-        logger.warning("ibm-watsonx-ai SDK not installed.")
-        return None
+    """로컬 토크나이저 기반 토큰 수 (토크나이저가 없으면 한글/숫자 인지 휴리스틱, 해시 메모이즈)."""
+    return count_tokens(text)
+
+# watsonx 핸들 캐시: Credentials/APIClient/ModelInference를 프로세스당 1번만 만들고 재사용.
+# IAM 토큰(약 60분)이 만료되기 전에 주기적으로 재생성하고, 인증 오류가 나면 즉시 재연결한다.
+_WX_MAX_AGE = int(os.getenv("WATSONX_MODEL_MAX_AGE", "3000"))  # seconds
+_wx_lock = threading.Lock()
+_wx_state: Dict[str, Any] = {
+    "model": None,
+    "created_at": 0.0,
+    "last_ok": 0.0,
+    "failures": 0,        # 연속 실패 횟수
+    "reconnects": 0,
+    "last_error": "",
+}
 
+def _wx_build() -> "ModelInference":
     creds = Credentials(api_key=settings.WATSONX_API_KEY, url=settings.WATSONX_URL)
     _ = APIClient(creds)  # 내부 토크나이저 호출에 필요
-
     return ModelInference(
         model_id=settings.WATSONX_MODEL_ID,
         credentials=creds,
         space_id=settings.WATSONX_SPACE_ID,
     )
 
-def _wx_token_count(model: Optional[ModelInference], text: str) -> int:
-    if not model:
-        return _rough_tokens(text)
+def _wx_model(force_refresh: bool = False) -> Optional[ModelInference]:
+    if ModelInference is None:
+        logger.warning("ibm-watsonx-ai SDK not installed.")
+        return None
+
+    now = time.monotonic()
+    m = _wx_state["model"]
+    if m is not None and not force_refresh and now - _wx_state["created_at"] < _WX_MAX_AGE:
+        return m
+
+    with _wx_lock:
+        m = _wx_state["model"]
+        # 다른 스레드가 먼저 갱신했으면 그대로 사용
+        if m is not None and not force_refresh and time.monotonic() - _wx_state["created_at"] < _WX_MAX_AGE:
+            return m
+        try:
+            m = _wx_build()
+        except Exception as e:
+            _wx_state["failures"] += 1
+            _wx_state["last_error"] = repr(e)
+            logger.exception("[WX] model init failed: %s", e)
+            return None
+        if _wx_state["model"] is not None:
+            _wx_state["reconnects"] += 1
+        _wx_state["model"] = m
+        _wx_state["created_at"] = time.monotonic()
+        logger.info("[WX] model handle ready (reconnects=%d)", _wx_state["reconnects"])
+        return m
+
+def _wx_is_auth_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return any(k in msg for k in ("401", "403", "unauthorized", "token expired", "expired token", "authentication"))
+
+def _wx_call(fn):
+    """
+    캐시된 모델로 fn(model)을 실행.
+    인증 만료로 실패하면 핸들을 새로 만들어 1회 재시도. 성공/실패는 헬스 상태에 기록.
+    """
+    model = _wx_model()
+    if model is None:
+        return None
     try:
-        t = model.tokenize(prompt=text, return_tokens=True)
-        return len(t.get("result", []))
-    except Exception:
-        return _rough_tokens(text)
+        out = fn(model)
+    except Exception as e:
+        _wx_state["failures"] += 1
+        _wx_state["last_error"] = repr(e)
+        if not _wx_is_auth_error(e):
+            raise
+        logger.warning("[WX] auth error, reconnecting: %s", e)
+        model = _wx_model(force_refresh=True)
+        if model is None:
+            raise
+        out = fn(model)
+    _wx_state["failures"] = 0
+    _wx_state["last_ok"] = time.monotonic()
+    return out
+
+def wx_health() -> Dict[str, Any]:
+    """watsonx 핸들 상태(디버그/헬스체크용)."""
+    now = time.monotonic()
+    return {
+        "sdk_installed": ModelInference is not None,
+        "ready": _wx_state["model"] is not None,
+        "age_sec": round(now - _wx_state["created_at"], 1) if _wx_state["model"] is not None else None,
+        "since_last_ok_sec": round(now - _wx_state["last_ok"], 1) if _wx_state["last_ok"] else None,
+        "consecutive_failures": _wx_state["failures"],
+        "reconnects": _wx_state["reconnects"],
+        "last_error": _wx_state["last_error"],
+    }
 
 def _fit_snippets_to_limit(
     snippets: List[Dict[str, Any]],
@@ -295,8 +457,8 @@ def _fit_snippets_to_limit(
     per_snippet_header_tokens: int = 12,
 ) -> Tuple[str, List[Dict[str, Any]]]:
     """
-    watsonx 호출 전, RAG 컨텍스트(원문 스니펫) 블록을 10,000 토큰 이내로 구성.
-    watsonx 토크나이저 없이 보수 근사 사용.
+    watsonx 호출 전, RAG 컨텍스트(원문 스니펫) 블록을 token_limit 이내로 구성.
+    네트워크 호출 없이 로컬 토크나이저로 계산.
     """
     header = "[RAG CONTEXT]\n"
     used = _rough_tokens(header) + _rough_tokens(user_query) + system_overhead_tokens
@@ -308,15 +470,16 @@ def _fit_snippets_to_limit(
         body = (s.get("content") or "").strip()
         if not body:
             continue
-        block = f"- ({title}) {body}"
+        cite = len(chosen) + 1
+        block = f"- [{cite}] ({title}) {body}"
         need = per_snippet_header_tokens + _rough_tokens(block)
 
         if used + need > token_limit:
             remain = token_limit - used - per_snippet_header_tokens
             if remain <= 0:
                 break
-            approx_chars = max(0, remain * 3)
-            block = f"- ({title}) {body[:approx_chars]}…"
+            head = f"- [{cite}] ({title}) "
+            block = head + truncate_to_tokens(body, remain - _rough_tokens(head))
             need = per_snippet_header_tokens + _rough_tokens(block)
             if used + need > token_limit:
                 break
@@ -326,22 +489,80 @@ def _fit_snippets_to_limit(
         chosen.append(s)
 
     # 간단 출처
-    if chosen:
-        labels = []
-        for s in chosen:
-            parts = []
-            if s.get("insurer"): parts.append(str(s["insurer"]))
-            if s.get("version"): parts.append(str(s["version"]))
-            if s.get("filename"): parts.append(str(s["filename"]))
-            if s.get("policy_id"): parts.append(f"#{s['policy_id']}")
-            lab = " ".join([p for p in parts if p])
-            if lab and lab not in labels:
-                labels.append(lab)
-        if labels:
-            lines.append("🔎 출처: " + " / ".join(labels))
+    src = _sources_line(chosen)
+    if src:
+        lines.append(src)
 
     return "\n".join(lines), chosen
 
+
+def _sources_line(chosen: List[Dict[str, Any]]) -> str:
+    """인용 번호별 출처 한 줄: 🔎 출처: [1] 삼성 v3 약관.pdf #P123 / [2] ..."""
+    labels = []
+    for i, s in enumerate(chosen, start=1):
+        parts = []
+        if s.get("insurer"): parts.append(str(s["insurer"]))
+        if s.get("version"): parts.append(str(s["version"]))
+        if s.get("filename"): parts.append(str(s["filename"]))
+        if s.get("policy_id"): parts.append(f"#{s['policy_id']}")
+        if s.get("article"): parts.append(str(s["article"]))
+        if page_of(s): parts.append(page_of(s))
+        lab = " ".join([p for p in parts if p])
+        if lab:
+            labels.append(f"[{i}] {lab}")
+    return ("🔎 출처: " + " / ".join(labels)) if labels else ""
+
+
+# ---------------- 답변 모드 ----------------
+# generate  : watsonx로 중간 답변을 생성해 넘김 (기존 동작, 생성 2번 직렬) — 기본값. /debug/rag-ab로 측정한 뒤에 바꿀 것
+# context   : 인용 번호가 붙은 원문 컨텍스트를 그대로 넘김 (최종 LLM이 답함)
+# extractive: 질의와 맞는 문장만 골라 토큰 상한 안의 짧은 발췌 요약으로 넘김
+# 모드별 설정: RAG_ANSWER_MODE_REFUND / RAG_ANSWER_MODE_TERMS ... (없으면 RAG_ANSWER_MODE)
+RAG_ANSWER_MODE = os.getenv("RAG_ANSWER_MODE", "generate").lower()
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "6000"))
+RAG_EXTRACTIVE_TOKENS = int(os.getenv("RAG_EXTRACTIVE_TOKENS", "800"))
+ANSWER_MODES = ("generate", "context", "extractive")
+
+_SENT_SPLIT_RE = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+
+def _answer_mode_for(mode, answer_mode: Optional[str]) -> str:
+    if answer_mode:
+        am = answer_mode.lower()
+    else:
+        name = str(getattr(mode, "name", mode or "")).upper()
+        am = os.getenv(f"RAG_ANSWER_MODE_{name}", RAG_ANSWER_MODE).lower()
+    return am if am in ANSWER_MODES else "generate"
+
+
+def _extractive_block(query: str, chosen: List[Dict[str, Any]], token_cap: int) -> str:
+    """질의와 겹침이 큰 문장부터 token_cap까지 고르고, 원래 순서로 인용 번호와 함께 출력."""
+    sents: List[Tuple[int, int, str]] = []  # (인용번호, 순서, 문장)
+    for ci, s in enumerate(chosen, start=1):
+        for sent in _SENT_SPLIT_RE.split(s.get("content") or ""):
+            sent = sent.strip()
+            if len(sent) >= 8:
+                sents.append((ci, len(sents), sent))
+    if not sents:
+        return ""
+    scores = reranker.lexical_scores(query, [t for _, _, t in sents])
+    picked, used = [], 0
+    for (ci, order, sent), sc in sorted(zip(sents, scores), key=lambda x: x[1], reverse=True):
+        if sc <= 0:
+            break
+        cost = _rough_tokens(sent) + 4
+        if used + cost > token_cap:
+            continue
+        picked.append((ci, order, sent))
+        used += cost
+    if not picked:
+        return ""
+    lines = ["[RAG EXTRACT]"] + [f"- [{ci}] {sent}" for ci, _, sent in sorted(picked, key=lambda x: x[1])]
+    src = _sources_line(chosen)
+    if src:
+        lines.append(src)
+    return "\n".join(lines)
+
 # ============================= watsonx Generator =============================
 
 def _rag_prompt(user_query: str, context_block: str, history_summary: str = "") -> str:
@@ -360,8 +581,7 @@ def _rag_prompt(user_query: str, context_block: str, history_summary: str = "")
     )
 
 def _wx_generate_answer(prompt: str) -> str:
-    model = _wx_model()
-    if model is None:
+    if ModelInference is None:
         return ""
     try:
         gen_params = {
@@ -371,12 +591,106 @@ def _wx_generate_answer(prompt: str) -> str:
             GenParams.REPETITION_PENALTY: 1.05,
             GenParams.STOP_SEQUENCES: [],
         }
-        resp = model.generate_text(prompt=prompt, params=gen_params)
+        resp = _wx_call(lambda m: m.generate_text(prompt=prompt, params=gen_params))
         return (resp or "").strip()
     except Exception as e:
         logger.exception("watsonx.ai generation failed: %s", e)
         return ""
 
+async def _user_policy_ids(user_id: Optional[int | str]) -> List[str]:
+    uid = _user_id_int(user_id)
+    if not uid:
+        return []
+    async with AsyncSessionLocal() as session:
+        res = await session.execute(
+            select(InsurancePolicy.policy_id).where(InsurancePolicy.user_id == uid)
+        )
+        return [pid for pid in res.scalars().all() if pid]
+
+async def _scoped_snippets(
+    *,
+    query: str,
+    user_id: Optional[str],
+    product_id: Optional[str],
+    limit: int,
+    fallback_to_global: bool,
+    deadline: float,
+    hybrid: bool = False,
+) -> List[Dict[str, Any]]:
+    """policy 스코프 검색. 실패 시(옵션) 남은 예산 안에서만 글로벌로 1회 폴백."""
+    loop = asyncio.get_running_loop()
+    scope = "global"
+    try:
+        if product_id:
+            scope = f"policy_id={product_id}"
+            return await _search_snippets(query=query, k=limit, policy_id=product_id, timeout=deadline - loop.time(), hybrid=hybrid)
+        if user_id:
+            policy_ids = await _user_policy_ids(user_id)
+            if policy_ids:
+                scope = "user policies"
+                return await _search_snippets(query=query, k=limit, policy_ids=policy_ids, timeout=deadline - loop.time(), hybrid=hybrid)
+            if not fallback_to_global:
+                return []
+        return await _search_snippets(query=query, k=limit, timeout=deadline - loop.time(), hybrid=hybrid)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error("[RAG][OS_ERROR] %s search failed: %s", scope, e)
+        remain = deadline - loop.time()
+        if scope == "global" or not fallback_to_global or remain <= 0:
+            return []
+        try:
+            return await _search_snippets(query=query, k=limit, timeout=remain, hybrid=hybrid)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return []
+
+async def _collect_snippets(
+    *,
+    query: str,
+    user_id: Optional[str],
+    product_id: Optional[str],
+    limit: int,
+    fallback_to_global: bool,
+    budget: Optional[float] = None,
+    hybrid: bool = False,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    사용자 지식 검색과 약관 스니펫 검색을 동시에 실행.
+    두 검색(및 폴백)이 budget(초) 하나를 공유하고, 초과분은 취소 후 빈 결과로 처리.
+    """
+    loop = asyncio.get_running_loop()
+    budget = float(budget if budget is not None else settings.OPENSEARCH_QUERY_TIMEOUT)
+    deadline = loop.time() + budget
+
+    uk_task = asyncio.ensure_future(
+        _search_user_knowledge(query=query, k=max(1, min(limit, 8)), user_id=user_id, timeout=budget)
+    )
+    sn_task = asyncio.ensure_future(
+        _scoped_snippets(
+            query=query,
+            user_id=user_id,
+            product_id=product_id,
+            limit=limit,
+            fallback_to_global=fallback_to_global,
+            deadline=deadline,
+            hybrid=hybrid,
+        )
+    )
+    done, pending = await asyncio.wait({uk_task, sn_task}, timeout=budget)
+    for t in pending:
+        t.cancel()
+    if pending:
+        logger.warning("[RAG][OS_BUDGET] %d search(es) exceeded %.1fs budget", len(pending), budget)
+
+    def _result(t: "asyncio.Future") -> List[Dict[str, Any]]:
+        if t not in done or t.cancelled() or t.exception() is not None:
+            return []
+        return t.result() or []
+
+    return _result(uk_task), _result(sn_task)
+
 # ============================= Public API =============================
 async def retrieve(
     *,
@@ -388,69 +702,73 @@ async def retrieve(
     limit: int = 20,
     fallback_to_global: bool = False,
     db_context: str | None = None,
+    history_summary: Optional[str] = None,
+    search_mode: Optional[str] = None,
+    answer_mode: Optional[str] = None,
+    stats: Optional[Dict[str, Any]] = None,
 ) -> str:
+    """
+    search_mode: "lexical"(BM25) | "hybrid"(BM25 + kNN, RRF). 없으면 RAG_SEARCH_MODE.
+    hybrid는 상위 정밀도가 높아 스니펫 수를 RAG_HYBRID_LIMIT로 줄인다.
+    answer_mode: "generate" | "context" | "extractive" (없으면 모드별 RAG_ANSWER_MODE_*).
+    stats dict를 넘기면 단계별 소요 시간/토큰 수를 채워준다 (A/B 측정용).
+    """
+    t0 = time.perf_counter()
+    amode = _answer_mode_for(mode, answer_mode)
+    st = stats if stats is not None else {}
+    st["answer_mode"] = amode
     try:
+        hybrid = _use_hybrid(search_mode)
+        if hybrid:
+            limit = min(limit, HYBRID_LIMIT)
         # 1) (검색은 최신 질문만 사용) 스니펫 수집
-        snippets: List[Dict[str, Any]] = []
-        # 1-a) 사용자 업로드 지식 우선 병합 (있으면 상단에 위치)
-        try:
-            user_snips = _search_user_knowledge(query=query, k=max(1, min(limit, 8)), user_id=user_id)
-        except Exception:
-            user_snips = []
-        if product_id:
-            try:
-                snippets = _search_snippets(query=query, k=limit, policy_id=product_id)
-            except Exception as e:
-                logger.error("[RAG][OS_ERROR] policy_id=%s search failed: %s", str(product_id), e)
-                # 옵션: 글로벌로 폴백 시도
-                if fallback_to_global:
-                    try:
-                        snippets = _search_snippets(query=query, k=limit)
-                    except Exception:
-                        snippets = []
-                else:
-                    snippets = []
-        elif user_id:
-            user_id_int = int(user_id) if user_id and user_id.isdigit() else 0
-            policy_ids: List[str] = []
-            if user_id_int:
-                async with AsyncSessionLocal() as session:
-                    res = await session.execute(
-                        select(InsurancePolicy.policy_id).where(
-                            InsurancePolicy.user_id == user_id_int
-                        )
-                    )
-                    policy_ids = [pid for pid in res.scalars().all() if pid]
+        #    사용자 업로드 지식 / 약관 스니펫 검색을 동시에 보내고 하나의 지연 예산 안에서 병합
+        user_snips, snippets = await _collect_snippets(
+            query=query,
+            user_id=user_id,
+            product_id=product_id,
+            limit=limit,
+            fallback_to_global=fallback_to_global,
+            hybrid=hybrid,
+        )
 
-            if policy_ids:
-                try:
-                    snippets = _search_snippets(query=query, k=limit, policy_ids=policy_ids)
-                except Exception as e:
-                    logger.error("[RAG][OS_ERROR] user policies search failed: %s", e)
-                    if fallback_to_global:
-                        try:
-                            snippets = _search_snippets(query=query, k=limit)
-                        except Exception:
-                            snippets = []
-                    else:
-                        snippets = []
-            elif fallback_to_global:
-                snippets = _search_snippets(query=query, k=limit)
-        else:
-            snippets = _search_snippets(query=query, k=limit)
+        # 재정렬 + 유사 청크 제거: 후보 중 질의와 가장 맞는 몇 개만 남겨 프롬프트 축소
+        user_snips, snippets = await asyncio.gather(
+            reranker.rerank(query, user_snips, keep=reranker.RERANK_KEEP_USER),
+            reranker.rerank(query, snippets),
+        )
 
         # 병합: 사용자 업로드 지식을 컨텍스트 상단에 배치하여 최신/개인 맥락을 우선
         if user_snips:
             snippets = user_snips + snippets
+            if reranker.ENABLED:
+                snippets = reranker.dedup(snippets)
 
-        # 2) watsonx 토큰 예산 내로 컨텍스트 패킹
-        context_block, _ = _fit_snippets_to_limit(
+        t_search = time.perf_counter()
+        st["search_ms"] = round((t_search - t0) * 1000, 1)
+
+        # 2) 토큰 예산 내로 컨텍스트 패킹 (context/extractive는 최종 LLM 프롬프트에 바로 들어가므로 더 작게)
+        context_block, chosen = _fit_snippets_to_limit(
             snippets=snippets,
             user_query=query,
+            **({} if amode == "generate" else {"token_limit": RAG_CONTEXT_TOKENS}),
         )
 
-        # 3) 과거 대화 요약을 HISTORY로
-        history_summary = await summarize_prev_chats_for_context(prev_chats)
+        # 최종 LLM이 어차피 답하므로 중간 watsonx 생성을 건너뛰는 모드
+        if amode in ("context", "extractive"):
+            block = context_block if chosen else ""
+            if amode == "extractive" and chosen:
+                block = _extractive_block(query, chosen, RAG_EXTRACTIVE_TOKENS) or context_block
+            st["gen_ms"] = 0.0
+            st["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            st["context_tokens"] = _rough_tokens(block)
+            logger.info("[RAG][TIMING] answer_mode=%s search=%.0fms total=%.0fms tokens=%d",
+                        amode, st["search_ms"], st["total_ms"], st["context_tokens"])
+            return block
+
+        # 3) 과거 대화 요약을 HISTORY로 (stage에서 캐시된 요약을 넘기면 재사용)
+        if history_summary is None:
+            history_summary = await summarize_prev_chats_for_context(prev_chats)
 
         # 4) 프롬프트 구성: [HISTORY] → [RAG CONTEXT] → [CURRENT_QUESTION]
         #    (충돌 시 최신 질문 우선 규칙을 system에 이미 명시)
@@ -474,6 +792,12 @@ async def retrieve(
             answer = ""
         logger.info("\n[RAG AUTO ANSWER END]\n%s", str(answer)[:500] + ("... (truncated)" if len(str(answer)) > 500 else ""))
 
+        st["gen_ms"] = round((time.perf_counter() - t_search) * 1000, 1)
+        st["total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        st["context_tokens"] = _rough_tokens(answer or context_block)
+        logger.info("[RAG][TIMING] answer_mode=generate search=%.0fms gen=%.0fms total=%.0fms",
+                    st["search_ms"], st["gen_ms"], st["total_ms"])
+
         if (answer or "").strip():
             return "[RAG AUTO ANSWER]\n" + answer
 
@@ -750,12 +1074,8 @@ CONTEXT_BUDGET = 20_000         # 문맥 청크에 허용할 토큰 수
 NAME_BUDGET = MODEL_LIMIT - OUTPUT_RESERVE - PROMPT_OVERHEAD - CONTEXT_BUDGET
 
 def _tok_count(s: str) -> int:
-    # watson 토크나이저 있으면 정확, 없으면 러프
-    m = _wx_model()
-    try:
-        return _wx_token_count(m, s)
-    except Exception:
-        return _rough_tokens(s)
+    # 로컬 토크나이저 (watsonx tokenize 네트워크 호출 없음)
+    return count_tokens(s)
 
 def _chunk_to_text(c: Dict[str, Any]) -> str:
     title = (c.get("section_title") or "").strip()
@@ -765,7 +1085,7 @@ def _chunk_to_text(c: Dict[str, Any]) -> str:
     return f"### {title}\n{body}" if title else body
 
 def _materialize_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """각 청크에 _text, _approx_tok 필드를 부여"""
+    """각 청크에 _text, _approx_tok 필드를 부여 (토큰 수는 배치로 한 번에 계산)"""
     out: List[Dict[str, Any]] = []
     for c in chunks:
         t = _chunk_to_text(c)
@@ -773,19 +1093,16 @@ def _materialize_chunks(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             continue
         m = dict(c)  # 얕은 복사
         m["_text"] = t
-        m["_approx_tok"] = max(1, len(t) // 3)  # 로컬 근사치
         out.append(m)
+    for m, n in zip(out, count_tokens_batch([m["_text"] for m in out])):
+        m["_approx_tok"] = max(1, n)
     return out
 
 def _shrink_text_by_chars(text: str, target_tokens: int) -> str:
-    # 근사치: 1토큰≈3문자 → 여유를 두고 2.8로 나눔
-    max_chars = int(target_tokens * 2.8)
-    if len(text) <= max_chars:
-        return text
-    return text[:max_chars] + "…"
+    return truncate_to_tokens(text, target_tokens)
 
 def _pack_batches_by_tokens(chunks: List[Dict[str, Any]], budget_tokens: int = CONTEXT_BUDGET) -> List[List[Dict[str, Any]]]:
-    """네트워크 토크나이저 호출 없이, 근사 토큰으로만 배치 구성"""
+    """네트워크 토크나이저 호출 없이, 로컬 토크나이저 토큰 수로 배치 구성"""
     mats = _materialize_chunks(chunks)  # _text, _approx_tok 포함
     batches: List[List[Dict[str, Any]]] = []
     cur: List[Dict[str, Any]] = []
@@ -795,10 +1112,14 @@ def _pack_batches_by_tokens(chunks: List[Dict[str, Any]], budget_tokens: int = C
         cost = m["_approx_tok"] + 24  # 헤더 여유치
         # 개별 청크가 과도하게 크면 잘라서 삽입
         if cost > int(budget_tokens * 0.9):
-            short = _shrink_text_by_chars(m["_text"], int(budget_tokens * 0.9))
             m = dict(m)
-            m["_text"] = short
-            m["_approx_tok"] = max(1, len(short) // 3)
+            # 프롬프트는 content로 만들어지므로 본문도 같은 예산으로 자름
+            m["content"] = _shrink_text_by_chars(
+                (m.get("content") or m.get("embed_input") or m.get("text") or ""),
+                int(budget_tokens * 0.9) - _rough_tokens(m.get("section_title") or ""),
+            )
+            m["_text"] = _chunk_to_text(m)
+            m["_approx_tok"] = max(1, _rough_tokens(m["_text"]))
             cost = m["_approx_tok"] + 24
 
         if used + cost > budget_tokens and cur:
@@ -811,9 +1132,10 @@ def _pack_batches_by_tokens(chunks: List[Dict[str, Any]], budget_tokens: int = C
 
 def _pack_name_groups(names: List[str], budget_tokens: int = NAME_BUDGET) -> List[List[str]]:
     groups, cur, used = [], [], 0
-    for n in names:
-        # json.dumps 대신 길이 기반 근사 (문자/3 + 쉼표 여유치)
-        t = max(1, len(n) // 3) + 1
+    # 이름별 토큰 수(따옴표 포함) + 쉼표 여유치
+    costs = count_tokens_batch([json.dumps(n, ensure_ascii=False) for n in names])
+    for n, c in zip(names, costs):
+        t = max(1, c) + 1
         if used + t > budget_tokens and cur:
             groups.append(cur); cur, used = [], 0
         cur.append(n); used += t
@@ -912,33 +1234,155 @@ def extract_json_array(text: str) -> List[Any]:
 
 # ----------------------- MAP (Watson 호출) -----------------------
 
+# 맵 단계 동시성 제어: coverage/premium/meta 추출이 함께 돌아도 전체 watsonx 동시 호출 수는 이 한도를 넘지 않음
+WX_MAP_CONCURRENCY = int(os.getenv("WATSONX_MAP_CONCURRENCY", "4"))
+WX_MAP_TIMEOUT = float(os.getenv("WATSONX_MAP_TIMEOUT", "180"))   # 호출 1건당 (초)
+WX_MAP_RETRIES = int(os.getenv("WATSONX_MAP_RETRIES", "2"))
+WX_MAP_BACKOFF = float(os.getenv("WATSONX_MAP_BACKOFF", "1.0"))   # 재시도 기본 대기 (초)
+
+_wx_map_sems: Dict[int, asyncio.Semaphore] = {}
+
+def _wx_map_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _wx_map_sems.get(id(loop))
+    if sem is None:
+        sem = asyncio.Semaphore(max(1, WX_MAP_CONCURRENCY))
+        _wx_map_sems[id(loop)] = sem
+    return sem
+
+async def _wx_map_call(prompt: str, label: str = "") -> str:
+    """
+    맵 호출 1건: 세마포어로 동시성 제한 + 호출별 타임아웃 + 지터 포함 지수 백오프 재시도.
+    빈 응답(= watsonx 실패)도 재시도 대상. 최종 실패 시 "" 반환(해당 배치만 누락).
+    타임아웃이 나도 스레드풀의 watsonx 호출은 취소되지 않으므로, 그 호출이 끝날 때까지 슬롯을 놓지 않는다
+    (실제 in-flight 호출 수가 WATSONX_MAP_CONCURRENCY를 넘지 않도록). 늦게라도 결과가 오면 그대로 사용.
+    """
+    sem = _wx_map_semaphore()
+    for attempt in range(WX_MAP_RETRIES + 1):
+        async with sem:
+            task = asyncio.ensure_future(_wx_async(prompt))
+            try:
+                txt = await asyncio.wait_for(asyncio.shield(task), timeout=WX_MAP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("[WX_MAP] timeout %.0fs %s (attempt %d), waiting for in-flight call",
+                               WX_MAP_TIMEOUT, label, attempt + 1)
+                try:
+                    txt = await task
+                except Exception:
+                    txt = ""
+                if (txt or "").strip():
+                    logger.info("[WX_MAP] late result used %s (attempt %d)", label, attempt + 1)
+        if (txt or "").strip():
+            return txt
+        logger.warning("[WX_MAP] empty output %s (attempt %d)", label, attempt + 1)
+        if attempt < WX_MAP_RETRIES:
+            # 대기 중에는 세마포어를 놓아 다른 배치가 진행되도록 함
+            await asyncio.sleep(WX_MAP_BACKOFF * (2 ** attempt) + random.uniform(0, WX_MAP_BACKOFF))
+    logger.error("[WX_MAP] giving up %s after %d attempts", label, WX_MAP_RETRIES + 1)
+    return ""
+
+# 추출 결과 캐시 (Postgres llm_extraction_cache, LRU 정리)
+# COVERAGE_SYS / PREMIUM_SYS / POLICY_META_SYS 또는 *_prompt 빌더를 고치면 버전을 올릴 것
+EXTRACTION_PROMPT_VERSION = "v1"
+LLM_CACHE_ENABLED = os.getenv("LLM_EXTRACTION_CACHE", "1") == "1"
+LLM_CACHE_MAX_ROWS = int(os.getenv("LLM_EXTRACTION_CACHE_MAX_ROWS", "20000"))
+
+def _extraction_key(kind: str, batch_text: str, names: Optional[List[str]] = None) -> str:
+    h = hashlib.sha256()
+    for part in (
+        EXTRACTION_PROMPT_VERSION,
+        str(settings.WATSONX_MODEL_ID),
+        kind,
+        json.dumps(names or [], ensure_ascii=False),
+        batch_text,
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+async def _cache_get(keys: List[str]) -> Dict[str, str]:
+    try:
+        async with AsyncSessionLocal() as session:
+            return await extractionCacheCRUD.get_many(session, keys)
+    except Exception as e:
+        logger.warning("[WX_CACHE] lookup failed: %s", e)
+        return {}
+
+async def _cache_put(kind: str, pairs: List[Tuple[str, str]]) -> None:
+    if not pairs:
+        return
+    rows = [
+        {
+            "cache_key": k,
+            "kind": kind,
+            "model_id": str(settings.WATSONX_MODEL_ID),
+            "prompt_version": EXTRACTION_PROMPT_VERSION,
+            "output": txt,
+        }
+        for k, txt in pairs
+    ]
+    try:
+        async with AsyncSessionLocal() as session:
+            await extractionCacheCRUD.put_many(session, rows)
+            await extractionCacheCRUD.evict_lru(session, LLM_CACHE_MAX_ROWS)
+    except Exception as e:
+        logger.warning("[WX_CACHE] store failed: %s", e)
+
+async def _wx_map(prompts: List[str], label: str = "", keys: Optional[List[str]] = None) -> List[str]:
+    """
+    입력 순서대로 결과를 돌려준다(gather 순서 보존) → reduce 단계의 결정성 유지.
+    keys가 주어지면 캐시에 있는 배치는 재호출하지 않고, 새로 성공한 배치만 저장.
+    """
+    use_cache = LLM_CACHE_ENABLED and keys is not None and len(keys) == len(prompts)
+    results: List[Optional[str]] = [None] * len(prompts)
+    if use_cache:
+        cached = await _cache_get(list(dict.fromkeys(keys)))
+        results = [cached.get(k) for k in keys]
+
+    miss = [i for i, r in enumerate(results) if r is None]
+    fresh = await asyncio.gather(*[
+        _wx_map_call(prompts[i], label=f"{label}#{i}") for i in miss
+    ])
+    for i, txt in zip(miss, fresh):
+        results[i] = txt
+
+    if use_cache:
+        logger.info("[WX_CACHE] %s hit=%d miss=%d", label, len(prompts) - len(miss), len(miss))
+        await _cache_put(label, [(keys[i], txt) for i, txt in zip(miss, fresh) if (txt or "").strip()])
+    return [r or "" for r in results]
+
 async def extract_coverage_batched(base_names: List[str], chunks: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
     name_groups = _pack_name_groups(base_names)
     logger.info("\n[name_groups]"+str(name_groups))
+    # name_group × chunk batch 순서 그대로 프롬프트를 만들고 병렬 실행
+    pairs = [(names, b) for names in name_groups for b in chunks]
+    prompts = [_coverage_prompt(names, b) for names, b in pairs]
+    keys = [_extraction_key("coverage", _chunks_to_context(b), names) for names, b in pairs]
+    texts = await _wx_map(prompts, label="coverage", keys=keys)
     out: List[Dict[str, Any]] = []
-    for names in name_groups:
-        for b in chunks:
-            prompt = _coverage_prompt(names, b)
-            txt = await _wx_async(prompt)
-            arr = extract_json_array(txt)
-            # JSON 타입 방어 (숫자 문자열 -> 숫자)
-            for it in arr:
-                if isinstance(it, dict):
-                    for k in ("coinsurance_pct","deductible_min","per_visit_limit","annual_limit","combined_cap_amount","frequency_limit","coverage_order"):
-                        if k in it and isinstance(it[k], str):
-                            try:
-                                it[k] = float(it[k]) if "." in it[k] else int(it[k])
-                            except Exception:
-                                pass
-            out.extend([x for x in arr if isinstance(x, dict)])
+    for txt in texts:
+        arr = extract_json_array(txt)
+        # JSON 타입 방어 (숫자 문자열 -> 숫자)
+        for it in arr:
+            if isinstance(it, dict):
+                for k in ("coinsurance_pct","deductible_min","per_visit_limit","annual_limit","combined_cap_amount","frequency_limit","coverage_order"):
+                    if k in it and isinstance(it[k], str):
+                        try:
+                            it[k] = float(it[k]) if "." in it[k] else int(it[k])
+                        except Exception:
+                            pass
+        out.extend([x for x in arr if isinstance(x, dict)])
     return out
 
 async def extract_premiums_batched(chunks: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
     batches = chunks
+    texts = await _wx_map(
+        [_premium_prompt(b) for b in batches],
+        label="premium",
+        keys=[_extraction_key("premium", _chunks_to_context(b)) for b in batches],
+    )
     out: List[Dict[str, Any]] = []
-    for b in batches:
-        prompt = _premium_prompt(b)
-        txt = await _wx_async(prompt)
+    for txt in texts:
         arr = extract_json_array(txt)
         for it in arr:
             if isinstance(it, dict):
@@ -1129,7 +1573,7 @@ def _premium_prompt(chunks: List[Dict[str, Any]]) -> str:
 async def extract_policy_meta(chunks: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
     flat = [c for b in chunks for c in b]
     prompt = _policy_meta_prompt(flat)
-    txt = await _wx_async(prompt)
+    txt = (await _wx_map([prompt], label="meta", keys=[_extraction_key("meta", _chunks_to_context(flat))]))[0]
     arr = extract_json_array(txt)
     for it in arr:
         if isinstance(it, dict):
@@ -178,9 +178,8 @@ async def post_message(
         loop = asyncio.get_running_loop()
         async def _finish():
             try:
-                # 1) Retrieve context (OpenSearch) off main loop
-                ctx = await asyncio.to_thread(
-                    search_combined_context,
+                # 1) Retrieve context (OpenSearch, async client)
+                ctx = await search_combined_context(
                     content,
                     assessment_id=assessment.id,
                     user_id=current_user.user_id,
@@ -1,6 +1,7 @@
 # /API/app/routers/chat.py
 import logging
 from fastapi import APIRouter, Depends, Form, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
@@ -11,10 +12,11 @@ import asyncio
 from datetime import datetime
 from app.services.common import Mode
 from app.services import stage
-from app.services import llm_gateway
+from app.services import llm_gateway, message_bus
 from app.schemas import userSchema, chatSchema
 
 from app.crud import chatCRUD
+from app.crud.chatTurnCRUD import ChatTurnRepository
 from app.auth import deps
 from app.database import get_db, AsyncSessionLocal
 from app.services.state_update import process_assistant_message
@@ -67,6 +69,13 @@ async def read_message_state(
     chat_id: int,
     current_user: userSchema.UserRead = Depends(deps.get_current_user),
 ):
+    # 진행 중인 턴은 메모리 버스에서 바로 응답 (DB 조회 없음)
+    entry = message_bus.get_state(chat_id)
+    if entry is not None and entry.get("user_id") is not None and (
+        entry["user_id"] == current_user.user_id or current_user.user_id == 1
+    ):
+        return chatSchema.MessageStateResponse(state=entry["state"])
+
     try:
         # ✅ 별도 세션(짧게 열고 빨리 닫기). 기존 db 세션 대신 사용.
         async with AsyncSessionLocal() as s:
@@ -105,11 +114,50 @@ async def update_message_state(chat_id: int, db: AsyncSession = Depends(get_db))
     try:
         await chatCRUD.update_message_state(db, chat_id, "complete")
         await db.commit()
+        entry = message_bus.get_state(chat_id)
+        await message_bus.publish(chat_id, "complete", user_id=entry.get("user_id") if entry else None)
     except Exception as e:
         # 조용히 무시 (폴링 종료 신호이므로 실패해도 UI흐름 유지)
         pass
     return chatSchema.MessageStateResponse(state="complete")
 
+async def _start_turn(body: AskBody, current_user: userSchema.UserRead, db: AsyncSession) -> ChatTurnRepository:
+    """(필요 시 채팅 생성) + user 메시지 + 비어있는 assistant(commencing) 메시지를 커밋 1번으로 저장"""
+    try:
+        payload_str = json.dumps(
+            body.model_dump() if hasattr(body, "model_dump") else body.__dict__,
+            ensure_ascii=False,
+            default=str
+        )
+    except Exception:
+        # 혹시라도 직렬화 실패 시 문자열 fallback
+        payload_str = str(body)
+    body_logger.info('\n##### [INPUT] #####\n%s',payload_str)
+
+    turn = await ChatTurnRepository.start(
+        db,
+        user_id=current_user.user_id,
+        chat_id=body.chat_id,
+        text=body.text,
+        product_id=body.product_id,
+    )
+    # 디버그: 입력/저장된 policy id 해상 결과 로깅
+    try:
+        body_logger.info(
+            "[POLICY RESOLVE] chat_id=%s incoming.product_id=%s last_assistant.attached_policy_id=%s -> effective=%s",
+            turn.chat_id,
+            getattr(body, "product_id", None),
+            turn.attached_policy_id,
+            turn.effective_policy_id,
+        )
+    except Exception:
+        pass
+
+    # 같은 채팅의 이전 턴 상태(done 등)가 메모리에 남아있지 않도록 즉시 덮어씀
+    await message_bus.publish(turn.chat_id, "commencing", user_id=current_user.user_id)
+    return turn
+
+
 @router.post("/ask")
 async def ask(
     background_tasks: BackgroundTasks,
@@ -119,73 +167,10 @@ async def ask(
 ):
     body = data
     try:
-        try:
-            payload_str = json.dumps(
-                body.model_dump() if hasattr(body, "model_dump") else body.__dict__,
-                ensure_ascii=False,
-                default=str
-            )
-        except Exception:
-            # 혹시라도 직렬화 실패 시 문자열 fallback
-            payload_str = str(body)
-        body_logger.info('\n##### [INPUT] #####\n%s',payload_str)
-
-        # 1) 채팅 시작 시 create_chat
-        if not body.chat_id:
-            newChat = await chatCRUD.create_chat(
-                db,
-                chatSchema.NewChat(
-                    user_id=current_user.user_id,
-                    title=body.text[:30],
-                ),
-            )
-            chat_id = newChat.id
-        else:
-            chat_id = body.chat_id
-        
-        # 메세지 생성 전 attached_policy_id 여부 확인
-        attached_policy_id = await chatCRUD.get_attached_policy_id(db, chat_id)
-        effective_policy_id = attached_policy_id if attached_policy_id is not None else body.product_id
-        # 디버그: 입력/저장된 policy id 해상 결과 로깅
-        try:
-            body_logger.info(
-                "[POLICY RESOLVE] chat_id=%s incoming.product_id=%s last_assistant.attached_policy_id=%s -> effective=%s",
-                chat_id,
-                getattr(body, "product_id", None),
-                attached_policy_id,
-                effective_policy_id,
-            )
-        except Exception:
-            pass
-
-        # 2) user 메시지 즉시 저장
-        await chatCRUD.create_message(
-            db,
-            chatSchema.Message(
-                chat_id=chat_id,
-                role="user",
-                content=body.text,
-                type="general",
-                state="done",
-                attached_policy_id=effective_policy_id,
-            ),
-        )
+        turn = await _start_turn(body, current_user, db)
+        chat_id = turn.chat_id
 
-        # 3) 비어있는 assistant 메시지(commencing) 저장
-        await chatCRUD.create_message(
-            db,
-            chatSchema.Message(
-                chat_id=chat_id,
-                role="assistant",
-                content="",
-                type="",
-                state="commencing",
-                attached_policy_id=effective_policy_id,
-            )
-        )
-        await db.commit()        
-
-        # 4) 백그라운드 태스크로 LLM 처리 예약
+        # 4) 백그라운드 태스크로 LLM 처리 예약 (메시지 id를 명시적으로 전달)
         background_tasks.add_task(
             process_assistant_message,
             chat_id,
@@ -193,7 +178,9 @@ async def ask(
             body.text,
             body.prev_chats,
             body.disease_code,
-            effective_policy_id,
+            turn.effective_policy_id,
+            user_message_id=turn.user_message_id,
+            assistant_message_id=turn.assistant_message_id,
         )
         # 5) 즉시 응답 반환
         return {
@@ -207,3 +194,78 @@ async def ask(
     except Exception as e:
         logger.exception("Server error in /chat/ask: %s", e)
         raise HTTPException(status_code=500, detail="Internal Server Error")
+
+
+# ===================== SSE 스트리밍 =====================
+SSE_PING_SECONDS = 15.0
+# 클라이언트가 끊겨도 답변 생성/저장은 끝까지 진행되도록 태스크 참조 보관
+_stream_tasks: set = set()
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.post("/ask/stream")
+async def ask_stream(
+    data: AskBody,
+    current_user: userSchema.UserRead = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    /ask와 같은 입력. 폴링 대신 text/event-stream으로 바로 전달:
+      start → state(classifying/searching/building/streaming) → token(여러 번) → done | error
+    최종 답변/상태는 기존과 동일하게 DB에 저장되므로 /messages, /messageState도 그대로 사용 가능.
+    """
+    body = data
+    try:
+        turn = await _start_turn(body, current_user, db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Server error in /chat/ask/stream: %s", e)
+        raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    chat_id = turn.chat_id
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_event(event: str, payload: Dict[str, Any]) -> None:
+        await queue.put((event, payload))
+
+    task = asyncio.create_task(
+        process_assistant_message(
+            chat_id,
+            current_user.user_id,
+            body.text,
+            body.prev_chats,
+            body.disease_code,
+            turn.effective_policy_id,
+            user_message_id=turn.user_message_id,
+            assistant_message_id=turn.assistant_message_id,
+            on_event=on_event,
+        )
+    )
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+
+    async def event_gen():
+        yield _sse_event("start", {"chat_id": chat_id, "state": "commencing"})
+        while True:
+            try:
+                event, payload = await asyncio.wait_for(queue.get(), timeout=SSE_PING_SECONDS)
+            except asyncio.TimeoutError:
+                if task.done() and queue.empty():
+                    yield _sse_event("error", {"state": "failed"})
+                    return
+                # 프록시 idle 타임아웃 방지용 주석 라인
+                yield ": ping\n\n"
+                continue
+            yield _sse_event(event, payload)
+            if event in ("done", "error"):
+                return
+
+    return StreamingResponse(
+        event_gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,8 @@
 import logging
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException ,Query
-from app.services.ocr import ocr_file
-from app.services.ingest import ingest_policy
+from app.services.ocr import _read_upload
+from app.services import ingest_queue
+from app.services.ingest import ingest_policy, report_summary
 from app.auth import deps
 from app.schemas import userSchema
 from app.services.vector_db import add_document, search_documents
@@ -11,7 +12,7 @@ from pydantic import BaseModel
 router = APIRouter(prefix="/documents", tags=["documents"])
 logger = logging.getLogger(__name__)
 
-@router.post("/")
+@router.post("/", status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     policy_id: str = Form(...),
@@ -22,9 +23,7 @@ async def upload_document(
     current_user: userSchema.UserRead = Depends(deps.get_current_user),
 ):
     try:
-        ocr_text = await ocr_file(file)
-        logger.info("[ROUTER] OCR extracted %s chars", len(ocr_text))
-
+        data, mime, filename = await _read_upload(file)
         meta = {
             "policy_id": policy_id,
             "insurer": insurer,
@@ -34,16 +33,15 @@ async def upload_document(
             "uploader_id": current_user.user_id,
             "filename": file.filename,
         }
-
-        indexed = await ingest_policy(ocr_text, meta)
-        logger.info("[ROUTER] OpenSearch indexed %s docs policy_id=%s", indexed, policy_id)
-
-        if file.filename and file.filename.lower().endswith(".pdf"):
-            add_document(ocr_text, meta)
-
-        return {"indexed": indexed, "policy_id": policy_id}
+        # OCR/청킹/색인은 작업 큐 워커가 처리 → 진행 상황은 GET /jobs/{job_id}
+        job = await ingest_queue.enqueue(
+            user_id=current_user.user_id, kind="document",
+            filename=filename, mime=mime, data=data, meta=meta,
+        )
+        logger.info("[ROUTER] ingest job queued id=%s policy_id=%s", job.id, policy_id)
+        return {"job_id": job.id, "status": job.status, "policy_id": policy_id}
     except Exception as exc:
-        logger.exception("[ROUTER] Ingest failed: %s", exc)
+        logger.exception("[ROUTER] Ingest enqueue failed: %s", exc)
         raise HTTPException(status_code=500, detail="Ingestion failed") from exc
 
 class ManualDocument(BaseModel):
@@ -69,8 +67,9 @@ async def add_document_manual(
         "uploader_id": current_user.user_id,
     }
     doc_id = add_document(doc.text, meta)
-    indexed = await ingest_policy(doc.text, meta)
-    return {"doc_id": doc_id, "indexed": indexed}
+    report: dict = {}
+    indexed = await ingest_policy(doc.text, meta, report=report)
+    return {"doc_id": doc_id, "indexed": indexed, "ingest": report_summary(report)}
 
 
 @router.get("/search")
@@ -78,5 +77,5 @@ async def search_document(
     query: str = Query(..., description="검색어"),
     current_user: userSchema.UserRead = Depends(deps.get_current_user),
 ):
-    results = search_policies(query)
+    results = await search_policies(query)
     return {"results": results}
\ No newline at end of file
@@ -0,0 +1,33 @@
+# app/routers/jobs.py
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import deps
+from app.crud import ingestJobCRUD
+from app.database import get_db
+from app.schemas import ingestJobSchema, userSchema
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/", response_model=List[ingestJobSchema.IngestJobRead])
+async def list_jobs(
+    limit: int = 20,
+    db: AsyncSession = Depends(get_db),
+    current_user: userSchema.UserRead = Depends(deps.get_current_user),
+):
+    return await ingestJobCRUD.list_for_user(db, current_user.user_id, limit=min(max(limit, 1), 100))
+
+
+@router.get("/{job_id}", response_model=ingestJobSchema.IngestJobRead)
+async def get_job(
+    job_id: str,
+    db: AsyncSession = Depends(get_db),
+    current_user: userSchema.UserRead = Depends(deps.get_current_user),
+):
+    job = await ingestJobCRUD.get_job(db, job_id)
+    if job is None or job.user_id != current_user.user_id:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
@@ -1,5 +1,5 @@
 # ====== [ADD] policy_id 기반 preview → LLM 추출 → DB 적재 ======
-import os, json, logging
+import os, json, logging, asyncio
 from typing import Any, Dict, List, Optional
 from fastapi import Body
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -23,8 +23,8 @@ from app.models.policyModel import InsurancePolicy
 # LLM
 from app.services.llm_gateway import call_llm
 
-# OpenSearch (ingest의 헬퍼 재사용)
-from app.services.ingest import _os_client
+# OpenSearch (공용 클라이언트)
+from app.services.os_client import get_read_client
 from app.config import settings
 
 try:
@@ -33,11 +33,11 @@ try:
 except Exception:
     HAS_RAPIDFUZZ = False
 import logging
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from app.services.ocr import extract_diagnosis_fields, ocr_file
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Response
+from app.services.ocr import extract_diagnosis_fields, _read_upload
+from app.services import ingest_queue
 from app.services.assessment_ingest import analyze_text_with_gpt4o, index_assessment_entries
-from app.services.ingest import ingest_policy, preview_policy
-from app.services.vector_db import add_document
+from app.services.ingest import preview_policy
 from app.auth import deps
 from app.schemas import userSchema
 
@@ -94,7 +94,7 @@ def _ensure_json_array(text: str) -> List[Dict[str, Any]]:
     return []
 
 def _fetch_policy_chunks(policy_id: str, limit: int = 3000) -> List[Dict[str, Any]]:
-    client = _os_client()
+    client = get_read_client()
     index = settings.OPENSEARCH_INDEX
     body = {
         "size": limit,
@@ -146,8 +146,12 @@ async def preview_from_policy(
     id_by_name = {c.name: c.id for c in base_items}
     # (4) LLM 추출
     chunk_batches = _pack_batches_by_tokens(chunks_src)
-    cov_raw = await extract_coverage_batched(base_names, chunk_batches)
-    prem_raw = await extract_premiums_batched(chunk_batches)
+    # coverage / premium / meta 추출을 동시에 실행 (watsonx 동시 호출 수는 맵 세마포어가 제한)
+    cov_raw, prem_raw, meta_raw = await asyncio.gather(
+        extract_coverage_batched(base_names, chunk_batches),
+        extract_premiums_batched(chunk_batches),
+        extract_policy_meta(chunk_batches),
+    )
     # 3) REDUCE: 서버 쪽 결정적 병합
     cov_rows = reduce_coverage(cov_raw)
     prem_rows = reduce_premiums(prem_raw)
@@ -213,7 +217,7 @@ async def preview_from_policy(
 
     cov_rows = _norm_cov(cov_rows)
     prem_rows = _norm_prem(prem_rows)
-    meta_row = _norm_meta(await extract_policy_meta(chunk_batches))
+    meta_row = _norm_meta(meta_raw)
     for k, v in meta_row.items():
         setattr(pol, k, v)
     # (5) DB write
@@ -283,25 +287,28 @@ async def preview_from_policy(
 
 @router.post("/")
 async def handle_ocr(
+    response: Response,
     file: UploadFile = File(...),
     current_user: userSchema.UserRead = Depends(deps.get_current_user),
 ):
     try:
         filename = (file.filename or "").lower()
         if filename.endswith(".pdf"):
-            text = await ocr_file(file)
+            data, mime, _ = await _read_upload(file)
             product_id = f"{current_user.user_id}-{file.filename}"
             meta = {
                 "policy_id": product_id,
                 "uploader_id": current_user.user_id,
                 "filename": file.filename,
             }
-            try:
-                await ingest_policy(text, meta)
-            except Exception as e:
-                logger.warning("[OCR] ingest failed: %s", e)
-            add_document(text, meta)
-            return {"result_code": "SUCCESS", "product_id": product_id}
+            # OCR/색인은 작업 큐에서 (진행 상황: GET /jobs/{job_id})
+            job = await ingest_queue.enqueue(
+                user_id=current_user.user_id, kind="ocr_policy",
+                filename=file.filename, mime=mime, data=data, meta=meta,
+            )
+            # /documents와 같이 202: 색인 완료 전이므로 클라이언트는 job이 done이 된 뒤 product_id를 사용
+            response.status_code = 202
+            return {"result_code": "SUCCESS", "product_id": product_id, "job_id": job.id, "status": job.status}
         # 이미지(진단서 등) 처리 경로
         fields = await extract_diagnosis_fields(file)
         try:
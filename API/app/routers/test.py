@@ -2,37 +2,20 @@
 
 from typing import Any, Dict, List, Optional
 
-import boto3
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
 from pydantic import BaseModel, Field
 import asyncio
 import logging
 import os
 
+from app.auth import deps
 from app.config import settings
+from app.schemas import userSchema
 
-# 1) OpenSearch 클라이언트 준비
-#    - 프로젝트에 이미 공용 클라이언트가 있으면 그걸 import 하세요.
-#      예: from app.search.os_client import os_client, OS_INDEX
-#    - 없으면 아래 간이 클라이언트를 사용하세요.
-try:
-    # 공용 클라이언트가 있다면 여기로 교체
-    from app.search.os_client import os_client, OS_INDEX  # type: ignore
-except Exception:
-    from opensearchpy import OpenSearch, AWSV4SignerAuth, RequestsHttpConnection  # pip install opensearch-py
-
-    region = getattr(settings, "OPENSEARCH_REGION", os.getenv("OPENSEARCH_REGION", "us-east-1"))
-    auth = AWSV4SignerAuth(boto3.Session().get_credentials(), region, "es")
-    host = getattr(settings, "OPENSEARCH_HOST", os.getenv("OPENSEARCH_HOST"))
-    port = int(getattr(settings, "OPENSEARCH_PORT", os.getenv("OPENSEARCH_PORT", "443")))
-    os_client =  OpenSearch(
-        hosts=[{"host": host, "port": port}],
-        http_auth=auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-    )
-    OS_INDEX = getattr(settings, "OPENSEARCH_INDEX", None)
+# 1) OpenSearch 클라이언트: 프로세스 공용 read 클라이언트 사용
+from app.services.os_client import get_read_client
+
+OS_INDEX = getattr(settings, "OPENSEARCH_INDEX", None)
 
 logger = logging.getLogger(__name__)
 try:
@@ -142,7 +125,7 @@ async def debug_policy_search(payload: PolicySearchIn):
     )
     try:
         # IO 블로킹을 thread로
-        res = await asyncio.to_thread(os_client.search, index=OS_INDEX, body=body)
+        res = await asyncio.to_thread(get_read_client().search, index=OS_INDEX, body=body)
     except Exception as e:
         logger.exception("OpenSearch policy-scoped search failed")
         raise HTTPException(status_code=500, detail=f"OpenSearch 검색 실패: {e}")
@@ -190,3 +173,152 @@ async def debug_policy_search(payload: PolicySearchIn):
         sources_str=sources_str,
         docs=docs,
     )
+
+
+@router.get("/debug/watsonx-health", tags=["debug"])
+async def debug_watsonx_health(current_user: userSchema.UserRead = Depends(deps.get_current_user)):
+    """캐시된 watsonx 모델 핸들의 상태(생성 후 경과/연속 실패/재연결 횟수)."""
+    from app.rag.retriever import wx_health
+    return wx_health()
+
+
+@router.get("/debug/rule-classifier", tags=["debug"])
+async def debug_rule_classifier(q: Optional[str] = None, disease_code: Optional[str] = None):
+    """규칙 선분류 통계(적중률/LLM 일치율). q를 주면 해당 문장의 규칙 판정도 함께."""
+    from app.services.common import rule_classifier_stats, rule_classify
+    out: Dict[str, Any] = {"stats": rule_classifier_stats()}
+    if q:
+        d = rule_classify(q, disease_code)
+        out["decision"] = None if d is None else {
+            "flow": d.flow.value, "confidence": d.confidence, "reasons": d.reasons,
+            "entities": d.entities, "use_retrieval": d.use_retrieval,
+        }
+    return out
+
+
+@router.get("/debug/answer-cache", tags=["debug"])
+async def debug_answer_cache(current_user: userSchema.UserRead = Depends(deps.get_current_user)):
+    """GENERAL/TERMS 답변 캐시 적중/저장/무효화 통계."""
+    from app.services.answer_cache import stats
+    return stats()
+
+
+@router.get("/debug/search-cache", tags=["debug"])
+async def debug_search_cache(current_user: userSchema.UserRead = Depends(deps.get_current_user)):
+    """OpenSearch 검색 결과 캐시 통계 (적중/미스/공유/무효화)."""
+    from app.services.search_cache import stats
+    return stats()
+
+
+async def paid_debug_user(
+    current_user: userSchema.UserRead = Depends(deps.get_current_user),
+) -> userSchema.UserRead:
+    """유료 LLM 호출 디버그 엔드포인트: DEBUG_PAID_ENDPOINTS가 켜져 있고 로그인한 사용자만."""
+    if not settings.DEBUG_PAID_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return current_user
+
+
+class RagABIn(BaseModel):
+    query: str
+    product_id: Optional[str] = None
+    mode: str = Field("REFUND", description="REFUND | TERMS")
+    answer_modes: List[str] = Field(default_factory=lambda: ["generate", "context", "extractive"])
+    final_llm: bool = Field(True, description="최종 gpt 답변까지 생성해 턴 전체 지연을 측정")
+    rounds: int = Field(1, ge=1, le=5, description="반복 횟수 (라운드마다 모드 순서를 회전해 캐시 영향 상쇄)")
+
+
+@router.post("/debug/rag-ab", tags=["debug"])
+async def debug_rag_ab(body: RagABIn, current_user: userSchema.UserRead = Depends(paid_debug_user)):
+    """
+    retrieve() answer_mode별 A/B: 검색/중간 생성/최종 LLM 소요 시간과 컨텍스트 토큰, 답변을 나란히 비교.
+    품질은 answers를 눈으로(또는 별도 평가로) 비교한다. 검색 범위(개인 업로드)는 로그인한 사용자 기준.
+    """
+    import time
+    from app.rag.retriever import retrieve, ANSWER_MODES
+    from app.services.common import Mode
+    from app.services.startend import build_messages
+    from app.services import llm_gateway
+
+    try:
+        mode = Mode(body.mode.upper())
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"unknown mode: {body.mode}")
+    modes = [m for m in body.answer_modes if m in ANSWER_MODES]
+    if not modes:
+        raise HTTPException(status_code=400, detail=f"answer_modes must be in {ANSWER_MODES}")
+
+    runs: Dict[str, List[Dict[str, Any]]] = {m: [] for m in modes}
+    for r in range(body.rounds):
+        order = modes[r % len(modes):] + modes[:r % len(modes)]
+        for am in order:
+            stats: Dict[str, Any] = {}
+            t0 = time.perf_counter()
+            block = await retrieve(
+                mode=mode, user_id=str(current_user.user_id), query=body.query, product_id=body.product_id,
+                limit=20, fallback_to_global=True, answer_mode=am, stats=stats,
+            )
+            t1 = time.perf_counter()
+            answer, final_ms = None, 0.0
+            if body.final_llm:
+                answer = await llm_gateway.call_llm(build_messages(mode=mode, user_text=body.query, context=block))
+                final_ms = round((time.perf_counter() - t1) * 1000, 1)
+            runs[am].append({
+                **stats,
+                "retrieve_ms": round((t1 - t0) * 1000, 1),
+                "final_llm_ms": final_ms,
+                "turn_ms": round((time.perf_counter() - t0) * 1000, 1),
+                "context_chars": len(block or ""),
+                "context": (block or "")[:2000],
+                "answer": answer,
+            })
+
+    summary = {
+        am: {
+            "mean_turn_ms": round(sum(x["turn_ms"] for x in rs) / len(rs), 1),
+            "mean_retrieve_ms": round(sum(x["retrieve_ms"] for x in rs) / len(rs), 1),
+            "mean_context_tokens": round(sum(x.get("context_tokens", 0) for x in rs) / len(rs), 1),
+        }
+        for am, rs in runs.items() if rs
+    }
+    return {"summary": summary, "runs": runs}
+
+
+@router.get("/debug/ingest-progress", tags=["debug"])
+async def debug_ingest_progress(
+    key: Optional[str] = None,
+    current_user: userSchema.UserRead = Depends(deps.get_current_user),
+):
+    """내 약관 색인 진행 상황 (key 없으면 최근 작업 목록) + bulk 처리량 지표(전역 수치만)."""
+    from app.services import bulk_engine
+    if key is not None:
+        rec = bulk_engine.get_progress(key)
+        if rec is None or rec.get("user_id") != current_user.user_id:
+            raise HTTPException(status_code=404, detail="unknown ingest key")
+        return rec
+    mine = [r for r in bulk_engine.get_progress() if r.get("user_id") == current_user.user_id]
+    return {"jobs": mine, "stats": bulk_engine.stats()}
+
+
+@router.post("/debug/ocr-bench", tags=["debug"])
+async def debug_ocr_bench(
+    files: List[UploadFile] = File(...),
+    max_pages: int = 3,
+    show_text: bool = False,
+    current_user: userSchema.UserRead = Depends(paid_debug_user),
+):
+    """
+    비전 OCR 입력 준비 A/B: 기존 300dpi 컬러 PNG vs 자동 DPI/흑백/JPEG/여백 제거/분할.
+    업로드 바이트/비전 지연/프롬프트 토큰과 기존 결과 대비 텍스트 유사도를 비교 (정답 비교는 CLI: python -m app.services.ocr_bench).
+    """
+    from app.services.ocr import _read_upload
+    from app.services.ocr_bench import bench_sample, summarize
+
+    rows: List[Dict[str, Any]] = []
+    for f in files:
+        data, mime, filename = await _read_upload(f)
+        rows.extend(await bench_sample(filename or "upload", data, mime, None, max(1, min(10, max_pages))))
+    if not show_text:
+        for r in rows:
+            r.pop("text", None)
+    return {"summary": summarize(rows), "runs": rows}
@@ -0,0 +1,26 @@
+# app/schemas/ingestJobSchema.py
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+class IngestJobRead(BaseModel):
+    id: str
+    kind: str
+    status: str
+    stage: Optional[str] = None
+    filename: Optional[str] = None
+    pages_total: int = 0
+    pages_done: int = 0
+    chunks_total: int = 0
+    chunks_done: int = 0
+    attempts: int = 0
+    max_attempts: int = 0
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
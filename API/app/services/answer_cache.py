@@ -0,0 +1,99 @@
+# app/services/answer_cache.py
+"""
+GENERAL/TERMS 반복 질문용 답변 캐시 (프로세스 메모리, LRU + TTL).
+
+키: 정규화된 질문 + policy_id (+ 모드는 값에 기록)
+유효성: 저장 당시의 정책 문서 세대(generation)와 현재 세대가 같아야 함
+       → ingest_policy로 약관이 다시 색인되면 invalidate_policy()로 세대를 올려 자동 무효화
+대화 이력/개인 업로드 자료에 의존하는 답변은 저장하지 않는다 (stage에서 판단).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ANSWER_CACHE", "1") == "1"
+TTL = float(os.getenv("ANSWER_CACHE_TTL", str(6 * 3600)))
+MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX", "5000"))
+CACHEABLE_MODES = {"GENERAL", "TERMS"}
+
+_GLOBAL = "*"
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_generations: Dict[str, int] = {}
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+_WS_RE = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    t = unicodedata.normalize("NFKC", text or "").lower()
+    t = _PUNCT_RE.sub(" ", t)
+    return _WS_RE.sub(" ", t).strip()
+
+
+def _gen(policy_id: Optional[str]) -> str:
+    # 정책별 세대 + 전역 세대 (전역은 어떤 정책이든 재색인되면 증가)
+    return f"{_generations.get(str(policy_id or ''), 0)}.{_generations.get(_GLOBAL, 0)}"
+
+
+def make_key(text: str, policy_id: Optional[str]) -> Optional[str]:
+    q = normalize_question(text)
+    if not q:
+        return None
+    return hashlib.sha256(f"{q}\x00{policy_id or ''}".encode("utf-8")).hexdigest()
+
+
+def get(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """{"mode", "answer"} 또는 None"""
+    if not ENABLED or not key:
+        return None
+    e = _cache.get(key)
+    if e is None or time.time() - e["ts"] > TTL or e["gen"] != _gen(e["policy_id"]):
+        if e is not None:
+            _cache.pop(key, None)
+        _stats["misses"] += 1
+        return None
+    _cache.move_to_end(key)
+    _stats["hits"] += 1
+    return {"mode": e["mode"], "answer": e["answer"]}
+
+
+def put(key: Optional[str], *, mode: str, answer: str, policy_id: Optional[str]) -> None:
+    if not ENABLED or not key or not (answer or "").strip() or mode not in CACHEABLE_MODES:
+        return
+    _cache[key] = {
+        "mode": mode,
+        "answer": answer,
+        "policy_id": policy_id,
+        "gen": _gen(policy_id),
+        "ts": time.time(),
+    }
+    _cache.move_to_end(key)
+    _stats["stores"] += 1
+    while len(_cache) > MAX_ENTRIES:
+        _cache.popitem(last=False)
+
+
+def invalidate_policy(policy_id: Optional[str]) -> None:
+    """약관 재색인 시 호출: 해당 정책(및 전역) 답변을 무효화."""
+    if policy_id:
+        _generations[str(policy_id)] = _generations.get(str(policy_id), 0) + 1
+    _generations[_GLOBAL] = _generations.get(_GLOBAL, 0) + 1
+    _stats["invalidations"] += 1
+    logger.info("[ANSWER_CACHE] invalidated policy=%s", policy_id)
+
+
+def stats() -> Dict[str, Any]:
+    st = dict(_stats)
+    st["entries"] = len(_cache)
+    st["enabled"] = ENABLED
+    return st
@@ -7,10 +7,11 @@ import logging
 from typing import Any, Dict, List, Optional
 
 from openai import OpenAI
-from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth, helpers
-import boto3
+from opensearchpy import helpers
 
 from app.config import settings
+from app.services import search_cache
+from app.services.os_client import get_bulk_client, search_async
 
 logger = logging.getLogger(__name__)
 
@@ -18,29 +19,6 @@ logger = logging.getLogger(__name__)
 _oa_client = OpenAI()
 
 
-def _os_client() -> OpenSearch:
-    region = getattr(settings, "OPENSEARCH_REGION", "us-east-1")
-    host = settings.OPENSEARCH_HOST
-    # Prefer AWS SigV4 if credentials available, else basic auth
-    creds = boto3.Session().get_credentials()
-    if creds is not None:
-        auth = AWSV4SignerAuth(creds, region, "es")
-    else:
-        auth = (settings.OPENSEARCH_USERNAME, settings.OPENSEARCH_PASSWORD)
-
-    return OpenSearch(
-        hosts=[{"host": host, "port": int(getattr(settings, "OPENSEARCH_PORT", 443))}],
-        http_auth=auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=int(getattr(settings, "OPENSEARCH_CLIENT_TIMEOUT", 120)),
-        max_retries=int(getattr(settings, "OPENSEARCH_MAX_RETRIES", 3)),
-        retry_on_timeout=True,
-        http_compress=True,
-    )
-
-
 KNOWLEDGE_SYS = (
     "당신은 보험 청구/심사 내역을 구조화하는 전문가입니다.\n"
     "첨부된 문서(이미지 또는 텍스트)에서 상담과 판단에 유용한 '엔트리'를 추출하세요.\n"
@@ -145,7 +123,7 @@ def index_assessment_entries(entries: List[Dict[str, Any]], meta: Dict[str, Any]
     if not entries:
         return 0
 
-    client = _os_client()
+    client = get_bulk_client()
     index = settings.OPENSEARCH_INDEX
     pipeline = getattr(settings, "OPENSEARCH_PIPELINE", None)
 
@@ -181,11 +159,16 @@ def index_assessment_entries(entries: List[Dict[str, Any]], meta: Dict[str, Any]
     )
     if errors:
         logger.error("[assessment_ingest] OpenSearch bulk errors (first 3): %s", errors[:3])
+    # 새 user_knowledge가 들어왔으므로 검색 결과 캐시 무효화 (refresh 뒤에 해야 새 버전 키에 옛 결과가 안 들어감)
+    try:
+        client.indices.refresh(index=index)
+    except Exception as e:
+        logger.warning("[assessment_ingest] OpenSearch refresh failed index=%s: %s", index, e)
+    search_cache.bump(index)
     return int(success)
 
 
-def search_combined_context(query: str, *, assessment_id: int, user_id: int, insurer: Optional[str] = None, product_id: Optional[str] = None, size: int = 10) -> Dict[str, Any]:
-    client = _os_client()
+async def search_combined_context(query: str, *, assessment_id: int, user_id: int, insurer: Optional[str] = None, product_id: Optional[str] = None, size: int = 10, timeout: Optional[float] = None) -> Dict[str, Any]:
     index = settings.OPENSEARCH_INDEX
 
     should: List[Dict[str, Any]] = []
@@ -218,7 +201,7 @@ def search_combined_context(query: str, *, assessment_id: int, user_id: int, ins
         "query": {"bool": {"should": should}},
         "_source": True,
     }
-    resp = client.search(index=index, body=body)
+    resp = await search_async(index=index, body=body, timeout=timeout)
     hits = resp.get("hits", {}).get("hits", []) or []
     return {
         "hits": [h.get("_source", {}) for h in hits],
@@ -0,0 +1,279 @@
+# app/services/bulk_engine.py
+"""
+OpenSearch 병렬 bulk 색인 엔진 (동기 코드 → 호출 측에서 asyncio.to_thread로 이벤트 루프 밖에서 실행).
+
+- 배치 크기 적응(AIMD): 응답 지연이 목표보다 짧으면 키우고, 길거나 429(Too Many Requests)면 줄임
+- 동시 전송은 BULK_CONCURRENCY개까지만 (in-flight 상한 = 백프레셔)
+- 429 / 연결 오류 항목은 지수 백오프 후 재시도, 그 외 오류는 항목별 실패로 기록
+- 항목별 결과를 on_item 콜백으로 넘기고, 문서(작업)별 진행 상황과 전역 처리량 지표를 메모리에 기록
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from opensearchpy import TransportError, helpers
+from opensearchpy.exceptions import ConnectionError as OSConnectionError
+
+logger = logging.getLogger(__name__)
+
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", "4"))
+BULK_BATCH_START = int(os.getenv("BULK_BATCH_START", "50"))
+BULK_BATCH_MIN = int(os.getenv("BULK_BATCH_MIN", "5"))
+BULK_BATCH_MAX = int(os.getenv("BULK_BATCH_MAX", "500"))
+BULK_TARGET_SECONDS = float(os.getenv("BULK_TARGET_SECONDS", "5"))  # 배치당 목표 지연
+BULK_MAX_RETRIES = int(os.getenv("BULK_MAX_RETRIES", "5"))
+BULK_BACKOFF_BASE = float(os.getenv("BULK_BACKOFF_BASE", "1.0"))
+PROGRESS_KEEP = int(os.getenv("BULK_PROGRESS_KEEP", "200"))
+
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+_lock = threading.Lock()
+_metrics: Dict[str, float] = {
+    "docs": 0, "failed": 0, "bytes": 0, "batches": 0, "retries": 0, "throttled": 0, "busy_seconds": 0.0,
+}
+_progress: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+# ---------------- 진행 상황 / 지표 ----------------
+
+def start_progress(key: str, **info: Any) -> Dict[str, Any]:
+    rec = {
+        "key": key, "state": "running", "total": 0, "done": 0, "failed": 0,
+        "batch_size": BULK_BATCH_START, "docs_per_sec": 0.0,
+        "started_at": time.time(), "finished_at": None, **info,
+    }
+    with _lock:
+        _progress[key] = rec
+        _progress.move_to_end(key)
+        while len(_progress) > PROGRESS_KEEP:
+            _progress.popitem(last=False)
+    return rec
+
+
+def update_progress(key: str, **fields: Any) -> None:
+    with _lock:
+        rec = _progress.get(key)
+        if rec is not None:
+            rec.update(fields)
+
+
+def get_progress(key: Optional[str] = None) -> Any:
+    """key가 있으면 해당 작업 기록, 없으면 최근 작업 목록(최신 순)."""
+    with _lock:
+        if key is not None:
+            rec = _progress.get(key)
+            return dict(rec) if rec else None
+        return [dict(r) for r in reversed(_progress.values())]
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        st = dict(_metrics)
+    busy = st["busy_seconds"] or 0.0
+    st["docs_per_sec"] = round(st["docs"] / busy, 2) if busy else 0.0
+    st["concurrency"] = BULK_CONCURRENCY
+    return st
+
+
+def _count(**inc: float) -> None:
+    with _lock:
+        for k, v in inc.items():
+            _metrics[k] = _metrics.get(k, 0) + v
+
+
+# ---------------- 배치 크기 제어 ----------------
+
+class _BatchSizer:
+    """지연/429 기반 AIMD. 여러 워커가 공유하므로 락으로 보호."""
+
+    def __init__(self, start: int):
+        self.size = max(BULK_BATCH_MIN, min(BULK_BATCH_MAX, start))
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, throttled: bool) -> None:
+        with self._lock:
+            if throttled or seconds > BULK_TARGET_SECONDS * 1.5:
+                self.size = max(BULK_BATCH_MIN, int(self.size * 0.5))
+            elif seconds > BULK_TARGET_SECONDS:
+                self.size = max(BULK_BATCH_MIN, int(self.size * 0.8))
+            elif seconds < BULK_TARGET_SECONDS * 0.5:
+                self.size = min(BULK_BATCH_MAX, self.size + max(1, self.size // 4))
+
+
+# ---------------- 전송 ----------------
+
+def _encode(action: Dict[str, Any]) -> Tuple[str, int]:
+    meta, data = helpers.expand_action(dict(action))
+    lines = [json.dumps(meta, ensure_ascii=False)]
+    if data is not None:
+        lines.append(json.dumps(data, ensure_ascii=False, default=str))
+    body = "\n".join(lines) + "\n"
+    return body, len(body.encode("utf-8"))
+
+
+def _send(client, batch: List[Tuple[Dict[str, Any], str]], params: Dict[str, Any]) -> Tuple[float, Any]:
+    t0 = time.perf_counter()
+    try:
+        resp = client.bulk(body="".join(b for _, b in batch), **params)
+    except (TransportError, OSConnectionError) as e:
+        return time.perf_counter() - t0, e
+    return time.perf_counter() - t0, resp
+
+
+def _status_of(exc: Exception) -> Optional[int]:
+    st = getattr(exc, "status_code", None)
+    return st if isinstance(st, int) else None
+
+
+def run_bulk(
+    client,
+    actions: List[Dict[str, Any]],
+    *,
+    pipeline: Optional[str] = None,
+    request_timeout: Optional[int] = None,
+    max_chunk_bytes: int = 1_000_000,
+    progress_key: Optional[str] = None,
+    on_item: Optional[Callable[[bool, Dict[str, Any]], None]] = None,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    actions를 적응형 배치로 병렬 전송. 반환: (성공 수, 실패 항목 목록) — helpers.bulk와 같은 모양.
+    on_item(ok, item): 항목마다 호출 (item = {"index": {...응답...}} 형태).
+    """
+    queue: Deque[Tuple[Dict[str, Any], str, int, int]] = deque()  # (action, body, bytes, attempt)
+    for a in actions:
+        body, size = _encode(a)
+        queue.append((a, body, size, 0))
+    total = len(queue)
+    if progress_key:
+        update_progress(progress_key, total=total)
+
+    params: Dict[str, Any] = {}
+    if pipeline:
+        params["pipeline"] = pipeline
+    if request_timeout:
+        params["request_timeout"] = request_timeout
+
+    sizer = _BatchSizer(BULK_BATCH_START)
+    success = 0
+    errors: List[Dict[str, Any]] = []
+    done = 0
+    retry_at: List[Tuple[float, Tuple[Dict[str, Any], str, int, int]]] = []
+    t_start = time.perf_counter()
+
+    def _finish(ok: bool, item: Dict[str, Any]) -> None:
+        nonlocal success, done
+        done += 1
+        if ok:
+            success += 1
+        else:
+            errors.append(item)
+        if on_item is not None:
+            try:
+                on_item(ok, item)
+            except Exception as e:
+                logger.warning("[BULK] on_item callback failed: %s", e)
+
+    def _retry_or_fail(entry, item: Dict[str, Any]) -> None:
+        action, body, size, attempt = entry
+        if attempt < BULK_MAX_RETRIES:
+            delay = BULK_BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random())
+            retry_at.append((time.monotonic() + delay, (action, body, size, attempt + 1)))
+            _count(retries=1)
+        else:
+            _finish(False, item)
+
+    def _next_batch() -> List[Tuple[Dict[str, Any], str, int, int]]:
+        # 백오프가 끝난 재시도 항목을 큐 앞으로
+        now = time.monotonic()
+        ready = [e for t, e in retry_at if t <= now]
+        if ready:
+            retry_at[:] = [(t, e) for t, e in retry_at if t > now]
+            queue.extendleft(reversed(ready))
+        batch: List[Tuple[Dict[str, Any], str, int, int]] = []
+        nbytes = 0
+        while queue and len(batch) < sizer.size:
+            if batch and nbytes + queue[0][2] > max_chunk_bytes:
+                break
+            e = queue.popleft()
+            batch.append(e)
+            nbytes += e[2]
+        return batch
+
+    with ThreadPoolExecutor(max_workers=max(1, BULK_CONCURRENCY), thread_name_prefix="bulk") as pool:
+        inflight: Dict[Any, List[Tuple[Dict[str, Any], str, int, int]]] = {}
+        while queue or retry_at or inflight:
+            # in-flight 상한까지 채움
+            while len(inflight) < BULK_CONCURRENCY:
+                batch = _next_batch()
+                if not batch:
+                    break
+                fut = pool.submit(_send, client, [(e[0], e[1]) for e in batch], params)
+                inflight[fut] = batch
+            if not inflight:
+                # 재시도 대기만 남음
+                wake = min(t for t, _ in retry_at)
+                time.sleep(max(0.0, min(1.0, wake - time.monotonic())))
+                continue
+
+            finished, _ = wait(list(inflight), timeout=1.0, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                batch = inflight.pop(fut)
+                seconds, resp = fut.result()
+                nbytes = sum(e[2] for e in batch)
+                _count(batches=1, bytes=nbytes, busy_seconds=seconds)
+
+                if isinstance(resp, Exception):
+                    status = _status_of(resp)
+                    throttled = status == 429
+                    sizer.observe(seconds, throttled=True)
+                    if throttled:
+                        _count(throttled=1)
+                    logger.warning("[BULK] batch of %d failed status=%s: %s", len(batch), status, resp)
+                    for e in batch:
+                        op = e[0].get("_op_type", "index")
+                        item = {op: {"_id": e[0].get("_id"), "status": status or 0, "error": str(resp)}}
+                        if status is None or status in _RETRY_STATUSES:
+                            _retry_or_fail(e, item)
+                        else:
+                            _finish(False, item)
+                    continue
+
+                items = resp.get("items", []) if isinstance(resp, dict) else []
+                throttled = False
+                for e, item in zip(batch, items):
+                    op, res = next(iter(item.items()))
+                    status = res.get("status", 0)
+                    if status == 429:
+                        throttled = True
+                    if 200 <= status < 300 or (op == "delete" and status == 404):
+                        _finish(True, item)
+                    elif status in _RETRY_STATUSES:
+                        _retry_or_fail(e, item)
+                    else:
+                        _finish(False, item)
+                if throttled:
+                    _count(throttled=1)
+                sizer.observe(seconds, throttled=throttled)
+
+            if progress_key:
+                elapsed = time.perf_counter() - t_start
+                update_progress(
+                    progress_key, done=done, failed=len(errors), batch_size=sizer.size,
+                    docs_per_sec=round(done / elapsed, 2) if elapsed else 0.0,
+                )
+
+    _count(docs=success, failed=len(errors))
+    elapsed = time.perf_counter() - t_start
+    logger.info(
+        "[BULK] %d actions ok=%d failed=%d in %.1fs (%.1f docs/s, final batch=%d)",
+        total, success, len(errors), elapsed, (total / elapsed) if elapsed else 0.0, sizer.size,
+    )
+    return success, errors
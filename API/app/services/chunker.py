@@ -0,0 +1,250 @@
+# app/services/chunker.py
+"""
+약관 텍스트 구조 인식 청킹.
+
+- 제N편/장/절/관 → 상위 제목, 제N조(…) → 조 경계 (조가 바뀌면 청크를 끊음)
+- ①②… / N. / N) / 가. 로 시작하는 줄 → 항/호/목 경계 (조 안에서만 나눌 수 있는 지점)
+- 표(| 구분, 탭, 2칸 이상 공백으로 나뉜 열이 연속된 줄) → 한 덩어리로 유지, 넘치면 행 단위로 나누고 머리행 반복
+- 목표 토큰 수(target)까지 묶고, 같은 조 안에서 끊길 때는 끝부분 overlap 토큰만큼 다음 청크에 겹침
+- 폼피드(\f)를 페이지 구분으로 보고 page_start/page_end를 메타데이터로 남김
+"""
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.tokenizer import count_tokens
+
+DEFAULT_TARGET_TOKENS = 450
+DEFAULT_MAX_TOKENS = 800
+DEFAULT_OVERLAP_TOKENS = 60
+MIN_TOKENS = 40  # 이보다 작은 조는 다음 조와 합쳐 너무 잘게 쪼개지지 않도록
+
+# 상위 제목: 제1편 / 제2장 / 제3절 / 제4관 (+ 제목)
+_PART_RE = re.compile(r"^\s*제\s*\d+\s*(편|장|절|관)(?![가-힣])\s*(.*)$")
+# 조: 제3조(보험금의 지급사유) / 제3조의2 【...】
+_ARTICLE_RE = re.compile(r"^\s*(제\s*\d+\s*조(?:\s*의\s*\d+)?)\s*(?:[(\[【〔]([^)\]】〕]{0,60})[)\]】〕])?")
+# 항: ① ~ ⑳
+_CLAUSE_RE = re.compile(r"^\s*[①-⑳]")
+# 호/목: 1. / 1) / (1) / 가. / 가)
+_ITEM_RE = re.compile(r"^\s*(?:\d{1,2}[.)](?!\d)|\(\d{1,2}\)|[가-하][.)])\s")
+# 표: | 구분 2개 이상 / 탭 / 2칸 이상 공백으로 나뉜 열 3개 이상
+_TABLE_PIPE_RE = re.compile(r"\|.*\|")
+_TABLE_COLS_RE = re.compile(r"\S(?: {2,}|\t)\S")
+_SENT_RE = re.compile(r"(?<=[.!?다요])\s+")
+
+
+def _is_table_line(line: str) -> bool:
+    s = line.strip()
+    if not s:
+        return False
+    if _TABLE_PIPE_RE.search(s) or "\t" in s:
+        return True
+    return len(_TABLE_COLS_RE.findall(s)) >= 2
+
+
+def _units(text: str) -> List[Dict[str, Any]]:
+    """
+    텍스트를 '나눌 수 있는 최소 단위'로 분해.
+    unit: {"text", "kind"(heading/article/clause/table/text), "page", "part", "article", "article_title"}
+    """
+    pages = text.split("\f")
+    has_pages = len(pages) > 1
+    part = ""
+    article = ""
+    article_title = ""
+    out: List[Dict[str, Any]] = []
+
+    for pno, page in enumerate(pages, start=1):
+        page_no = pno if has_pages else None
+        buf: List[str] = []
+        buf_kind = "text"
+
+        def flush():
+            nonlocal buf, buf_kind
+            body = "\n".join(buf).strip()
+            if body:
+                out.append({
+                    "text": body, "kind": buf_kind, "page": page_no,
+                    "part": part, "article": article, "article_title": article_title,
+                })
+            buf, buf_kind = [], "text"
+
+        for raw in page.splitlines():
+            line = raw.rstrip()
+            if not line.strip():
+                if buf_kind != "table":
+                    flush()
+                continue
+
+            if _is_table_line(line):
+                if buf_kind != "table":
+                    flush()
+                    buf_kind = "table"
+                buf.append(line)
+                continue
+            if buf_kind == "table":
+                flush()
+
+            m_part = _PART_RE.match(line)
+            m_art = _ARTICLE_RE.match(line)
+            if m_part and not m_art:
+                flush()
+                part = line.strip()
+                article, article_title = "", ""
+                continue
+            if m_art:
+                flush()
+                article = re.sub(r"\s+", "", m_art.group(1))
+                article_title = (m_art.group(2) or "").strip()
+                buf_kind = "article"
+                buf.append(line)
+                continue
+            if _CLAUSE_RE.match(line) or _ITEM_RE.match(line):
+                # 조 제목 줄과 첫 항은 붙여 둔다 (제목만 떨어진 청크 방지)
+                if not (buf_kind == "article" and len(buf) == 1):
+                    flush()
+                    buf_kind = "clause"
+                buf.append(line)
+                continue
+            buf.append(line)
+        flush()
+    return out
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """max_tokens를 넘는 단위를 줄 → 문장 → 글자 순으로 잘게 나눈다 (다시 묶는 건 chunk_text가 함)."""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    pieces = [p for p in (text.splitlines() if "\n" in text else _SENT_RE.split(text)) if p.strip()]
+    if len(pieces) <= 1:
+        # 더 나눌 경계가 없으면 비율로 글자 단위 절단
+        n = max(2, -(-count_tokens(text) // max_tokens))
+        step = -(-len(text) // n)
+        return [text[i:i + step] for i in range(0, len(text), step)]
+    out: List[str] = []
+    for p in pieces:
+        out.extend(_split_oversized(p, max_tokens))
+    return out
+
+
+def _split_table(text: str, max_tokens: int) -> List[str]:
+    """표는 행 단위로 묶어 나누고 각 조각에 머리행을 반복."""
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    rows = text.splitlines()
+    header = rows[0]
+    budget = max(1, max_tokens - count_tokens(header))
+    out: List[str] = []
+    cur: List[str] = []
+    cur_tok = 0
+    for row in rows[1:]:
+        for part in _split_oversized(row, budget):
+            t = count_tokens(part)
+            if cur and cur_tok + t > budget:
+                out.append("\n".join([header, *cur]))
+                cur, cur_tok = [], 0
+            cur.append(part)
+            cur_tok += t
+    if cur:
+        out.append("\n".join([header, *cur]))
+    return out
+
+
+def _heading(u: Dict[str, Any]) -> str:
+    art = u["article"]
+    if art and u["article_title"]:
+        art = f"{art}({u['article_title']})"
+    return " > ".join(x for x in (u["part"], art) if x)
+
+
+def chunk_text(
+    text: str,
+    target_tokens: int = DEFAULT_TARGET_TOKENS,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> List[Dict[str, Any]]:
+    """
+    약관 텍스트 → 청크 리스트.
+    각 청크: {"section_title", "content", "article", "page_start", "page_end", "chunk_type", "token_count"}
+    """
+    if not text or not text.strip():
+        return []
+    max_tokens = max(max_tokens, target_tokens)
+
+    # 1) 단위 분해 + 너무 큰 단위는 미리 나눔
+    units: List[Dict[str, Any]] = []
+    for u in _units(text):
+        if u["kind"] == "table":
+            pieces = _split_table(u["text"], max_tokens)
+        else:
+            pieces = _split_oversized(u["text"], target_tokens)
+        for j, piece in enumerate(pieces):
+            # 조 제목 줄이 있는 첫 조각만 "article" (이어지는 조각은 같은 조 안의 분할 지점)
+            kind = u["kind"] if (j == 0 or u["kind"] == "table") else "clause"
+            units.append({**u, "text": piece, "kind": kind, "tokens": count_tokens(piece)})
+
+    chunks: List[Dict[str, Any]] = []
+    cur: List[Dict[str, Any]] = []
+    cur_tok = 0
+
+    def emit():
+        if not cur:
+            return
+        body = "\n".join(u["text"] for u in cur).strip()
+        if not body:
+            return
+        first = cur[0]
+        # 조가 섞이면 마지막 조 기준 제목 (다음 조가 주 내용)
+        head = next((u for u in reversed(cur) if u["article"]), first)
+        pages = [u["page"] for u in cur if u["page"] is not None]
+        chunks.append({
+            "section_title": _heading(head),
+            "content": body,
+            "article": head["article"] or None,
+            "page_start": min(pages) if pages else None,
+            "page_end": max(pages) if pages else None,
+            "chunk_type": "table" if all(u["kind"] == "table" for u in cur) else "text",
+            "token_count": count_tokens(body),
+        })
+
+    def overlap_tail() -> Tuple[List[Dict[str, Any]], int]:
+        # 같은 조 안에서 끊길 때만: 뒤쪽 단위를 overlap 토큰 이내로 가져감 (표는 겹치지 않음)
+        tail: List[Dict[str, Any]] = []
+        tok = 0
+        for u in reversed(cur):
+            if u["kind"] == "table" or tok + u["tokens"] > overlap_tokens:
+                break
+            tail.insert(0, u)
+            tok += u["tokens"]
+        if len(tail) == len(cur):
+            return [], 0
+        return tail, tok
+
+    for u in units:
+        new_section = bool(cur) and (u["kind"] == "article" or u["part"] != cur[-1]["part"])
+        if new_section and cur_tok >= MIN_TOKENS:
+            emit()
+            cur, cur_tok = [], 0
+        elif cur and cur_tok + u["tokens"] > target_tokens:
+            emit()
+            same_article = u["article"] and u["article"] == cur[-1]["article"]
+            if same_article and overlap_tokens > 0:
+                cur, cur_tok = overlap_tail()
+            else:
+                cur, cur_tok = [], 0
+        cur.append(u)
+        cur_tok += u["tokens"]
+    emit()
+
+    for i, c in enumerate(chunks):
+        c["chunk_index"] = i
+    return chunks
+
+
+def page_of(chunk: Dict[str, Any]) -> Optional[str]:
+    """표시용 페이지 표기 (예: 'p.3' / 'p.3-4')."""
+    s, e = chunk.get("page_start"), chunk.get("page_end")
+    if s is None:
+        return None
+    return f"p.{s}" if s == e else f"p.{s}-{e}"
@@ -113,6 +113,87 @@ def _build_entity_hints(prev_chats: List[str], max_lookback: int = 10) -> Dict[s
         "products": sorted(products),
     }
 
+# ================== 규칙 기반 선분류 (LLM 라우터 생략용) ==================
+# off: 사용 안 함 / shadow: 규칙 결과는 통계만, 최종은 LLM / on: 규칙이 확정하면 LLM 호출 생략
+RULE_CLASSIFIER_MODE = os.getenv("RULE_CLASSIFIER_MODE", "on").lower()
+
+# run_classifier_llm 후처리와 같은 키워드 (금액 질문이면 LLM 결과와 무관하게 REFUND로 보정됨)
+_AMOUNT_KWS = ["얼마", "금액", "환급률", "계산", "산출", "비율", "얼마나 나오", "예상 환급"]
+_AMOUNT_RE = re.compile(r"\b\d+(\,\d{3})*(원|만원|,?\s?won)\b")
+_CURRENCY_RE = re.compile(r"\d[\d,\.\s]*(원|만원|won)", re.IGNORECASE)
+# \b는 "C50이면", "K35.8로"처럼 한글 조사가 바로 붙으면 경계가 없어 놓치거나 K35로 잘림 → 앞뒤를 직접 확인
+_ICD_RE = re.compile(r"(?<![A-Za-z0-9])([A-Za-z][0-9]{2,3}(?:\.[0-9A-Za-z]{1,2})?)(?![0-9])")
+_INSURER_RE = re.compile(r"(롯데|한화|삼성|현대|KB|메리츠|흥국|DB|교보|라이나|농협|동양|우체국)")
+_PRODUCT_TYPE_KWS = [
+    ("실손의료비", "실손"), ("실손", "실손"), ("실비", "실손"),
+    ("암보험", "암보험"), ("암", "암보험"),
+    ("운전자", "운전자"), ("치아", "치아"), ("종신", "종신"),
+    ("정기", "정기"), ("어린이", "어린이"), ("간병", "간병"),
+]
+
+_rule_stats: Dict[str, int] = {"total": 0, "hits": 0, "served": 0, "shadow_compared": 0, "shadow_agree": 0}
+
+
+def rule_classifier_stats() -> Dict[str, Any]:
+    """규칙 선분류 적중률/LLM 일치율 (디버그 엔드포인트용)."""
+    st = dict(_rule_stats)
+    st["mode"] = RULE_CLASSIFIER_MODE
+    st["hit_rate"] = round(st["hits"] / st["total"], 4) if st["total"] else 0.0
+    st["agreement"] = round(st["shadow_agree"] / st["shadow_compared"], 4) if st["shadow_compared"] else None
+    return st
+
+
+def rule_classify(user_text: str, disease_code: Optional[str] = None, product_id: Optional[str] = None) -> Optional[FlowDecision]:
+    """
+    규칙만으로 확실한 경우에만 FlowDecision 반환, 애매하면 None(→ LLM 라우터).
+    현재 확정 규칙:
+      - 금액 질문("얼마/금액/계산…" 또는 통화 표기) + (질병코드 or 금액 표기) → REFUND
+    """
+    from .llm_gateway import _detect_excluded_types_ko
+
+    q = (user_text or "").strip()
+    if not q:
+        return None
+    ql = q.lower()
+
+    amount_like = any(k in ql for k in _AMOUNT_KWS) or bool(_AMOUNT_RE.search(ql))
+    code_m = _ICD_RE.search(q)
+    code = (disease_code or "").strip().upper() or (code_m.group(1).upper() if code_m else "")
+    has_amount = bool(_CURRENCY_RE.search(q))
+    if not (amount_like and (code or has_amount)):
+        return None
+
+    insurer_m = _INSURER_RE.search(q)
+    product_type = next((norm for kw, norm in _PRODUCT_TYPE_KWS if kw in q), None)
+    excluded = _detect_excluded_types_ko(q)
+    if product_type in excluded:
+        product_type = None
+    entities: Dict[str, Any] = {
+        "insurer": insurer_m.group(1) if insurer_m else None,
+        "product": None, "version": None, "topic": None,
+        "icd10_candidate": code or None,
+        "product_type": product_type, "focus_topics": [],
+        "exclude_product_types": excluded,
+    }
+    tags = ["환급금"] if ("환급" in q or "해지환급" in q) else []
+    sug = RetrievalSuggestion.ON
+    return FlowDecision(
+        flow=Mode.REFUND, confidence=0.95, reasons="rule:amount" + ("+code" if code else "+currency"),
+        tags=tags, entities=entities, retrieval_suggestion=sug,
+        use_retrieval=decide_use_retrieval(text=q, mode=Mode.REFUND, suggestion=sug), text=q,
+    )
+
+
+def _decision_ctx(hist: str, compact: Dict[str, Any]) -> str:
+    import json
+    parts = []
+    if hist:
+        parts.append("[HISTORY]\n" + hist)
+    if compact:
+        parts.append("[DECISION]\n" + json.dumps(compact, ensure_ascii=False))
+    return "\n\n".join(parts)
+
+
 # ================== 분류 + 스위치 ==================
 def _map_mode(s: str) -> Mode:
     """
@@ -140,7 +221,7 @@ def _map_suggestion(s: str) -> RetrievalSuggestion:
     except Exception:
         return RetrievalSuggestion.AUTO
 
-def decide_flow_with_llm(user_text: str, prev_chats: List[str], disease_code: Optional[str], product_id: Optional[str]) -> FlowDecision:
+async def decide_flow_with_llm(user_text: str, prev_chats: List[str], disease_code: Optional[str], product_id: Optional[str], history_summary: Optional[str] = None) -> FlowDecision:
     from .llm_gateway import run_classifier_llm
 
     meta = dict()
@@ -151,13 +232,38 @@ def decide_flow_with_llm(user_text: str, prev_chats: List[str], disease_code: Op
     # (신규) 힌트 생성
     entity_hints = _build_entity_hints(prev_chats, max_lookback=10)
 
+    # 규칙 선분류: on이면 확정 시 LLM 라우터 생략, shadow면 아래에서 LLM 결과와 비교만
+    # 대화 이력이 있으면 LLM의 이력 반영 질의 재작성(text)이 필요하므로 첫 질문에만 적용
+    rule = None
+    if RULE_CLASSIFIER_MODE in ("on", "shadow") and not prev_chats:
+        _rule_stats["total"] += 1
+        try:
+            rule = rule_classify(user_text, disease_code, product_id)
+        except Exception:
+            rule = None
+        if rule is not None:
+            _rule_stats["hits"] += 1
+            if RULE_CLASSIFIER_MODE == "on":
+                _rule_stats["served"] += 1
+                ents = rule.entities
+                rule.ctx = _decision_ctx((history_summary or "").strip(), {
+                    "primary_flow": rule.flow.value,
+                    "entities": {
+                        "product_type": ents.get("product_type"),
+                        "exclude_product_types": ents.get("exclude_product_types", []),
+                    },
+                    "retrieval_suggestion": rule.retrieval_suggestion.value,
+                })
+                return rule
+
     try:
-        raw = run_classifier_llm(
+        raw = await run_classifier_llm(
             user_text=user_text,
             chat_meta=meta,
             entity_hints=entity_hints,
             disease_code=disease_code,
             product_id=product_id,
+            history_summary=history_summary,
         )
     except Exception:
         return FlowDecision(
@@ -197,6 +303,16 @@ def decide_flow_with_llm(user_text: str, prev_chats: List[str], disease_code: Op
 
     use_ret = decide_use_retrieval(text=text, mode=mode, suggestion=sug)
 
+    if rule is not None:
+        _rule_stats["shadow_compared"] += 1
+        if rule.flow == mode:
+            _rule_stats["shadow_agree"] += 1
+        else:
+            import logging
+            logging.getLogger("debug.body").info(
+                "[RULE SHADOW] disagree rule=%s llm=%s text='%s'", rule.flow.value, mode.value, (user_text or "")[:80]
+            )
+
     return FlowDecision(
         flow=mode, confidence=conf, reasons=rsn, tags=tags,
         entities=ents, retrieval_suggestion=sug, use_retrieval=use_ret, text=text, ctx=ctx,
@@ -0,0 +1,120 @@
+# app/services/history_summary.py
+"""
+채팅별 롤링 대화 요약 캐시.
+
+- (chat_id, prev_chats 해시) 기준으로 1번만 요약하고, 분류기와 RAG 프롬프트가 같은 결과를 공유
+- 새 메시지가 뒤에 붙기만 했으면 "이전 요약 + 새 메시지"만 다시 요약 (증분)
+- 같은 키로 동시에 요청이 오면 한 번만 호출하고 결과를 나눠 씀
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.services import llm_gateway
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("HISTORY_SUMMARY_CACHE_SIZE", "5000"))
+CACHE_TTL = float(os.getenv("HISTORY_SUMMARY_TTL", "3600"))
+MAX_CHARS = int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "1200"))
+
+# chat_id -> {"hash", "n", "summary", "ts"}
+_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def _hash(items: List[str]) -> str:
+    h = hashlib.sha1()
+    for x in items:
+        h.update(str(x).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _tail(lines: List[str], max_chars: int) -> str:
+    """최근 메시지 위주로 max_chars 이내 (오래된 쪽을 버림)."""
+    raw = "\n".join(str(x).strip() for x in lines if x and str(x).strip())
+    return raw[-max_chars:] if len(raw) > max_chars else raw
+
+
+def _get(chat_key: str) -> Optional[Dict[str, Any]]:
+    e = _cache.get(chat_key)
+    if e is None:
+        return None
+    if time.time() - e["ts"] > CACHE_TTL:
+        _cache.pop(chat_key, None)
+        return None
+    _cache.move_to_end(chat_key)
+    return e
+
+
+def _put(chat_key: str, entry: Dict[str, Any]) -> None:
+    _cache[chat_key] = entry
+    _cache.move_to_end(chat_key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+async def _summarize(prev: Optional[Dict[str, Any]], chats: List[str]) -> str:
+    if prev and prev.get("summary") and 0 < prev["n"] < len(chats):
+        # 증분: 이전 요약 + 그 뒤에 추가된 메시지만
+        new_part = _tail(chats[prev["n"]:], MAX_CHARS)
+        raw = f"[이전 요약]\n{prev['summary']}\n[이후 대화]\n{new_part}"
+    else:
+        raw = _tail(chats, MAX_CHARS)
+    return await llm_gateway.summarize_history_for_context(raw, max_chars=MAX_CHARS * 2)
+
+
+async def get_history_summary(chat_id: Optional[int | str], prev_chats: Optional[List[str]]) -> str:
+    """prev_chats 요약 (캐시/증분/단일 실행). 실패 시 빈 문자열."""
+    chats = [str(x) for x in (prev_chats or []) if x and str(x).strip()]
+    if not chats:
+        return ""
+    chat_key = str(chat_id) if chat_id is not None else "h:" + _hash(chats[:1])
+    full_hash = _hash(chats)
+
+    cached = _get(chat_key)
+    if cached is not None and cached["hash"] == full_hash:
+        return cached["summary"]
+
+    flight_key = f"{chat_key}:{full_hash}"
+    fut = _inflight.get(flight_key)
+    if fut is not None:
+        try:
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            # 선행 요청이 취소된 경우(클라이언트 끊김 등)만 직접 요약으로 넘어감. 내 취소면 그대로 전파
+            if not fut.cancelled():
+                raise
+            if _inflight.get(flight_key) is fut:
+                _inflight.pop(flight_key, None)
+            return await get_history_summary(chat_id, prev_chats)
+
+    # 이전 요약이 현재 prev_chats의 앞부분과 같을 때만 증분 사용
+    prev = cached if (cached is not None and cached["n"] <= len(chats)
+                      and _hash(chats[:cached["n"]]) == cached["hash"]) else None
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[flight_key] = fut
+    try:
+        summary = await _summarize(prev, chats)
+        if summary:
+            _put(chat_key, {"hash": full_hash, "n": len(chats), "summary": summary, "ts": time.time()})
+        fut.set_result(summary)
+        return summary
+    except Exception as e:
+        logger.warning("[HISTORY] summarize failed chat=%s: %s", chat_id, e)
+        fut.set_result("")
+        return ""
+    finally:
+        # 취소(CancelledError는 Exception이 아님)로 빠져나와도 기다리던 요청이 멈추지 않도록
+        if not fut.done():
+            fut.cancel()
+        if _inflight.get(flight_key) is fut:
+            _inflight.pop(flight_key, None)
@@ -1,132 +1,184 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import logging
-from typing import Any, Dict, List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-import boto3
-from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection, helpers
+from opensearchpy import helpers
 
 from app.config import settings
+from app.services import answer_cache, bulk_engine, search_cache
+from app.services.chunker import chunk_text
+from app.services.os_client import get_bulk_client
 
 logger = logging.getLogger(__name__)
 
 
-def _split_text(text: str, max_chars: int) -> List[Tuple[str, str]]:
-    # 페이지 구분문자(폼피드)가 있으면 우선 사용, 없으면 문단 단위
-    parts = text.split("\f") if "\f" in text else text.split("\n\n")
+def _split_text(text: str, max_chars: int) -> List[Dict[str, Any]]:
+    """조/항/호·표 경계를 지키며 토큰 목표 크기로 청킹 (페이지/제목 메타데이터 포함)."""
+    chunks = chunk_text(
+        text,
+        target_tokens=int(getattr(settings, "POLICY_CHUNK_TARGET_TOKENS", 450)),
+        max_tokens=int(getattr(settings, "POLICY_CHUNK_MAX_TOKENS", 800)),
+        overlap_tokens=int(getattr(settings, "POLICY_CHUNK_OVERLAP_TOKENS", 60)),
+    )
+    # 임베딩 입력 상한(OPENSEARCH_MAX_CHARS)은 안전장치로만 유지
+    for c in chunks:
+        if max_chars and len(c["content"]) > max_chars:
+            c["content"] = c["content"][:max_chars]
+    return chunks
 
-    out: List[Tuple[str, str]] = []
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-        lines = part.splitlines()
-        if len(lines) > 1:
-            section_title = lines[0].strip()
-            body = "\n".join(lines[1:]).strip()
-        else:
-            section_title, body = "", part
 
-        for start in range(0, len(body), max_chars):
-            out.append((section_title, body[start : start + max_chars]))
-    return out
+# 청크 내용이 같으면 위치가 바뀌어도 재임베딩하지 않고 이 필드들만 부분 갱신
+_POSITION_FIELDS = ("chunk_index", "section_title", "article", "page_start", "page_end", "chunk_type", "token_count")
 
 
-def _http_auth():
+def _content_hash(section_title: str, content: str) -> str:
+    return hashlib.sha1(f"{section_title}\x00{content}".encode("utf-8")).hexdigest()
+
+
+def _chunk_id(policy_id: Any, content_hash: str, occurrence: int) -> str:
     """
-    인증 우선순위:
-    1) AWS SigV4 (컨테이너/호스트에 자격증명 존재 시)
-    2) BasicAuth (OPENSEARCH_USERNAME/PASSWORD 설정 시)
-    둘 다 없으면 즉시 예외.
+    (policy_id, 청크 해시[, 같은 내용의 n번째]) → 결정적 _id.
+    version은 넣지 않는다: 조회/삭제가 policy_id 단위(정책당 한 버전만 유지)라서, 넣으면 버전만 올린 재업로드에도
+    모든 청크가 삭제·재임베딩된다. version은 meta 필드로 남아 바뀌면 부분 update로만 반영된다.
     """
-    # SigV4
-    creds = boto3.Session().get_credentials()
-    if creds is not None:
-        region = getattr(settings, "OPENSEARCH_REGION", "us-east-1")
-        return AWSV4SignerAuth(creds, region, "es")
-
-    # Basic
-    username = getattr(settings, "OPENSEARCH_USERNAME", None)
-    password = getattr(settings, "OPENSEARCH_PASSWORD", None)
-    if username and password:
-        return (username, password)
-
-    raise RuntimeError("OpenSearch auth not configured (SigV4 or BasicAuth required)")
-
-
-def _os_client() -> OpenSearch:
-    host = settings.OPENSEARCH_HOST
-    port = int(getattr(settings, "OPENSEARCH_PORT", 443))
-    auth = _http_auth()
-
-    # 요청이 길어질 수 있으므로 타임아웃/재시도/압축을 보수적으로 늘림
-    return OpenSearch(
-        hosts=[{"host": host, "port": port}],
-        http_auth=auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=int(getattr(settings, "OPENSEARCH_CLIENT_TIMEOUT", 300)),  # read timeout
-        max_retries=int(getattr(settings, "OPENSEARCH_MAX_RETRIES", 5)),
-        retry_on_timeout=True,
-        http_compress=True,
-    )
+    raw = f"{policy_id or ''}\x00{content_hash}\x00{occurrence}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _build_actions(index: str, chunks: List[Dict[str, Any]], meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    actions: List[Dict[str, Any]] = []
+    seen: Dict[str, int] = {}
+    for i, c in enumerate(chunks):
+        h = _content_hash(c["section_title"], c["content"])
+        occurrence = seen.get(h, 0)
+        seen[h] = occurrence + 1
+        doc = {
+            **meta,
+            "chunk_index": i,
+            "section_title": c["section_title"],
+            "content": c["content"],
+            "content_hash": h,
+            "article": c.get("article"),
+            "page_start": c.get("page_start"),
+            "page_end": c.get("page_end"),
+            "chunk_type": c.get("chunk_type"),
+            "token_count": c.get("token_count"),
+        }
+        actions.append({
+            "_index": index,
+            "_id": _chunk_id(meta.get("policy_id"), h, occurrence),
+            "_source": doc,
+        })
+    return actions
 
 
-async def ingest_policy(text: str, meta: Dict[str, Any]) -> int:
+def _existing_chunks(client, index: str, policy_id: Any, fields: List[str]) -> Dict[str, Dict[str, Any]]:
+    """이미 색인된 해당 정책의 약관 청크 {_id: _source(비교용 필드만)}. user_knowledge는 제외."""
+    if not policy_id:
+        return {}
+    query = {
+        "query": {"bool": {
+            "filter": [{"term": {"policy_id": policy_id}}],
+            "must_not": [{"term": {"doc_type": "user_knowledge"}}],
+        }},
+        "_source": fields,
+    }
+    out: Dict[str, Dict[str, Any]] = {}
+    for h in helpers.scan(client, index=index, query=query, size=1000, preserve_order=False):
+        out[h["_id"]] = h.get("_source") or {}
+    return out
+
+
+def _diff_actions(
+    actions: List[Dict[str, Any]],
+    existing: Dict[str, Dict[str, Any]],
+    meta: Dict[str, Any],
+) -> Tuple[List[Dict[str, Any]], int]:
     """
-    텍스트를 조각내 OpenSearch에 **실색인**한다.
-    - 실패 시 예외를 **그대로** 올린다(soft-fail 없음).
-    - 대용량 문서는 청크 크기를 줄여 요청당 처리 시간을 낮춘다.
+    새 청크 액션과 기존 문서를 비교해
+    - 새 _id → index (파이프라인/임베딩 수행)
+    - 같은 _id인데 위치/메타만 바뀜 → update (부분 문서, 재임베딩 없음)
+    - 더 이상 없는 _id → delete
+    를 만든다. 반환: (액션 목록, 변경 없는 청크 수)
     """
-    if not text:
-        logger.warning("ingest_policy called with empty text")
-        return 0
+    out: List[Dict[str, Any]] = []
+    unchanged = 0
+    keys = list(meta.keys()) + list(_POSITION_FIELDS)
+    for a in actions:
+        prev = existing.get(a["_id"])
+        if prev is None:
+            out.append({**a, "_op_type": "index"})
+            continue
+        src = a["_source"]
+        changed = {k: src.get(k) for k in keys if prev.get(k) != src.get(k)}
+        if changed:
+            out.append({"_op_type": "update", "_index": a["_index"], "_id": a["_id"], "doc": changed})
+        else:
+            unchanged += 1
+    new_ids = {a["_id"] for a in actions}
+    index = actions[0]["_index"] if actions else settings.OPENSEARCH_INDEX
+    for _id in existing:
+        if _id not in new_ids:
+            out.append({"_op_type": "delete", "_index": index, "_id": _id})
+    return out, unchanged
+
 
+def _ingest_sync(text: str, meta: Dict[str, Any], progress_key: str) -> Tuple[Dict[str, int], List[Dict[str, Any]], int]:
+    """청킹 → 기존 색인 비교 → 병렬 bulk. 토크나이저/HTTP 모두 블로킹이라 스레드에서 실행."""
     max_chars = int(getattr(settings, "OPENSEARCH_MAX_CHARS", 200_000))
     chunks = _split_text(text, max_chars)
 
     index = settings.OPENSEARCH_INDEX
     pipeline = getattr(settings, "OPENSEARCH_PIPELINE", None)
 
-    # bulk 옵션(운영에서 조정 가능)
+    # bulk 옵션(운영에서 조정 가능). 배치 크기/동시성은 bulk_engine이 지연과 429에 맞춰 조절
     request_timeout = int(
         getattr(settings, "OPENSEARCH_REQUEST_TIMEOUT",
                 getattr(settings, "OPENSEARCH_TIMEOUT", 180))
     )
-    chunk_size = int(getattr(settings, "OPENSEARCH_CHUNK_SIZE", 10))  # smaller to reduce pipeline load
     max_chunk_bytes = int(getattr(settings, "OPENSEARCH_MAX_CHUNK_BYTES", 1_000_000))
-    max_retries = int(getattr(settings, "OPENSEARCH_MAX_RETRIES", 5))
 
-    client = _os_client()
+    client = get_bulk_client()
 
-    # 액션 생성
-    actions: List[Dict[str, Any]] = []
-    for i, (section_title, chunk) in enumerate(chunks):
-        doc = {
-            **meta,
-            "chunk_index": i,
-            "section_title": section_title,
-            "content": chunk,
-        }
-        actions.append({"_index": index, "_source": doc})
+    # 액션 생성 + 기존 색인과 비교
+    actions = _build_actions(index, chunks, meta)
+    existing = _existing_chunks(client, index, meta.get("policy_id"), list(meta.keys()) + list(_POSITION_FIELDS))
+    ops, unchanged = _diff_actions(actions, existing, meta)
+    bulk_engine.update_progress(progress_key, chunks=len(actions), unchanged=unchanged)
 
-    # 색인
-    bulk_kwargs: Dict[str, Any] = {}
-    if pipeline:
-        bulk_kwargs["pipeline"] = pipeline
+    chunk_index_of = {a["_id"]: a["_source"]["chunk_index"] for a in actions}
+    counts = {"indexed": 0, "updated": 0, "deleted": 0, "unchanged": unchanged, "failed": 0}
+    outcomes: List[Dict[str, Any]] = []
 
-    # helpers.bulk이 내부에서 chunk 단위로 나눠 전송함.
-    # 타임아웃/재시도는 여기서 직접 지정.
-    success, errors = helpers.bulk(
+    # 청크별 결과 기록 (bulk_engine 워커 결과를 메인 스레드에서 순서대로 받음)
+    def _on_item(ok: bool, item: Dict[str, Any]) -> None:
+        op, res = next(iter(item.items()))
+        _id = res.get("_id")
+        if ok:
+            counts[{"index": "indexed", "update": "updated", "delete": "deleted"}.get(op, "indexed")] += 1
+        else:
+            counts["failed"] += 1
+        outcomes.append({
+            "_id": _id,
+            "op": op,
+            "chunk_index": chunk_index_of.get(_id),
+            "status": res.get("status"),
+            "ok": bool(ok),
+            "error": None if ok else res.get("error"),
+        })
+
+    _, errors = bulk_engine.run_bulk(
         client,
-        actions,
+        ops,
+        pipeline=pipeline,
         request_timeout=request_timeout,
-        chunk_size=chunk_size,
         max_chunk_bytes=max_chunk_bytes,
-        max_retries=max_retries,
-        raise_on_error=False,  # 오류는 errors 배열로 수집하고 판단/로깅
-        **bulk_kwargs,
+        progress_key=progress_key,
+        on_item=_on_item,
     )
 
     if errors:
@@ -137,9 +189,70 @@ async def ingest_policy(text: str, meta: Dict[str, Any]) -> int:
         )
         # 운영 정책상 에러가 하나라도 있으면 실패로 간주하려면 아래 한 줄을 활성화
         # raise RuntimeError(f"OpenSearch bulk had errors: {errors[:3]}")
+    if ops:
+        # 검색 캐시 버전을 올리기 전에 새 청크가 검색되도록 refresh
+        # (안 하면 refresh 주기 안에 들어온 질의가 색인 전 결과를 새 버전 키로 TTL 동안 캐시함)
+        try:
+            client.indices.refresh(index=index)
+        except Exception as e:
+            logger.warning("OpenSearch refresh failed index=%s: %s", index, e)
+    return counts, outcomes, len(actions)
+
+
+async def ingest_policy(text: str, meta: Dict[str, Any], report: Optional[Dict[str, Any]] = None) -> int:
+    """
+    텍스트를 조각내 OpenSearch에 **실색인**한다.
+    - 실패 시 예외를 **그대로** 올린다(soft-fail 없음).
+    - 조/항/호 경계 기준 토큰 단위 청크(겹침 포함)로 나눠 검색/패킹 효율을 높인다.
+    - _id는 (policy_id, 청크 해시)로 결정적 (version은 부분 update) → 같은 약관 재업로드 시 바뀐 청크만 쓰고
+      사라진 청크(이전 버전/구형 랜덤 _id 포함)는 삭제한다.
+    - 청킹과 bulk 전송은 이벤트 루프 밖(스레드)에서 병렬/적응형 배치로 수행한다.
+      진행 상황: bulk_engine.get_progress(report["progress_key"])
+    - report dict를 넘기면 건수와 청크별 결과(outcomes)를 채운다.
+    반환: 현재 색인돼 있는 이 정책의 청크 수 (새로 쓴 것 + 갱신 + 변경 없음)
+    """
+    if not text:
+        logger.warning("ingest_policy called with empty text")
+        return 0
+
+    index = settings.OPENSEARCH_INDEX
+    progress_key = f"{meta.get('policy_id') or 'policy'}@{int(time.time() * 1000)}"
+    bulk_engine.start_progress(
+        progress_key, policy_id=meta.get("policy_id"), filename=meta.get("filename"),
+        user_id=meta.get("uploader_id"),  # /debug/ingest-progress에서 본인 기록만 보이도록
+    )
+    if report is not None:
+        report["progress_key"] = progress_key
+
+    try:
+        counts, outcomes, n_chunks = await asyncio.to_thread(_ingest_sync, text, meta, progress_key)
+    except Exception as e:
+        bulk_engine.update_progress(progress_key, state="failed", error=str(e), finished_at=time.time())
+        raise
+    bulk_engine.update_progress(progress_key, state="done", finished_at=time.time())
+
+    logger.info(
+        "Policy %s ingest: chunks=%d indexed=%d updated=%d deleted=%d unchanged=%d failed=%d",
+        meta.get("policy_id"), n_chunks, counts["indexed"], counts["updated"],
+        counts["deleted"], counts["unchanged"], counts["failed"],
+    )
+    if report is not None:
+        report.update(counts)
+        report["chunks"] = n_chunks
+        report["outcomes"] = outcomes
+
+    # 실제로 바뀐 것이 있을 때만 캐시 무효화 (동일 파일 재업로드는 캐시 유지)
+    if counts["indexed"] or counts["updated"] or counts["deleted"]:
+        answer_cache.invalidate_policy(meta.get("policy_id"))
+        search_cache.bump(index)
+    return counts["indexed"] + counts["updated"] + counts["unchanged"]
+
+def report_summary(report: Dict[str, Any]) -> Dict[str, Any]:
+    """ingest_policy report → 응답용 요약 (청크별 결과 중 실패한 것만 포함)."""
+    summary = {k: report.get(k, 0) for k in ("chunks", "indexed", "updated", "deleted", "unchanged", "failed")}
+    summary["failed_chunks"] = [o for o in report.get("outcomes", []) if not o.get("ok")][:20]
+    return summary
 
-    logger.info("Indexed %d documents for policy %s", int(success), meta.get("policy_id"))
-    return int(success)
 
 async def preview_policy(text: str, meta: Dict[str, Any]) -> List[Dict[str, Any]]:
     """청킹 로직을 그대로 적용해 bulk 액션만 생성한다.
@@ -164,15 +277,7 @@ async def preview_policy(text: str, meta: Dict[str, Any]) -> List[Dict[str, Any]
 
     index = settings.OPENSEARCH_INDEX
 
-    actions: List[Dict[str, Any]] = []
-    for i, (section_title, chunk) in enumerate(chunks):
-        doc = {
-            **meta,
-            "chunk_index": i,
-            "section_title": section_title,
-            "content": chunk,
-        }
-        actions.append({"_index": index, "_source": doc})
+    actions = _build_actions(index, chunks, meta)
 
     logger.info("Prepared %d preview actions for policy %s", len(actions), meta.get("policy_id"))
     return actions
@@ -0,0 +1,214 @@
+# app/services/ingest_queue.py
+"""
+업로드 색인 작업 큐 (Postgres ingest_jobs 테이블 + 프로세스별 워커 코루틴).
+
+- /documents, /ocr 업로드는 원본을 작업으로 등록하고 job_id만 바로 반환
+- 워커가 SKIP LOCKED로 작업을 하나씩 가져와 OCR(페이지 병렬) → 청킹/색인(ingest_policy) 수행
+- 진행 상황(페이지/청크)은 하트비트 주기로 DB에 기록 → GET /jobs/{id}
+- 실패하면 지수 백오프 뒤 재시도(max_attempts), 하트비트가 끊긴 작업은 다시 대기열로
+- 사용자별 동시 실행 상한(INGEST_USER_CONCURRENCY)
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.crud import ingestJobCRUD
+from app.database import AsyncSessionLocal
+from app.models.ingestJobModel import IngestJob
+from app.services import bulk_engine
+from app.services.ingest import ingest_policy, report_summary
+from app.services.ocr import ocr_bytes
+from app.services.vector_db import add_document
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # 프로세스당 워커 수 (0이면 이 프로세스는 등록만)
+INGEST_USER_CONCURRENCY = int(os.getenv("INGEST_USER_CONCURRENCY", "1"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+INGEST_HEARTBEAT_SECONDS = float(os.getenv("INGEST_HEARTBEAT_SECONDS", "5"))
+INGEST_STALE_SECONDS = float(os.getenv("INGEST_STALE_SECONDS", "300"))
+INGEST_RETRY_BASE = float(os.getenv("INGEST_RETRY_BASE", "30"))
+
+_tasks: List[asyncio.Task] = []
+_wake: Optional[asyncio.Event] = None
+
+
+# ---------------- 작업 종류별 처리 ----------------
+
+async def _handle_document(job: IngestJob, text: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    """/documents 업로드: 색인 실패는 작업 실패(재시도 대상)."""
+    meta = dict(job.meta or {})
+    indexed = await ingest_policy(text, meta, report=report)
+    if job.filename and job.filename.lower().endswith(".pdf"):
+        add_document(text, meta)
+    return {"policy_id": meta.get("policy_id"), "indexed": indexed, "ingest": report_summary(report)}
+
+
+async def _handle_ocr_policy(job: IngestJob, text: str, report: Dict[str, Any]) -> Dict[str, Any]:
+    """/ocr PDF 업로드: 기존 동작대로 색인 실패는 경고만 남기고 완료 처리."""
+    meta = dict(job.meta or {})
+    result: Dict[str, Any] = {"product_id": meta.get("policy_id")}
+    try:
+        await ingest_policy(text, meta, report=report)
+        result["ingest"] = report_summary(report)
+    except Exception as e:
+        logger.warning("[INGEST_JOB] ocr ingest failed job=%s: %s", job.id, e)
+        result["ingest_error"] = str(e)
+    add_document(text, meta)
+    return result
+
+
+_HANDLERS: Dict[str, Callable[[IngestJob, str, Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "document": _handle_document,
+    "ocr_policy": _handle_ocr_policy,
+}
+
+
+# ---------------- 등록 ----------------
+
+async def enqueue(
+    *,
+    user_id: int,
+    kind: str,
+    filename: Optional[str],
+    mime: Optional[str],
+    data: bytes,
+    meta: Dict[str, Any],
+) -> IngestJob:
+    if kind not in _HANDLERS:
+        raise ValueError(f"unknown ingest job kind: {kind}")
+    async with AsyncSessionLocal() as db:
+        job = await ingestJobCRUD.create_job(
+            db, user_id=user_id, kind=kind, filename=filename, mime=mime,
+            data=data, meta=meta, max_attempts=INGEST_MAX_ATTEMPTS,
+        )
+    if _wake is not None:
+        _wake.set()
+    logger.info("[INGEST_JOB] queued id=%s kind=%s user=%s file=%s", job.id, kind, user_id, filename)
+    return job
+
+
+# ---------------- 실행 ----------------
+
+async def _heartbeat(job_id: str, progress: Dict[str, Any], report: Dict[str, Any]) -> None:
+    """진행 상황을 주기적으로 DB에 기록 (running 작업이 살아 있다는 표시 겸용)."""
+    while True:
+        await asyncio.sleep(INGEST_HEARTBEAT_SECONDS)
+        fields = dict(progress)
+        rec = bulk_engine.get_progress(report["progress_key"]) if report.get("progress_key") else None
+        if rec:
+            fields["chunks_total"] = int(rec.get("total") or 0)
+            fields["chunks_done"] = int(rec.get("done") or 0)
+        try:
+            async with AsyncSessionLocal() as db:
+                await ingestJobCRUD.update_progress(db, job_id, **fields)
+        except Exception as e:
+            logger.warning("[INGEST_JOB] heartbeat failed job=%s: %s", job_id, e)
+
+
+async def _run(job: IngestJob) -> None:
+    progress: Dict[str, Any] = {"stage": "ocr", "pages_done": 0, "pages_total": 0}
+    report: Dict[str, Any] = {}
+
+    def _on_page(done: int, total: int) -> None:
+        progress.update(pages_done=done, pages_total=total)
+
+    hb = asyncio.create_task(_heartbeat(job.id, progress, report))
+    try:
+        async with AsyncSessionLocal() as db:
+            data = await ingestJobCRUD.get_file(db, job.id)
+        if not data:
+            raise RuntimeError("job file missing")
+        text = await ocr_bytes(data, job.mime, job.filename or "", on_page=_on_page)
+        progress["stage"] = "indexing"
+        async with AsyncSessionLocal() as db:
+            await ingestJobCRUD.update_progress(db, job.id, **progress)
+        result = await _HANDLERS[job.kind](job, text, report)
+        result["chars"] = len(text)
+    finally:
+        hb.cancel()
+
+    async with AsyncSessionLocal() as db:
+        await ingestJobCRUD.update_progress(db, job.id, **progress)
+        await ingestJobCRUD.finish_job(db, job.id, result)
+    logger.info("[INGEST_JOB] done id=%s result=%s", job.id, {k: v for k, v in result.items() if k != "ingest"})
+
+
+async def _process(job: IngestJob) -> None:
+    try:
+        await _run(job)
+    except asyncio.CancelledError:
+        # 종료 중: 다른 워커가 바로 이어받도록 반납
+        try:
+            async with AsyncSessionLocal() as db:
+                await asyncio.shield(ingestJobCRUD.release_job(db, job.id))
+        except Exception:
+            pass
+        raise
+    except Exception as e:
+        delay = INGEST_RETRY_BASE * (2 ** max(0, job.attempts - 1))
+        async with AsyncSessionLocal() as db:
+            status = await ingestJobCRUD.fail_job(db, job.id, f"{type(e).__name__}: {e}", delay)
+        logger.exception("[INGEST_JOB] failed id=%s attempt=%s → %s", job.id, job.attempts, status)
+
+
+async def _worker(n: int) -> None:
+    while True:
+        job = None
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await ingestJobCRUD.claim_next(db, INGEST_USER_CONCURRENCY)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("[INGEST_JOB] worker %d claim failed: %s", n, e)
+        if job is None:
+            try:
+                await asyncio.wait_for(_wake.wait(), timeout=INGEST_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wake.clear()
+            continue
+        logger.info("[INGEST_JOB] worker %d picked id=%s kind=%s attempt=%d", n, job.id, job.kind, job.attempts)
+        await _process(job)
+
+
+async def _janitor() -> None:
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                n, failed = await ingestJobCRUD.requeue_stale(db, INGEST_STALE_SECONDS)
+            if failed:
+                logger.warning("[INGEST_JOB] %d stale jobs failed (max attempts reached)", failed)
+            if n:
+                logger.warning("[INGEST_JOB] requeued %d stale jobs", n)
+                _wake.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("[INGEST_JOB] stale sweep failed: %s", e)
+        await asyncio.sleep(max(30.0, INGEST_STALE_SECONDS / 4))
+
+
+async def start_workers() -> int:
+    """앱 시작 시 호출. 띄운 워커 수를 반환."""
+    global _wake
+    _wake = asyncio.Event()
+    if INGEST_WORKERS <= 0:
+        return 0
+    _tasks.append(asyncio.create_task(_janitor()))
+    for i in range(INGEST_WORKERS):
+        _tasks.append(asyncio.create_task(_worker(i)))
+    logger.info("[INGEST_JOB] %d workers started (per-user limit=%d)", INGEST_WORKERS, INGEST_USER_CONCURRENCY)
+    return INGEST_WORKERS
+
+
+async def stop_workers() -> None:
+    tasks, _tasks[:] = list(_tasks), []
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
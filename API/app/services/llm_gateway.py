@@ -4,17 +4,82 @@ import os
 import re
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional
-from openai import OpenAI
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
 
 # ===== Models (env configurable) =====
 SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", "gpt-4o-mini")
 CLASSIFIER_MODEL = os.getenv("CLASSIFIER_MODEL", "gpt-4o-mini")
 ANSWERER_MODEL   = os.getenv("ANSWERER_MODEL",   "gpt-4o")
 
+# 역할별 타임아웃(초)
+SUMMARIZER_TIMEOUT = float(os.getenv("SUMMARIZER_TIMEOUT", "20"))
+CLASSIFIER_TIMEOUT = float(os.getenv("CLASSIFIER_TIMEOUT", "30"))
+ANSWERER_TIMEOUT   = float(os.getenv("ANSWERER_TIMEOUT",   "120"))
+
+# httpx 커넥션 풀 (비동기 클라이언트 1개를 모든 호출이 공유)
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "200"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "50"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+# 모델별 동시 요청 상한: "gpt-4o=32,gpt-4o-mini=64" (없으면 기본값)
+OPENAI_DEFAULT_CONCURRENCY = int(os.getenv("OPENAI_DEFAULT_CONCURRENCY", "64"))
+_MODEL_CONCURRENCY: Dict[str, int] = {
+    k.strip(): int(v)
+    for k, v in (
+        item.split("=", 1) for item in os.getenv("OPENAI_MODEL_CONCURRENCY", "").split(",") if "=" in item
+    )
+}
+
+# 동기 클라이언트는 스크립트/테스트용 run_llm에서만 사용
 _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+_aclient: Optional[AsyncOpenAI] = None
+_model_sems: Dict[str, asyncio.Semaphore] = {}
 body_logger = logging.getLogger("debug.body")  # 전용 로거
 
+
+def _async_client() -> AsyncOpenAI:
+    global _aclient
+    if _aclient is None:
+        _aclient = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+                ),
+                timeout=httpx.Timeout(ANSWERER_TIMEOUT, connect=10.0),
+            ),
+        )
+    return _aclient
+
+
+def _model_sem(model: str) -> asyncio.Semaphore:
+    sem = _model_sems.get(model)
+    if sem is None:
+        sem = asyncio.Semaphore(_MODEL_CONCURRENCY.get(model, OPENAI_DEFAULT_CONCURRENCY))
+        _model_sems[model] = sem
+    return sem
+
+
+async def _acreate(*, model: str, timeout: float, **kwargs):
+    """비동기 chat.completions.create (모델별 동시성 제한 + 호출별 타임아웃)."""
+    async with _model_sem(model):
+        return await _async_client().chat.completions.create(model=model, timeout=timeout, **kwargs)
+
+
+async def aclose() -> None:
+    """앱 종료 시 커넥션 풀 정리."""
+    global _aclient
+    client, _aclient = _aclient, None
+    if client is not None:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
 # ========== Helpers ==========
 def _supports_json_object(model_name: str) -> bool:
     """
@@ -27,7 +92,7 @@ def _supports_json_object(model_name: str) -> bool:
 
 
 # 1) 간단 요약기 (mini 모델로 1~2문장 요약)
-def summarize_history_for_context(chat_meta: Optional[Dict[str, Any] | List[str] | str], max_chars: int = 1200) -> str:
+async def summarize_history_for_context(chat_meta: Optional[Dict[str, Any] | List[str] | str], max_chars: int = 1200) -> str:
     """
     과거 대화를 1~2문장으로 요약. 실패 시 빈 문자열 반환.
     매우 저비용/저온도 호출을 가정. (원하면 동기/비동기 분리)
@@ -56,8 +121,9 @@ def summarize_history_for_context(chat_meta: Optional[Dict[str, Any] | List[str]
         f"<<LOG>>\n{raw}\n<<END>>"
     )
     try:
-        resp = _client.chat.completions.create(
+        resp = await _acreate(
             model=SUMMARIZER_MODEL,
+            timeout=SUMMARIZER_TIMEOUT,
             messages=[
                 {"role": "system", "content": "대화 요약가. 반드시 2~3문장으로만."},
                 {"role": "user", "content": prompt},
@@ -100,14 +166,16 @@ def _detect_excluded_types_ko(q: str) -> list[str]:
 
 
 # 2) 분류기 호출: 메시지 구성 방식
-def run_classifier_llm(user_text: str,
+async def run_classifier_llm(user_text: str,
                        chat_meta: Optional[Dict[str, Any]] = None,
                        entity_hints: Optional[Dict[str, List[str]]] = None,
                        disease_code: Optional[str] = None,
                        product_id: Optional[str] = None,
+                       history_summary: Optional[str] = None,
     ) -> Dict[str, Any]:
     """
     최신 발화 우선. Sticky 엔티티 로직은 제거됨.
+    history_summary가 주어지면(채팅별 롤링 요약 캐시) 요약 호출을 생략한다.
     """
     SYSTEM_RULES = (
         "당신은 보험 도메인 대화 라우터입니다. 오직 JSON만 출력하세요.\n"
@@ -138,8 +206,11 @@ def run_classifier_llm(user_text: str,
         "반드시 유효한 JSON만 출력하고 여분 텍스트/코드블록을 금지합니다.\n"
     )
 
-    # 기존 요약 유지
-    hist_summary = summarize_history_for_context(chat_meta)
+    # 기존 요약 유지 (stage에서 캐시된 요약을 넘겨주면 재사용)
+    if history_summary is not None:
+        hist_summary = history_summary
+    else:
+        hist_summary = await summarize_history_for_context(chat_meta)
     # current에서도 단일 후보를 사전 추출 → LLM이 판단하기 쉽게 노출
     # current_entities = _extract_current_entities(user_text, entity_hints=entity_hints)
 
@@ -183,7 +254,7 @@ def run_classifier_llm(user_text: str,
         if "gpt-5-mini" not in CLASSIFIER_MODEL.lower():
             kwargs["temperature"] = 0.0
 
-        resp = _client.chat.completions.create(**kwargs)
+        resp = await _acreate(timeout=CLASSIFIER_TIMEOUT, **kwargs)
         content = (resp.choices[0].message.content or "").strip()
         # 파싱, 보정 전 1차 LLM 답변 로깅
         try:
@@ -389,4 +460,34 @@ def run_llm(messages: List[Dict[str, str]]) -> str:
 
 
 async def call_llm(messages: List[Dict[str, str]]) -> str:
-    return await asyncio.to_thread(run_llm, messages)
+    resp = await _acreate(
+        model=ANSWERER_MODEL,
+        timeout=ANSWERER_TIMEOUT,
+        messages=messages,
+        temperature=0.3,
+    )
+    return (resp.choices[0].message.content or "").strip()
+
+
+async def stream_llm(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """call_llm의 스트리밍 버전. 생성되는 대로 텍스트 조각(delta)을 내보냄."""
+    async with _model_sem(ANSWERER_MODEL):
+        stream = await _async_client().chat.completions.create(
+            model=ANSWERER_MODEL,
+            messages=messages,
+            temperature=0.3,
+            stream=True,
+            timeout=ANSWERER_TIMEOUT,
+        )
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            try:
+                await stream.close()
+            except Exception:
+                pass
@@ -0,0 +1,138 @@
+# app/services/message_bus.py
+"""
+메시지 상태(classifying → searching → building → streaming → done/failed) 전달 버스.
+
+- 중간 단계는 프로세스 메모리에만 저장 (DB 커밋 없음), 클라이언트는 get_state로 폴링
+- 최종 상태(done/failed/complete)만 호출 측에서 DB에 저장
+- 워커가 여러 개면 MESSAGE_BUS_PG_BRIDGE=1 로 Postgres LISTEN/NOTIFY 브리지를 켜서
+  다른 워커가 publish한 상태도 같은 방식으로 저장한다.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+try:
+    import asyncpg
+except Exception:
+    asyncpg = None
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = {"done", "failed", "complete"}
+
+BRIDGE_ENABLED = os.getenv("MESSAGE_BUS_PG_BRIDGE", "0") == "1"
+BRIDGE_CHANNEL = os.getenv("MESSAGE_BUS_CHANNEL", "message_state")
+# 메모리에 남겨두는 기간(초). 지나면 DB 조회로 폴백
+STATE_TTL = float(os.getenv("MESSAGE_BUS_STATE_TTL", "900"))
+
+_origin = uuid.uuid4().hex  # 이 프로세스가 보낸 NOTIFY는 무시하기 위한 식별자
+_latest: Dict[int, Dict[str, Any]] = {}
+
+_listen_conn = None
+_notify_conn = None
+_notify_lock: Optional[asyncio.Lock] = None
+
+
+def _prune(now: float) -> None:
+    expired = [cid for cid, e in _latest.items() if now - e["ts"] > STATE_TTL]
+    for cid in expired:
+        _latest.pop(cid, None)
+
+
+def _deliver(chat_id: int, entry: Dict[str, Any]) -> None:
+    """최신 상태를 로컬에 저장 (get_state가 읽음)."""
+    now = time.time()
+    _latest[chat_id] = entry
+    if len(_latest) > 10_000:
+        _prune(now)
+
+
+async def publish(chat_id: int, state: str, *, user_id: Optional[int | str] = None, **data: Any) -> None:
+    """상태 전환을 알림. DB에는 쓰지 않음."""
+    entry = {
+        "chat_id": int(chat_id),
+        "state": state,
+        "user_id": int(user_id) if user_id is not None and str(user_id).isdigit() else None,
+        "ts": time.time(),
+        **data,
+    }
+    _deliver(int(chat_id), entry)
+    if _notify_conn is not None:
+        try:
+            payload = json.dumps({**entry, "origin": _origin}, ensure_ascii=False, default=str)
+            async with _notify_lock:
+                await _notify_conn.execute("SELECT pg_notify($1, $2)", BRIDGE_CHANNEL, payload)
+        except Exception as e:
+            logger.warning("[BUS] NOTIFY failed chat=%s state=%s: %s", chat_id, state, e)
+
+
+def get_state(chat_id: int) -> Optional[Dict[str, Any]]:
+    """메모리에 있는 최신 상태 (없거나 만료면 None → 호출 측이 DB로 폴백)."""
+    e = _latest.get(int(chat_id))
+    if e is None:
+        return None
+    if time.time() - e["ts"] > STATE_TTL:
+        _latest.pop(int(chat_id), None)
+        return None
+    return e
+
+
+# ===================== Postgres LISTEN/NOTIFY 브리지 =====================
+def _pg_dsn() -> str:
+    # SQLAlchemy URL(postgresql+asyncpg://) → asyncpg DSN
+    url = settings.DATABASE_URL
+    return url.replace("postgresql+asyncpg://", "postgresql://", 1)
+
+
+def _on_notify(conn, pid, channel, payload) -> None:
+    try:
+        entry = json.loads(payload)
+    except Exception:
+        return
+    if entry.pop("origin", None) == _origin:
+        return
+    try:
+        _deliver(int(entry["chat_id"]), entry)
+    except Exception:
+        logger.exception("[BUS] bad notify payload")
+
+
+async def start_bridge() -> bool:
+    """앱 시작 시 호출. 브리지를 켰고 연결에 성공하면 True."""
+    global _listen_conn, _notify_conn, _notify_lock
+    if not BRIDGE_ENABLED:
+        return False
+    if asyncpg is None:
+        logger.warning("[BUS] MESSAGE_BUS_PG_BRIDGE=1 but asyncpg not installed; in-process only")
+        return False
+    try:
+        _listen_conn = await asyncpg.connect(_pg_dsn())
+        await _listen_conn.add_listener(BRIDGE_CHANNEL, _on_notify)
+        _notify_conn = await asyncpg.connect(_pg_dsn())
+        _notify_lock = asyncio.Lock()
+        logger.info("[BUS] LISTEN/NOTIFY bridge on channel=%s", BRIDGE_CHANNEL)
+        return True
+    except Exception as e:
+        logger.warning("[BUS] bridge start failed; in-process only: %s", e)
+        await stop_bridge()
+        return False
+
+
+async def stop_bridge() -> None:
+    global _listen_conn, _notify_conn
+    conns, _listen_conn, _notify_conn = (_listen_conn, _notify_conn), None, None
+    for c in conns:
+        if c is None:
+            continue
+        try:
+            await c.close()
+        except Exception:
+            pass
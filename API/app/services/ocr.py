@@ -1,33 +1,82 @@
 # app/services/ocr.py
 # -*- coding: utf-8 -*-
 from __future__ import annotations
+import asyncio
 import base64
 import datetime as dt
+import hashlib
+import logging
 import mimetypes
+import multiprocessing
 import os
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import json
 
 import fitz  # PyMuPDF
 from fastapi import UploadFile
 from openai import OpenAI
 
+from app.crud import extractionCacheCRUD
+from app.database import AsyncSessionLocal
+from app.services import llm_gateway
+from app.services.pdf_render import PREP_SIGNATURE, Image, prepare_image, render_pages
+
+logger = logging.getLogger(__name__)
+
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 VISION_MODEL = os.getenv("OCR_VISION_MODEL", "gpt-4o")
 
+# 페이지 병렬 OCR
+# - 렌더링(PyMuPDF get_pixmap + 이미지 준비, CPU)은 프로세스 풀, 비전 호출(네트워크)은 비동기 동시성 제한
+# - 텍스트 레이어가 온전한 페이지는 렌더링/비전 없이 그대로 사용 (페이지별 판단)
+OCR_RENDER_PROCESSES = int(os.getenv("OCR_RENDER_PROCESSES", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+OCR_RENDER_BATCH = int(os.getenv("OCR_RENDER_BATCH", "4"))  # 프로세스 작업 1건당 페이지 수
+OCR_VISION_CONCURRENCY = int(os.getenv("OCR_VISION_CONCURRENCY", "8"))
+OCR_VISION_TIMEOUT = float(os.getenv("OCR_VISION_TIMEOUT", "120"))
+# 페이지별 판단: 텍스트 밀도 / 이미지 면적 / 폰트 유무 / 깨진 글자 비율
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "200"))
+OCR_IMAGE_COVERAGE = float(os.getenv("OCR_IMAGE_COVERAGE", "0.5"))
+OCR_GARBLED_RATIO = float(os.getenv("OCR_GARBLED_RATIO", "0.3"))
+OCR_VECTOR_TEXT_DRAWINGS = int(os.getenv("OCR_VECTOR_TEXT_DRAWINGS", "300"))
+# 페이지 OCR 결과 캐시 (Postgres llm_extraction_cache, kind=ocr_page). 비전 프롬프트/렌더링을 바꾸면 버전을 올릴 것
+OCR_PAGE_CACHE = os.getenv("OCR_PAGE_CACHE", "1") == "1"
+OCR_PROMPT_VERSION = "v2"  # v2: 페이지 해시에 폼/폰트 포함
+
+# on_page(done, total): 페이지 하나를 처리할 때마다 호출 (작업 큐 진행률용)
+PageCallback = Callable[[int, int], None]
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+
+
 async def ocr_file(file: UploadFile) -> str:
     data, mime, filename = await _read_upload(file)
+    return await ocr_bytes(data, mime, filename)
+
+
+async def ocr_bytes(data: bytes, mime: Optional[str], filename: str = "", on_page: Optional[PageCallback] = None) -> str:
+    """업로드 원본(bytes) → 텍스트. PDF는 페이지 병렬 OCR."""
     if _is_pdf(mime, filename, data):
-        return _extract_pdf_text_or_vision(data, max_pages=300, dpi=300).strip()
-    return _vision_image_to_text(data, mime).strip()
+        # 앞뒤 빈 페이지(\f)는 지우지 않아야 페이지 번호가 밀리지 않음
+        text = await _extract_pdf_text_async(data, max_pages=300, on_page=on_page)
+        return text.strip(" \t\n")
+    images = await asyncio.to_thread(prepare_image, data, mime)
+    text = (await _avision_image_to_text(images)).strip()
+    if on_page is not None:
+        on_page(1, 1)
+    return text
 
 async def extract_diagnosis_fields(file: UploadFile) -> Dict[str, Any]:
     data, mime, filename = await _read_upload(file)
+    images: List[Image] = []
     if _is_pdf(mime, filename, data):
-        raw_text = _extract_pdf_text_or_vision(data, max_pages=300, dpi=300)
+        raw_text = await _extract_pdf_text_async(data, max_pages=300)
     else:
-        raw_text = _vision_image_to_text(data, mime)
+        images = await asyncio.to_thread(prepare_image, data, mime)
+        raw_text = await _avision_image_to_text(images)
     raw_text = (raw_text or "").strip()
 
     # 1) 일반 텍스트 파싱
@@ -36,8 +85,8 @@ async def extract_diagnosis_fields(file: UploadFile) -> Dict[str, Any]:
     # 2) 비전 직접 추출(이미지일 때 시도)
     fields_vis: Dict[str, Any] = {}
     try:
-        if not _is_pdf(mime, filename, data):
-            fields_vis = _vision_extract_fields(data, mime)
+        if images:
+            fields_vis = await asyncio.to_thread(_vision_extract_fields, images)
     except Exception:
         fields_vis = {}
 
@@ -94,49 +143,326 @@ def _is_pdf(mime: str, filename: str, data: bytes) -> bool:
     if (filename or "").lower().endswith(".pdf"): return True
     return data[:5] == b"%PDF-"
 
-def _extract_pdf_text_or_vision(pdf_bytes: bytes, max_pages: int = 5, dpi: int = 300) -> str:
+def _garbled_ratio(text: str) -> float:
+    """깨진 텍스트 레이어 비율 (대체문자/사용자 정의 영역/제어문자)."""
+    if not text:
+        return 0.0
+    bad = sum(
+        1 for ch in text
+        if ch == "\ufffd" or "\ue000" <= ch <= "\uf8ff" or (ord(ch) < 32 and ch not in "\n\r\t\f")
+    )
+    return bad / len(text)
+
+
+def _image_coverage(page) -> float:
+    """페이지 면적 중 이미지가 덮는 비율 (겹침은 단순 합산 후 1로 자름)."""
+    rect = page.rect
+    area = float(rect.width * rect.height) or 1.0
+    covered = 0.0
+    try:
+        for info in page.get_image_info():
+            r = fitz.Rect(info.get("bbox")) & rect
+            if not r.is_empty:
+                covered += float(r.width * r.height)
+    except Exception:
+        return 0.0
+    return min(1.0, covered / area)
+
+
+def _xref_digest(doc, kind: str, xref: int, memo: Dict[Tuple[str, int], bytes]) -> bytes:
+    """문서 내 xref 객체 내용의 다이제스트 (여러 페이지가 같은 폰트/폼/이미지를 공유하므로 문서 단위 memo)."""
+    key = (kind, xref)
+    d = memo.get(key)
+    if d is None:
+        hx = hashlib.sha256(kind.encode("ascii"))
+        if kind == "font":
+            # 글리프 id만 같은 콘텐츠 스트림이라도 내장 폰트가 다르면 다른 페이지
+            name, ext, ftype, buf = doc.extract_font(xref)
+            hx.update(f"{name}|{ext}|{ftype}".encode("utf-8", "replace"))
+            hx.update(buf or b"")
+        elif kind == "form":
+            hx.update(doc.xref_stream(xref) or b"")
+        else:
+            hx.update(doc.xref_stream_raw(xref) or b"")
+        d = memo[key] = hx.digest()
+    return d
+
+
+def _page_hash(doc, page, memo: Optional[Dict[Tuple[str, int], bytes]] = None) -> str:
+    """
+    페이지 내용 해시: 콘텐츠 스트림 + Form XObject 스트림(q /Fm0 Do Q처럼 폼으로만 그리는 페이지)
+    + 사용 폰트(인코딩/내장 폰트 파일) + 참조 이미지 원본 스트림 (스캔본은 이미지가 곧 내용).
+    OCR 캐시가 전역(다른 사용자 문서와 공유)이므로 내용이 다르면 반드시 해시가 달라야 한다.
+    """
+    memo = {} if memo is None else memo
+    h = hashlib.sha256()
+    try:
+        h.update(page.read_contents() or b"")
+        for xo in page.get_xobjects():
+            h.update(b"\x00F")
+            h.update(_xref_digest(doc, "form", xo[0], memo))
+        for f in page.get_fonts(full=True):
+            h.update(b"\x00T")
+            h.update(f"{f[3]}|{f[5]}".encode("utf-8", "replace"))  # basefont | encoding
+            h.update(_xref_digest(doc, "font", f[0], memo))
+        for img in page.get_images(full=True):
+            h.update(b"\x00I")
+            h.update(_xref_digest(doc, "image", img[0], memo))
+    except Exception:
+        h = hashlib.sha256(b"text\x00")
+        h.update((page.get_text("text") or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+def _classify_page(text: str, has_fonts: bool, coverage: float, drawings: int) -> Tuple[bool, str]:
+    """(OCR 필요 여부, 이유)"""
+    if _garbled_ratio(text) >= OCR_GARBLED_RATIO:
+        return True, "garbled"
+    if len(text) >= OCR_MIN_PAGE_CHARS:
+        return False, "text"
+    if coverage >= OCR_IMAGE_COVERAGE:
+        return True, "scanned"
+    if not text:
+        if coverage > 0.05:
+            return True, "image_only"
+        if not has_fonts and drawings >= OCR_VECTOR_TEXT_DRAWINGS:
+            return True, "vector_text"  # 글자를 외곽선(path)으로 변환한 페이지
+        return False, "blank"
+    return False, "sparse_text"  # 간지/목차 등 원래 글자가 적은 페이지
+
+
+def _analyze_pages(pdf_bytes: bytes, max_pages: int) -> List[Dict[str, Any]]:
+    """페이지별 텍스트 레이어 + OCR 필요 여부 + 내용 해시."""
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    page_texts: List[str] = []
-    for i in range(min(len(doc), max_pages)):
-        t = doc[i].get_text("text") or ""
-        page_texts.append(t.strip())
-    layer_text = "\n\n".join([t for t in page_texts if t])
-    if _is_text_sufficient(page_texts):
-        return layer_text
-    ocr_texts: List[str] = []
-    for i in range(min(len(doc), max_pages)):
-        page = doc[i]
-        mat = fitz.Matrix(dpi / 72, dpi / 72)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        img_bytes = pix.tobytes("png")
-        ocr_texts.append(_vision_image_to_text(img_bytes, "image/png"))
-    return "\n\n".join([t for t in (layer_text, *ocr_texts) if t])
-
-def _is_text_sufficient(page_texts: List[str]) -> bool:
-    if not page_texts: return False
-    long_pages = sum(1 for t in page_texts if len(t) > 200)
-    return long_pages >= max(1, len(page_texts)//2)
-
-def _vision_image_to_text(image_bytes: bytes, mime: Optional[str]) -> str:
-    if not mime: mime = "image/png"
-    data_url = _to_data_url(mime, image_bytes)
-    resp = client.chat.completions.create(
+    try:
+        out: List[Dict[str, Any]] = []
+        memo: Dict[Tuple[str, int], bytes] = {}
+        for i in range(min(len(doc), max_pages)):
+            page = doc[i]
+            text = (page.get_text("text") or "").strip()
+            has_fonts = bool(page.get_fonts())
+            coverage = _image_coverage(page)
+            drawings = 0
+            if not text and not has_fonts and coverage <= 0.05:
+                try:
+                    drawings = len(page.get_drawings())
+                except Exception:
+                    drawings = 0
+            needs_ocr, reason = _classify_page(text, has_fonts, coverage, drawings)
+            out.append({
+                "text": text,
+                "needs_ocr": needs_ocr,
+                "reason": reason,
+                "hash": _page_hash(doc, page, memo) if needs_ocr else None,
+            })
+        return out
+    finally:
+        doc.close()
+
+
+def _ocr_cache_key(page_hash: str, dpi: Optional[int]) -> str:
+    h = hashlib.sha256()
+    prep = PREP_SIGNATURE if dpi is None else f"dpi{dpi}"
+    for part in (OCR_PROMPT_VERSION, VISION_MODEL, prep, page_hash):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+async def _ocr_cache_get(keys: List[str]) -> Dict[str, str]:
+    if not OCR_PAGE_CACHE or not keys:
+        return {}
+    try:
+        async with AsyncSessionLocal() as session:
+            return await extractionCacheCRUD.get_many(session, keys)
+    except Exception as e:
+        logger.warning("[OCR_CACHE] lookup failed: %s", e)
+        return {}
+
+
+async def _ocr_cache_put(pairs: List[Tuple[str, str]]) -> None:
+    if not OCR_PAGE_CACHE or not pairs:
+        return
+    rows = [
+        {"cache_key": k, "kind": "ocr_page", "model_id": VISION_MODEL,
+         "prompt_version": OCR_PROMPT_VERSION, "output": txt}
+        for k, txt in pairs
+    ]
+    try:
+        async with AsyncSessionLocal() as session:
+            await extractionCacheCRUD.put_many(session, rows)
+    except Exception as e:
+        logger.warning("[OCR_CACHE] store failed: %s", e)
+
+
+def _get_render_pool() -> Optional[ProcessPoolExecutor]:
+    global _render_pool
+    if _render_pool is None and OCR_RENDER_PROCESSES > 0:
+        # fork는 이벤트 루프/스레드 상태를 복제하므로 spawn 사용
+        _render_pool = ProcessPoolExecutor(
+            max_workers=OCR_RENDER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _render_pool
+
+
+def shutdown_render_pool() -> None:
+    global _render_pool
+    pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def _render(pdf_path: str, pages: List[int], dpi: Optional[int]) -> List[Tuple[int, List[Image]]]:
+    global _render_pool
+    pool = _get_render_pool()
+    if pool is not None:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, render_pages, pdf_path, pages, dpi)
+        except BrokenProcessPool as e:
+            logger.warning("[OCR] render pool broken, rendering in thread: %s", e)
+            _render_pool = None
+    return await asyncio.to_thread(render_pages, pdf_path, pages, dpi)
+
+
+def _write_temp(data: bytes) -> str:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return path
+
+
+async def _gather_or_cancel(coros) -> None:
+    """gather와 같지만 하나가 실패(또는 바깥에서 취소)하면 나머지를 취소하고 끝날 때까지 기다린 뒤 예외를 올림.
+    (실패한 작업의 나머지 페이지가 뒤에서 계속 렌더링/유료 비전 호출을 하지 않도록)"""
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    if not tasks:
+        return
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def _extract_pdf_text_async(
+    pdf_bytes: bytes,
+    max_pages: int = 5,
+    dpi: Optional[int] = None,
+    on_page: Optional[PageCallback] = None,
+) -> str:
+    """
+    dpi=None이면 페이지마다 DPI 자동 선택 + 흑백/JPEG/여백 제거/분할 (pdf_render.prepare_page).
+    페이지별로 텍스트 레이어/비전 OCR을 정하고, OCR 대상만 병렬 렌더링 + 병렬 비전 호출 후 페이지 순서대로 합친다.
+    - OCR 결과는 페이지 내용 해시로 캐시 (같은 페이지가 다시 올라오거나 문서 안에서 반복되면 재호출 없음)
+    - 페이지 구분은 폼피드(\f)로 유지 → 청킹 시 page_start/page_end 메타데이터로 사용
+    """
+    pages = await asyncio.to_thread(_analyze_pages, pdf_bytes, max_pages)
+    n_pages = len(pages)
+    ocr_texts: Dict[int, str] = {}
+
+    # OCR 대상 페이지를 내용 키로 묶음 (문서 안 중복 페이지는 1번만 호출)
+    by_key: Dict[str, List[int]] = {}
+    for i, p in enumerate(pages):
+        if p["needs_ocr"]:
+            by_key.setdefault(_ocr_cache_key(p["hash"], dpi), []).append(i)
+    cached = await _ocr_cache_get(list(by_key))
+    for k, txt in cached.items():
+        for i in by_key.pop(k, []):
+            ocr_texts[i] = txt
+
+    todo = {idxs[0]: (k, idxs) for k, idxs in by_key.items()}  # 대표 페이지 → (키, 같은 내용 페이지들)
+    done = n_pages - sum(len(idxs) for _, idxs in todo.values())
+    if on_page is not None:
+        on_page(done, n_pages)
+
+    if todo:
+        vision_sem = asyncio.Semaphore(OCR_VISION_CONCURRENCY)
+        # 렌더링된 PNG가 비전 대기열에 무한정 쌓이지 않도록 진행 중인 묶음 수 제한
+        group_sem = asyncio.Semaphore(max(1, OCR_RENDER_PROCESSES + OCR_VISION_CONCURRENCY // max(1, OCR_RENDER_BATCH)))
+        fresh: List[Tuple[str, str]] = []
+
+        async def _ocr_page(i: int, images: List[Image]) -> None:
+            nonlocal done
+            async with vision_sem:
+                txt = await _avision_image_to_text(images)
+            key, idxs = todo[i]
+            for j in idxs:
+                ocr_texts[j] = txt
+            if txt:
+                fresh.append((key, txt))
+            done += len(idxs)
+            if on_page is not None:
+                on_page(done, n_pages)
+
+        async def _group(group: List[int]) -> None:
+            async with group_sem:
+                rendered = await _render(path, group, dpi)
+                await _gather_or_cancel(_ocr_page(i, images) for i, images in rendered)
+
+        path = await asyncio.to_thread(_write_temp, pdf_bytes)
+        try:
+            reps = sorted(todo)
+            step = max(1, OCR_RENDER_BATCH)
+            await _gather_or_cancel(_group(reps[k:k + step]) for k in range(0, len(reps), step))
+        finally:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            # 일부 페이지가 실패해도 성공한 페이지 결과는 남겨 재시도 비용을 줄임
+            # (_gather_or_cancel이 남은 작업을 모두 정리한 뒤라 fresh가 더 늘지 않음)
+            await _ocr_cache_put(fresh)
+
+    reasons: Dict[str, int] = {}
+    for p in pages:
+        reasons[p["reason"]] = reasons.get(p["reason"], 0) + 1
+    logger.info(
+        "[OCR] pages=%d vision=%d cache_hit=%d reasons=%s",
+        n_pages, len(todo), sum(1 for p in pages if p["needs_ocr"]) - sum(len(v[1]) for v in todo.values()), reasons,
+    )
+
+    out: List[str] = []
+    for i, p in enumerate(pages):
+        layer = "" if p["reason"] == "garbled" else p["text"]
+        out.append("\n\n".join(t for t in (layer, ocr_texts.get(i, "")) if t))
+    return "\f".join(out)
+
+
+def _image_parts(images: List[Image]) -> List[Dict[str, Any]]:
+    return [{"type": "image_url", "image_url": {"url": _to_data_url(m or "image/png", b)}} for m, b in images]
+
+
+_OCR_PROMPT = "Extract ONLY the plain text from this image."
+_OCR_PROMPT_TILES = (
+    "These images are consecutive, slightly overlapping tiles of ONE page in reading order. "
+    "Extract ONLY the plain text of the whole page, in reading order, without repeating overlapped lines."
+)
+
+
+async def _avision_call(images: List[Image]) -> Tuple[str, Any]:
+    """비전 OCR 호출 1회 → (텍스트, usage). 여러 장이면 한 페이지의 타일로 보고 한 번에 보냄."""
+    prompt = _OCR_PROMPT if len(images) == 1 else _OCR_PROMPT_TILES
+    resp = await llm_gateway._acreate(
         model=VISION_MODEL,
+        timeout=OCR_VISION_TIMEOUT,
         messages=[{
             "role":"user",
-            "content":[
-                {"type":"text","text":"Extract ONLY the plain text from this image."},
-                {"type":"image_url","image_url":{"url":data_url}}
-            ]
+            "content":[{"type":"text","text":prompt}, *_image_parts(images)],
         }]
     )
-    return (resp.choices[0].message.content or "").strip()
+    return (resp.choices[0].message.content or "").strip(), getattr(resp, "usage", None)
+
+
+async def _avision_image_to_text(images: List[Image]) -> str:
+    text, _ = await _avision_call(images)
+    return text
 
-def _vision_extract_fields(image_bytes: bytes, mime: Optional[str]) -> Dict[str, Optional[str] | List[str]]:
-    """진단서 이미지에서 핵심 필드를 직접 추출. 실패 시 빈 dict."""
-    if not mime:
-        mime = "image/png"
-    data_url = _to_data_url(mime, image_bytes)
+def _vision_extract_fields(images: List[Image]) -> Dict[str, Optional[str] | List[str]]:
+    """진단서 이미지(prepare_image 결과)에서 핵심 필드를 직접 추출. 실패 시 빈 dict."""
     system = (
         "너는 한국 의료 진단서를 구조화하는 보조자야. 오직 JSON만 출력해.\n"
         "반드시 다음 키만 포함: icd10_code, icd10_codes, diagnosis_date, provider, disease_name.\n"
@@ -146,7 +472,7 @@ def _vision_extract_fields(image_bytes: bytes, mime: Optional[str]) -> Dict[str,
     )
     user = [
         {"type": "text", "text": "이미지에서 '질병분류기호(=ICD-10/KCD)', '진단 연월일', '의료기관명', '병명'을 읽어 JSON으로 반환하세요."},
-        {"type": "image_url", "image_url": {"url": data_url}},
+        *_image_parts(images),
     ]
     try:
         resp = client.chat.completions.create(
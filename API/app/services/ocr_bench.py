@@ -0,0 +1,168 @@
+# app/services/ocr_bench.py
+"""
+비전 OCR 입력 준비 벤치마크: 기존(300dpi 컬러 PNG 전체 페이지) vs 준비(pdf_render.prepare_page).
+
+샘플(진단서 이미지/PDF, 약관 PDF)마다 같은 페이지를 두 방식으로 비전 모델에 보내고
+- 준비 시간, 업로드 바이트(base64 전), 이미지 수(타일), 비전 지연, 프롬프트/출력 토큰
+- 품질: 정답 텍스트(<파일명>.txt, PDF는 \f로 페이지 구분)가 있으면 그것과, 없으면 기존 방식 결과와의 유사도
+를 비교한다.
+
+    python -m app.services.ocr_bench samples/진단서1.jpg samples/약관.pdf --pages 3
+또는 /debug/ocr-bench (파일 업로드, 로그인 + DEBUG_PAID_ENDPOINTS=true일 때만)
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+from app.services import pdf_render
+from app.services.ocr import _avision_call, _is_pdf, _write_temp
+
+try:
+    from rapidfuzz import fuzz
+except Exception:
+    fuzz = None
+
+VARIANTS = ("legacy", "prepared")
+
+
+def similarity(a: str, b: str) -> float:
+    """공백 무시 글자 단위 유사도 (0~1)."""
+    a, b = "".join((a or "").split()), "".join((b or "").split())
+    if not a and not b:
+        return 1.0
+    if fuzz is not None:
+        return round(fuzz.ratio(a, b) / 100.0, 4)
+    return round(SequenceMatcher(None, a, b, autojunk=False).ratio(), 4)
+
+
+def _prepare(variant: str, data: bytes, mime: Optional[str], pdf_path: Optional[str], page: int) -> List[pdf_render.Image]:
+    if pdf_path is None:
+        if variant == "legacy":
+            return [(mime or "image/png", data)]
+        return pdf_render.prepare_image(data, mime)
+    if variant == "legacy":
+        return pdf_render.render_legacy(pdf_path, page)
+    return pdf_render.render_pages(pdf_path, [page])[0][1]
+
+
+async def _run_one(variant: str, data: bytes, mime: Optional[str], pdf_path: Optional[str], page: int) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    images = await asyncio.to_thread(_prepare, variant, data, mime, pdf_path, page)
+    t1 = time.perf_counter()
+    text, usage = await _avision_call(images)
+    t2 = time.perf_counter()
+    return {
+        "variant": variant,
+        "images": len(images),
+        "mime": images[0][0] if images else None,
+        "bytes": sum(len(b) for _, b in images),
+        "prepare_ms": round((t1 - t0) * 1000, 1),
+        "vision_ms": round((t2 - t1) * 1000, 1),
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "text": text,
+    }
+
+
+async def bench_sample(
+    name: str,
+    data: bytes,
+    mime: Optional[str] = None,
+    truth: Optional[str] = None,
+    max_pages: int = 3,
+) -> List[Dict[str, Any]]:
+    """샘플 하나(이미지 1장 또는 PDF 앞쪽 max_pages쪽) → 페이지별 두 방식 결과."""
+    pdf_path = _write_temp(data) if _is_pdf(mime or "", name, data) else None
+    truths = truth.split("\f") if truth else []
+    rows: List[Dict[str, Any]] = []
+    try:
+        if pdf_path is not None:
+            import fitz  # PyMuPDF
+            with fitz.open(pdf_path) as doc:
+                pages = list(range(min(max_pages, doc.page_count)))
+        else:
+            pages = [0]
+        for p in pages:
+            # 순서 영향(커넥션 예열 등)을 줄이려고 페이지마다 순서를 번갈아 실행
+            order = VARIANTS if p % 2 == 0 else tuple(reversed(VARIANTS))
+            res = {v: await _run_one(v, data, mime, pdf_path, p) for v in order}
+            ref = truths[p] if p < len(truths) else None
+            for v in VARIANTS:
+                r = res[v]
+                r["sample"] = name
+                r["page"] = p + 1
+                if ref is not None:
+                    r["similarity"] = similarity(r["text"], ref)
+                    r["reference"] = "truth"
+                else:
+                    r["similarity"] = similarity(r["text"], res["legacy"]["text"])
+                    r["reference"] = "legacy"
+                rows.append(r)
+    finally:
+        if pdf_path is not None:
+            try:
+                os.unlink(pdf_path)
+            except OSError:
+                pass
+    return rows
+
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for v in VARIANTS:
+        rs = [r for r in rows if r["variant"] == v]
+        if not rs:
+            continue
+        toks = [r["prompt_tokens"] for r in rs if r.get("prompt_tokens") is not None]
+        out[v] = {
+            "pages": len(rs),
+            "mean_bytes": round(statistics.mean(r["bytes"] for r in rs)),
+            "mean_prepare_ms": round(statistics.mean(r["prepare_ms"] for r in rs), 1),
+            "mean_vision_ms": round(statistics.mean(r["vision_ms"] for r in rs), 1),
+            "p90_vision_ms": round(sorted(r["vision_ms"] for r in rs)[int(0.9 * (len(rs) - 1))], 1),
+            "mean_prompt_tokens": round(statistics.mean(toks), 1) if toks else None,
+            "mean_similarity": round(statistics.mean(r["similarity"] for r in rs), 4),
+            "min_similarity": min(r["similarity"] for r in rs),
+        }
+    if "legacy" in out and "prepared" in out and out["legacy"]["mean_bytes"]:
+        out["bytes_ratio"] = round(out["prepared"]["mean_bytes"] / out["legacy"]["mean_bytes"], 3)
+    out["prep_signature"] = pdf_render.PREP_SIGNATURE
+    return out
+
+
+def _load_truth(path: str) -> Optional[str]:
+    cand = os.path.splitext(path)[0] + ".txt"
+    if os.path.exists(cand):
+        with open(cand, encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+async def _main(paths: List[str], max_pages: int, show_text: bool) -> Dict[str, Any]:
+    import mimetypes
+    rows: List[Dict[str, Any]] = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        mime = mimetypes.guess_type(path)[0]
+        rows.extend(await bench_sample(os.path.basename(path), data, mime, _load_truth(path), max_pages))
+    if not show_text:
+        for r in rows:
+            r.pop("text", None)
+    return {"summary": summarize(rows), "runs": rows}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="OCR 입력 준비 품질/지연 벤치마크")
+    ap.add_argument("files", nargs="+", help="진단서 이미지/PDF, 약관 PDF (정답은 같은 이름의 .txt)")
+    ap.add_argument("--pages", type=int, default=3, help="PDF당 앞쪽 몇 쪽까지")
+    ap.add_argument("--text", action="store_true", help="OCR 결과 텍스트도 출력")
+    args = ap.parse_args()
+    print(json.dumps(asyncio.run(_main(args.files, args.pages, args.text)), ensure_ascii=False, indent=2))
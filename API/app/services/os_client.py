@@ -0,0 +1,206 @@
+# app/services/os_client.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import boto3
+from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection
+
+# 비동기 경로 (pip install opensearch-py[async] → aiohttp)
+try:
+    from opensearchpy import AsyncHttpConnection, AsyncOpenSearch, AWSV4SignerAsyncAuth
+except Exception:
+    AsyncOpenSearch = None
+    AsyncHttpConnection = None
+    AWSV4SignerAsyncAuth = None
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 프로세스 전역 클라이언트 레지스트리
+# - read: 채팅/RAG 검색용 (짧은 타임아웃, 큰 커넥션 풀)
+# - bulk: 색인용 (긴 타임아웃, 압축, 작은 커넥션 풀)
+_lock = threading.Lock()
+_boto_session: Optional[boto3.Session] = None
+_clients: Dict[str, OpenSearch] = {}
+# aiohttp 세션은 이벤트 루프에 묶이므로 루프별로 1개씩
+_async_clients: Dict[int, "AsyncOpenSearch"] = {}
+
+
+def _session() -> boto3.Session:
+    global _boto_session
+    if _boto_session is None:
+        _boto_session = boto3.Session()
+    return _boto_session
+
+
+def _http_auth(async_: bool = False):
+    """
+    인증 우선순위:
+    1) AWS SigV4 (컨테이너/호스트에 자격증명 존재 시)
+       - IAM Role/ECS 자격증명은 RefreshableCredentials라 signer가 만료 전에 스스로 갱신한다.
+    2) BasicAuth (OPENSEARCH_USERNAME/PASSWORD 설정 시)
+    둘 다 없으면 즉시 예외.
+    """
+    creds = _session().get_credentials()
+    if creds is not None:
+        if async_:
+            return AWSV4SignerAsyncAuth(creds, settings.OPENSEARCH_REGION, "es")
+        return AWSV4SignerAuth(creds, settings.OPENSEARCH_REGION, "es")
+
+    username = getattr(settings, "OPENSEARCH_USERNAME", None)
+    password = getattr(settings, "OPENSEARCH_PASSWORD", None)
+    if username and password:
+        return (username, password)
+
+    raise RuntimeError("OpenSearch auth not configured (SigV4 or BasicAuth required)")
+
+
+def _build(kind: str) -> OpenSearch:
+    common: Dict[str, Any] = dict(
+        hosts=[{"host": settings.OPENSEARCH_HOST, "port": int(settings.OPENSEARCH_PORT)}],
+        http_auth=_http_auth(),
+        use_ssl=True,
+        verify_certs=True,
+        connection_class=RequestsHttpConnection,  # requests.Session → keep-alive 커넥션 재사용
+        retry_on_timeout=True,
+    )
+    if kind == "bulk":
+        # 요청이 길어질 수 있으므로 타임아웃/재시도/압축을 보수적으로 늘림
+        return OpenSearch(
+            **common,
+            timeout=int(settings.OPENSEARCH_CLIENT_TIMEOUT),
+            max_retries=int(settings.OPENSEARCH_MAX_RETRIES),
+            pool_maxsize=int(settings.OPENSEARCH_BULK_POOL_MAXSIZE),
+            http_compress=True,
+        )
+    return OpenSearch(
+        **common,
+        timeout=int(settings.OPENSEARCH_SEARCH_TIMEOUT),
+        max_retries=int(settings.OPENSEARCH_SEARCH_MAX_RETRIES),
+        pool_maxsize=int(settings.OPENSEARCH_POOL_MAXSIZE),
+    )
+
+
+def _get(kind: str) -> OpenSearch:
+    client = _clients.get(kind)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(kind)
+        if client is None:
+            client = _build(kind)
+            _clients[kind] = client
+            logger.info("[OS] %s client created host=%s", kind, settings.OPENSEARCH_HOST)
+    return client
+
+
+def get_read_client() -> OpenSearch:
+    """검색용 공용 클라이언트 (프로세스당 1개, 스레드 안전)."""
+    return _get("read")
+
+
+def get_bulk_client() -> OpenSearch:
+    """색인(bulk)용 공용 클라이언트 (프로세스당 1개, 스레드 안전)."""
+    return _get("bulk")
+
+
+def get_async_read_client() -> "AsyncOpenSearch":
+    """
+    현재 이벤트 루프 전용 AsyncOpenSearch (aiohttp 커넥션 풀 재사용).
+    SDK에 async extra가 없으면 RuntimeError.
+    """
+    if AsyncOpenSearch is None:
+        raise RuntimeError("opensearch-py async extra (aiohttp) not installed")
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(id(loop))
+    if client is None:
+        client = AsyncOpenSearch(
+            hosts=[{"host": settings.OPENSEARCH_HOST, "port": int(settings.OPENSEARCH_PORT)}],
+            http_auth=_http_auth(async_=True),
+            use_ssl=True,
+            verify_certs=True,
+            connection_class=AsyncHttpConnection,
+            timeout=int(settings.OPENSEARCH_SEARCH_TIMEOUT),
+            max_retries=int(settings.OPENSEARCH_SEARCH_MAX_RETRIES),
+            retry_on_timeout=True,
+            maxsize=int(settings.OPENSEARCH_POOL_MAXSIZE),
+        )
+        _async_clients[id(loop)] = client
+        logger.info("[OS] async read client created host=%s", settings.OPENSEARCH_HOST)
+    return client
+
+
+async def search_async(*, index: Optional[str], body: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    단건 비동기 검색. 호출마다 타임아웃을 걸고, 상위 태스크가 취소되면
+    진행 중인 HTTP 요청도 함께 취소된다.
+    async extra가 없으면 공용 동기 클라이언트를 스레드에서 실행(루프는 막지 않음).
+    """
+    t = float(timeout if timeout is not None else settings.OPENSEARCH_QUERY_TIMEOUT)
+    if AsyncOpenSearch is None:
+        return await asyncio.wait_for(
+            asyncio.to_thread(get_read_client().search, index=index, body=body, request_timeout=t),
+            timeout=t,
+        )
+    client = get_async_read_client()
+    return await asyncio.wait_for(
+        client.search(index=index, body=body, request_timeout=t),
+        timeout=t,
+    )
+
+
+async def msearch_async(*, index: Optional[str], bodies: List[Dict[str, Any]], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    여러 검색을 _msearch 한 번으로 전송 (같은 인덱스). 응답은 bodies 순서대로.
+    개별 검색 오류는 {"error": ...} 항목으로 남고 예외로 올라오지 않는다.
+    """
+    t = float(timeout if timeout is not None else settings.OPENSEARCH_QUERY_TIMEOUT)
+    payload: List[Dict[str, Any]] = []
+    for b in bodies:
+        payload.append({"index": index} if index else {})
+        payload.append(b)
+    if AsyncOpenSearch is None:
+        resp = await asyncio.wait_for(
+            asyncio.to_thread(get_read_client().msearch, body=payload, request_timeout=t),
+            timeout=t,
+        )
+    else:
+        resp = await asyncio.wait_for(
+            get_async_read_client().msearch(body=payload, request_timeout=t),
+            timeout=t,
+        )
+    return list(resp.get("responses") or [])
+
+
+async def close_async_clients() -> None:
+    clients = list(_async_clients.values())
+    _async_clients.clear()
+    for c in clients:
+        try:
+            await c.close()
+        except Exception:
+            pass
+
+
+def reset_clients() -> None:
+    """자격증명 교체/인증 오류 후 강제로 다시 만들고 싶을 때 호출."""
+    global _boto_session
+    with _lock:
+        old = list(_clients.values())
+        _clients.clear()
+        _boto_session = None
+    for c in old:
+        try:
+            c.close()
+        except Exception:
+            pass
+
+
+def close_clients() -> None:
+    """앱 종료 시 커넥션 풀 정리."""
+    reset_clients()
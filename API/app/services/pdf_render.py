@@ -0,0 +1,186 @@
+# app/services/pdf_render.py
+"""
+비전 OCR 전 페이지/이미지 준비 (OCR 렌더링 프로세스 풀에서 실행).
+spawn된 자식 프로세스가 이 모듈만 import하도록 PyMuPDF/numpy 외 의존성을 두지 않는다.
+
+- DPI 자동 선택: 가장 작은 글자 크기 기준(OCR_DPI_MIN~MAX), 스캔 원본 해상도와 페이지 픽셀 예산을 넘지 않게
+- 흑백(grayscale) 렌더링 + JPEG 압축 (PNG 대비 수~수십 배 작음)
+- 저해상도 썸네일로 여백을 찾아 내용 영역만 다시 렌더링 (clip)
+- 긴 변이 OCR_TILE_MAX_PX를 넘으면 겹치게 잘라 여러 장으로 (비전 모델의 내부 축소로 글자가 뭉개지지 않도록)
+"""
+from __future__ import annotations
+
+import math
+import os
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+OCR_DPI_MIN = int(os.getenv("OCR_DPI_MIN", "150"))
+OCR_DPI_MAX = int(os.getenv("OCR_DPI_MAX", "300"))
+OCR_DPI_DEFAULT = int(os.getenv("OCR_DPI_DEFAULT", "200"))
+OCR_TARGET_TEXT_PX = float(os.getenv("OCR_TARGET_TEXT_PX", "24"))  # 가장 작은 글자의 렌더링 높이 목표
+OCR_MAX_PIXELS = int(os.getenv("OCR_MAX_PIXELS", str(12_000_000)))  # 페이지 전체 픽셀 상한
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1") == "1"
+OCR_IMAGE_FORMAT = os.getenv("OCR_IMAGE_FORMAT", "jpeg").lower()  # jpeg | png
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "80"))
+OCR_CROP_MARGINS = os.getenv("OCR_CROP_MARGINS", "1") == "1"
+OCR_TILE_MAX_PX = int(os.getenv("OCR_TILE_MAX_PX", "2000"))
+OCR_TILE_OVERLAP = float(os.getenv("OCR_TILE_OVERLAP", "0.04"))
+
+# 준비 방식이 바뀌면 OCR 캐시 키가 달라지도록 (ocr._ocr_cache_key에서 사용)
+PREP_SIGNATURE = (
+    f"p1:{OCR_DPI_MIN}-{OCR_DPI_MAX}-{OCR_DPI_DEFAULT}:{OCR_TARGET_TEXT_PX}:{OCR_MAX_PIXELS}:"
+    f"{int(OCR_GRAYSCALE)}:{OCR_IMAGE_FORMAT}{OCR_JPEG_QUALITY}:{int(OCR_CROP_MARGINS)}:{OCR_TILE_MAX_PX}"
+)
+
+Image = Tuple[str, bytes]  # (mime, bytes)
+
+
+def _native_image_dpi(page) -> Optional[float]:
+    """페이지에 깔린 스캔 이미지의 실효 해상도 (이보다 높게 렌더링해도 정보가 늘지 않음)."""
+    best = None
+    try:
+        for info in page.get_image_info():
+            bbox = fitz.Rect(info.get("bbox"))
+            if bbox.is_empty or bbox.width < 72:
+                continue
+            dpi = float(info.get("width") or 0) / (bbox.width / 72.0)
+            if dpi > 0:
+                best = max(best or 0.0, dpi)
+    except Exception:
+        return None
+    return best
+
+
+def _min_font_size(page) -> Optional[float]:
+    sizes = []
+    try:
+        for block in page.get_text("dict").get("blocks", []):
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    sz = float(span.get("size") or 0)
+                    if sz >= 4 and (span.get("text") or "").strip():
+                        sizes.append(sz)
+    except Exception:
+        return None
+    if not sizes:
+        return None
+    sizes.sort()
+    return sizes[len(sizes) // 10]  # 하위 10% (각주/표 글자), 극단값 하나에 끌려가지 않도록
+
+
+def choose_dpi(page, clip: Optional["fitz.Rect"] = None) -> int:
+    cands = []
+    native = _native_image_dpi(page)
+    if native:
+        cands.append(native)
+    fs = _min_font_size(page)
+    if fs:
+        cands.append(OCR_TARGET_TEXT_PX * 72.0 / fs)
+    dpi = max(OCR_DPI_MIN, min(OCR_DPI_MAX, max(cands) if cands else float(OCR_DPI_DEFAULT)))
+    # 스캔 원본보다 크게 키우지 않고, 큰 페이지(A3/도면/고해상도 사진)는 픽셀 예산 안으로
+    if native:
+        dpi = min(dpi, native)
+    rect = clip or page.rect
+    area_in2 = max(1e-6, (rect.width / 72.0) * (rect.height / 72.0))
+    dpi = min(dpi, math.sqrt(OCR_MAX_PIXELS / area_in2))
+    return max(1, int(dpi))
+
+
+def _content_rect(page) -> "fitz.Rect":
+    """저해상도 흑백 썸네일에서 흰 여백을 뺀 내용 영역 (여유 2%)."""
+    rect = page.rect
+    if np is None or not OCR_CROP_MARGINS:
+        return rect
+    scale = 36 / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), colorspace=fitz.csGRAY, alpha=False)
+    arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    ink = arr < 235
+    rows = np.where(ink.any(axis=1))[0]
+    cols = np.where(ink.any(axis=0))[0]
+    if rows.size == 0 or cols.size == 0:
+        return rect
+    pad_x, pad_y = rect.width * 0.02, rect.height * 0.02
+    x0 = rect.x0 + cols[0] / scale - pad_x
+    x1 = rect.x0 + (cols[-1] + 1) / scale + pad_x
+    y0 = rect.y0 + rows[0] / scale - pad_y
+    y1 = rect.y0 + (rows[-1] + 1) / scale + pad_y
+    return fitz.Rect(x0, y0, x1, y1) & rect
+
+
+def _tiles(clip: "fitz.Rect", dpi: int) -> List["fitz.Rect"]:
+    """긴 변 기준으로 겹치게 분할 (세로로 긴 약관 페이지는 위→아래 순서)."""
+    long_px = max(clip.width, clip.height) * dpi / 72.0
+    n = max(1, math.ceil(long_px / OCR_TILE_MAX_PX))
+    if n == 1:
+        return [clip]
+    out = []
+    vertical = clip.height >= clip.width
+    span = clip.height if vertical else clip.width
+    step = span / n
+    ov = span * OCR_TILE_OVERLAP
+    for k in range(n):
+        a = max(0.0, k * step - ov)
+        b = min(span, (k + 1) * step + ov)
+        if vertical:
+            out.append(fitz.Rect(clip.x0, clip.y0 + a, clip.x1, clip.y0 + b))
+        else:
+            out.append(fitz.Rect(clip.x0 + a, clip.y0, clip.x0 + b, clip.y1))
+    return out
+
+
+def _encode(pix) -> Image:
+    if OCR_IMAGE_FORMAT in ("jpeg", "jpg"):
+        return "image/jpeg", pix.tobytes("jpeg", jpg_quality=OCR_JPEG_QUALITY)
+    return "image/png", pix.tobytes("png")
+
+
+def prepare_page(page, dpi: Optional[int] = None) -> List[Image]:
+    """페이지 → 비전 입력 이미지 목록 (보통 1장, 큰 페이지는 여러 장)."""
+    clip = _content_rect(page)
+    dpi = dpi or choose_dpi(page, clip)
+    mat = fitz.Matrix(dpi / 72.0, dpi / 72.0)
+    cs = fitz.csGRAY if OCR_GRAYSCALE else fitz.csRGB
+    return [_encode(page.get_pixmap(matrix=mat, clip=r, colorspace=cs, alpha=False)) for r in _tiles(clip, dpi)]
+
+
+def render_pages(pdf_path: str, pages: List[int], dpi: Optional[int] = None) -> List[Tuple[int, List[Image]]]:
+    """지정 페이지들을 비전 입력 이미지로 → [(page_index, [(mime, bytes), ...])]. dpi=None이면 자동."""
+    doc = fitz.open(pdf_path)
+    try:
+        return [(i, prepare_page(doc[i], dpi)) for i in pages]
+    finally:
+        doc.close()
+
+
+def prepare_image(data: bytes, mime: Optional[str]) -> List[Image]:
+    """업로드 이미지(진단서 사진/스캔) → 흑백/압축/여백 제거/분할. 실패하면 원본 그대로."""
+    try:
+        ftype = (mime or "image/png").split("/")[-1]
+        doc = fitz.open(stream=data, filetype=ftype)
+        try:
+            images = prepare_page(doc[0])
+        finally:
+            doc.close()
+        # 이미 작은 파일(예: 압축된 JPEG)이면 원본이 더 나을 수 있음
+        if sum(len(b) for _, b in images) >= len(data):
+            return [(mime or "image/png", data)]
+        return images
+    except Exception:
+        return [(mime or "image/png", data)]
+
+
+def render_legacy(pdf_path: str, page_index: int, dpi: int = 300) -> List[Image]:
+    """기존 방식(컬러 PNG 전체 페이지) — 벤치마크 기준선용."""
+    doc = fitz.open(pdf_path)
+    try:
+        pix = doc[page_index].get_pixmap(matrix=fitz.Matrix(dpi / 72.0, dpi / 72.0), alpha=False)
+        return [("image/png", pix.tobytes("png"))]
+    finally:
+        doc.close()
@@ -3,14 +3,14 @@ from __future__ import annotations
 from typing import Any, Dict, List, Optional, Union
 from datetime import date, datetime
 import asyncio, json, logging
-import boto3
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
+from opensearchpy import OpenSearch
 
 from app.config import settings
+from app.services.os_client import get_read_client
 from app.models.policyModel import InsurancePolicy
 
 logger = logging.getLogger(__name__)
@@ -118,26 +118,6 @@ def _coerce_list_of_str(v: Any) -> List[str]:
     # 그 외 타입 방어
     return [str(v)]
 
-# -------------------------
-# OpenSearch 클라이언트
-# -------------------------
-def _os_client() -> OpenSearch:
-    region = getattr(settings, "OPENSEARCH_REGION", "us-east-1")
-    auth = AWSV4SignerAuth(boto3.Session().get_credentials(), region, "es")
-    host = settings.OPENSEARCH_HOST
-    port = int(getattr(settings, "OPENSEARCH_PORT", 443))
-    return OpenSearch(
-        hosts=[{"host": host, "port": port}],
-        http_auth=auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
-        timeout=int(getattr(settings, "OPENSEARCH_TIMEOUT", 120)),
-        max_retries=int(getattr(settings, "OPENSEARCH_MAX_RETRIES", 5)),
-        retry_on_timeout=True,
-        pool_maxsize=int(getattr(settings, "OPENSEARCH_POOL_MAXSIZE", 25)),
-    )
-
 async def _list_policy_ids(client: OpenSearch, index: str, page_size: int = 500) -> List[str]:
     after_key: Optional[Dict[str, Any]] = None
     out: List[str] = []
@@ -188,7 +168,7 @@ async def _fetch_one_meta(client: OpenSearch, index: str, policy_id: str) -> Dic
 # 동기화 엔트리
 # -------------------------
 async def sync_policies_from_opensearch(db: AsyncSession, *, dry_run: bool = False) -> Dict[str, Any]:
-    client = _os_client()
+    client = get_read_client()
     index = settings.OPENSEARCH_INDEX
 
     pids = await _list_policy_ids(client, index)
@@ -1,34 +1,26 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, List
-
-import boto3
-from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection
+from typing import Any, Dict, List, Optional
 
 from app.config import settings
+from app.services import search_cache
+from app.services.os_client import search_async
 
 logger = logging.getLogger(__name__)
 
 
-def search_policies(query: str, limit: int = 5) -> List[Dict[str, Any]]:
-    """Search ingested policy documents in OpenSearch."""
-    host = settings.OPENSEARCH_HOST
-    port = getattr(settings, "OPENSEARCH_PORT", 443)
-    region = getattr(settings, "OPENSEARCH_REGION", "us-east-1")
+async def search_policies(query: str, limit: int = 5, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Search ingested policy documents in OpenSearch (non-blocking, per-call timeout, cached per index version)."""
     index = settings.OPENSEARCH_INDEX
-
-    auth = AWSV4SignerAuth(boto3.Session().get_credentials(), region, "es")
-    client = OpenSearch(
-        hosts=[{"host": host, "port": port}],
-        http_auth=auth,
-        use_ssl=True,
-        verify_certs=True,
-        connection_class=RequestsHttpConnection,
+    return await search_cache.cached(
+        index, ("policies", query, limit), lambda: _search_policies_os(index, query, limit, timeout)
     )
 
+
+async def _search_policies_os(index: str, query: str, limit: int, timeout: Optional[float]) -> List[Dict[str, Any]]:
     try:
-        response = client.search(
+        response = await search_async(
             index=index,
             body={
                 "size": limit,
@@ -45,6 +37,7 @@ def search_policies(query: str, limit: int = 5) -> List[Dict[str, Any]]:
                     }
                 },
             },
+            timeout=timeout,
         )
     except Exception as exc:
         logger.exception("OpenSearch query failed: %s", exc)
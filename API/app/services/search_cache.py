@@ -0,0 +1,88 @@
+# app/services/search_cache.py
+"""
+OpenSearch 검색 결과 캐시 (프로세스 메모리, async LRU + TTL).
+
+- 키: (인덱스, 인덱스 버전, 호출 측이 준 키 튜플)
+- ingest_policy / index_assessment_entries가 bump(index)로 버전을 올리면 이전 결과는 자동으로 무시
+- 같은 키가 동시에 들어오면 클러스터에는 1번만 보내고 결과를 공유 (single-flight)
+- 예외는 캐시하지 않음
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("SEARCH_CACHE", "1") == "1"
+TTL = float(os.getenv("SEARCH_CACHE_TTL", "300"))
+MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX", "2000"))
+
+_cache: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+_inflight: Dict[Tuple, "asyncio.Future"] = {}
+_versions: Dict[str, int] = {}
+_stats: Dict[str, int] = {"hits": 0, "misses": 0, "shared": 0, "bumps": 0}
+
+
+def _copy(value: Any) -> Any:
+    # 호출 측이 결과 리스트/스니펫 dict를 수정해도 캐시 원본이 바뀌지 않도록 얕은 복사
+    if isinstance(value, list):
+        return [dict(v) if isinstance(v, dict) else v for v in value]
+    return value
+
+
+def bump(index: Optional[str]) -> None:
+    """색인 후 호출: 해당 인덱스의 캐시 결과를 무효화."""
+    key = str(index or "")
+    _versions[key] = _versions.get(key, 0) + 1
+    _stats["bumps"] += 1
+
+
+async def cached(index: Optional[str], key: Tuple[Hashable, ...], fn: Callable[[], Awaitable[Any]]) -> Any:
+    if not ENABLED:
+        return await fn()
+    full_key = (str(index or ""), _versions.get(str(index or ""), 0)) + tuple(key)
+
+    hit = _cache.get(full_key)
+    if hit is not None:
+        ts, value = hit
+        if time.time() - ts <= TTL:
+            _cache.move_to_end(full_key)
+            _stats["hits"] += 1
+            return _copy(value)
+        _cache.pop(full_key, None)
+
+    task = _inflight.get(full_key)
+    if task is not None:
+        _stats["shared"] += 1
+        return _copy(await asyncio.shield(task))
+
+    _stats["misses"] += 1
+
+    async def _run():
+        try:
+            value = await fn()
+            _cache[full_key] = (time.time(), value)
+            _cache.move_to_end(full_key)
+            while len(_cache) > MAX_ENTRIES:
+                _cache.popitem(last=False)
+            return value
+        finally:
+            _inflight.pop(full_key, None)
+
+    # 호출 측이 예산 초과로 취소돼도 검색 자체는 끝까지 진행해 다음 요청이 재사용
+    task = asyncio.ensure_future(_run())
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())  # 아무도 기다리지 않을 때 경고 방지
+    _inflight[full_key] = task
+    return _copy(await asyncio.shield(task))
+
+
+def stats() -> Dict[str, Any]:
+    st = dict(_stats)
+    st["entries"] = len(_cache)
+    st["enabled"] = ENABLED
+    return st
@@ -1,22 +1,21 @@
 import logging
-import re
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 import asyncio
 
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.services import fallback, vector_db
+from app.services import fallback, vector_db, message_bus, history_summary, answer_cache
 from app.services.startend import Mode, classify_with_llm, build_messages
+from app.services.common import _ICD_RE
 from app.rag.retriever import retrieve, policy_db_lookup as _policy_db_lookup
 from app.crud import chatCRUD, nonBenefitCRUD
+from app.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
 
-async def _classify(user_text: str, prev_chats: Optional[List[str]], disease_code: Optional[str], product_id: Optional[str]) -> Tuple[Mode, Dict[str, Any], bool, str, str]:
+async def _classify(user_text: str, prev_chats: Optional[List[str]], disease_code: Optional[str], product_id: Optional[str], history_summary: Optional[str] = None) -> Tuple[Mode, Dict[str, Any], bool, str, str]:
     # decision = classify_with_llm(user_text, attachment_ids or [])
-    """Run the classification LLM in a thread so it doesn't block the event loop."""
-    decision = await asyncio.to_thread(classify_with_llm, user_text, prev_chats or [], disease_code, product_id)
+    """Run the classification LLM on the shared AsyncOpenAI client (no worker thread)."""
+    decision = await classify_with_llm(user_text, prev_chats or [], disease_code, product_id, history_summary)
     mode: Mode = decision.flow
     entities: Dict[str, Any] = decision.entities or {}
     use_retrieval: bool = bool(getattr(decision, "use_retrieval", False))
@@ -25,26 +24,53 @@ async def _classify(user_text: str, prev_chats: Optional[List[str]], disease_cod
     return mode, entities, use_retrieval, text, ctx
 
 
+# 단계 전환 콜백 (SSE 스트리밍 등에서 사용): await on_state("searching")
+StateCallback = Callable[[str], Awaitable[None]]
+
+
+async def _set_state(chat_id: int, user_id: int | str, state: str, on_state: Optional[StateCallback]) -> None:
+    # 중간 단계는 메모리 버스로만 알림 (DB 커밋 없음). 최종 상태는 state_update에서 저장
+    await message_bus.publish(chat_id, state, user_id=user_id)
+    if on_state is not None:
+        try:
+            await on_state(state)
+        except Exception:
+            logger.exception("[STAGE] on_state callback failed (state=%s)", state)
+
+
 async def prepare_llm_request(
     *,
-    db: AsyncSession,
     user_id: int | str,
     text: str,
     prev_chats: Optional[List[str]] = None,
     chat_id: int,
     disease_code: str | None = None,
     product_id: str | None = None,
+    on_state: Optional[StateCallback] = None,
 ) -> Dict[str, Any]:
     pre_chat = list(prev_chats or [])
 
-    # 1) 분류 (동기 classify_with_llm에 맞춰 래퍼 사용)
+    # 0) 답변 캐시: 대화 이력/첨부 코드 없는 질문만 대상. 적중하면 분류/검색/LLM 모두 생략
+    cache_key = None
+    if not pre_chat and not disease_code:
+        cache_key = answer_cache.make_key(text, product_id)
+        hit = answer_cache.get(cache_key)
+        if hit is not None:
+            logger.info("[STAGE] answer cache hit: mode=%s policy=%s", hit["mode"], product_id)
+            return {
+                "mode": Mode(hit["mode"]),
+                "messages": [],
+                "attachments_used": pre_chat,
+                "static_answer": hit["answer"],
+                "cache_hit": True,
+            }
+
+    # 1) 분류 (비동기 classify_with_llm)
     # 메세지 state 갱신 (classifying)
-    try:
-        await chatCRUD.update_message_state(db, chat_id, "classifying")
-    except Exception as e:
-        await chatCRUD.update_message_state(db, chat_id, "failed")
-        raise
-    mode, entities, use_retrieval, text, ctx = await _classify(text, pre_chat, disease_code, product_id)
+    await _set_state(chat_id, user_id, "classifying", on_state)
+    # 대화 요약은 채팅별 캐시에서 1번만 계산 → 분류기/RAG 프롬프트가 공유
+    hist_summary = await history_summary.get_history_summary(chat_id, pre_chat)
+    mode, entities, use_retrieval, text, ctx = await _classify(text, pre_chat, disease_code, product_id, hist_summary)
     logger.info(
         "[STAGE] classify -> mode=%s | text='%s'",
         getattr(mode, "name", str(mode)),
@@ -65,11 +91,7 @@ async def prepare_llm_request(
 
     # 3) DB-우선 조회
     # 메세지 state 갱신 (searching)
-    try:
-        await chatCRUD.update_message_state(db, chat_id, "searching")
-    except Exception as e:
-        await chatCRUD.update_message_state(db, chat_id, "failed")
-        raise
+    await _set_state(chat_id, user_id, "searching", on_state)
     db_block = ""
     if mode in (Mode.REFUND, Mode.RECOMMEND):
         db_block = await _policy_db_lookup(
@@ -90,6 +112,7 @@ async def prepare_llm_request(
             limit=20,
             fallback_to_global=True,
             db_context=db_block,
+            history_summary=hist_summary,
         )
         if os_block:
             rag_parts.append(os_block)
@@ -98,14 +121,16 @@ async def prepare_llm_request(
     benefit_ctx = ""
     if mode == Mode.REFUND:
         if not code_for_check:
-            m = re.search(r"\b([A-Za-z][0-9]{2,3}[A-Za-z0-9]*)\b", text or "")
+            m = _ICD_RE.search(text or "")
             if m:
                 code_for_check = m.group(1).upper()
         if code_for_check:
             # 기본 줄은 항상 넣어 코드 존재를 LLM이 확실히 인지하도록 함
             benefit_lines = [f"[ICD-10]", f"{code_for_check}"]
             try:
-                item = await nonBenefitCRUD.get_by_code(db, code_for_check)
+                # 조회 1건만 짧은 세션에서 (턴 전체에 걸쳐 커넥션을 잡지 않도록)
+                async with AsyncSessionLocal() as db:
+                    item = await nonBenefitCRUD.get_by_code(db, code_for_check)
                 if item is not None:
                     # DB에 있으면 급여/비급여 힌트 추가
                     if item:
@@ -118,11 +143,7 @@ async def prepare_llm_request(
 
     # 5) 메시지 빌드 (context 하나로 합치기)
     # 메세지 state 갱신 (building)
-    try:
-        await chatCRUD.update_message_state(db, chat_id, "building")
-    except Exception as e:
-        await chatCRUD.update_message_state(db, chat_id, "failed")
-        raise
+    await _set_state(chat_id, user_id, "building", on_state)
     context = "\n\n".join([s for s in [db_block, rag_block, benefit_ctx, ctx] if s]).strip()
 
     # 첨부 힌트 주입: 이미지 업로드로 질병코드가 전달된 경우(제품 PDF 아님)
@@ -142,9 +163,12 @@ async def prepare_llm_request(
         len(context),
         len(messages),
     )
+    # GENERAL / 검색 없는 TERMS만 캐시 (개인 업로드 자료가 섞이는 검색 결과는 저장하지 않음)
+    cacheable = mode == Mode.GENERAL or (mode == Mode.TERMS and not run_retrieval)
     return {
         "mode": mode,
         "messages": messages,
         "prev_chats": pre_chat,
         "static_answer": "",
+        "answer_cache_key": cache_key if cacheable else None,
     }
@@ -1,11 +1,12 @@
 # /API/app/services/state_update.py
 import logging
 import json
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable
 
-from app.services import stage, llm_gateway
+from app.services import stage, llm_gateway, message_bus, answer_cache
 from app.schemas import chatSchema
 from app.crud import chatCRUD
+from app.crud.chatTurnCRUD import ChatTurnRepository
 from app.database import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
@@ -42,6 +43,35 @@ def _format_messages_for_log(messages: List[Dict[str, Any]],
 
     return "\n\n".join(blocks)
 
+async def _trigger_timeline(mode_str: str, chat_id: int, user_id: int) -> None:
+    """
+    옵션: REFUND이면 타임라인 즉시 스캔 트리거
+    스케줄러를 기다리지 않고 팝업을 바로 띄우고 싶을 때 유용
+    scan_and_build_timeline_for_chat 이 없으면 조용히 패스
+    """
+    try:
+        if str(mode_str).upper() == "REFUND":
+            try:
+                from app.services.scheduler import scan_and_build_timeline_for_chat  # type: ignore
+                await scan_and_build_timeline_for_chat(chat_id=chat_id, user_id=user_id)
+                logger.info("[BG] timeline scan triggered for chat=%s user=%s", chat_id, user_id)
+            except Exception:
+                # helper가 없거나 에러면 전체 스캔으로 폴백(무거우면 주석 처리 가능)
+                try:
+                    from app.services.scheduler import scan_and_build_timeline  # type: ignore
+                    await scan_and_build_timeline()
+                    logger.info("[BG] full timeline scan fallback executed")
+                except Exception:
+                    logger.exception("[BG] timeline build trigger failed (chat=%s)", chat_id)
+    except Exception:
+        # 어떤 이유로든 트리거 실패해도 본 파이프라인은 진행
+        logger.exception("[BG] timeline trigger outer failed")
+
+
+# SSE 등 실시간 전달용 이벤트 콜백: await on_event("state"|"token"|"done"|"error", data)
+EventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
 async def process_assistant_message(
     chat_id: int,
     user_id: int,
@@ -49,108 +79,127 @@ async def process_assistant_message(
     prev_chats: Optional[List[str]],
     disease_code: Optional[str] = None,
     product_id: Optional[str] = None,
+    on_event: Optional[EventCallback] = None,
+    *,
+    user_message_id: Optional[int] = None,
+    assistant_message_id: Optional[int] = None,
 ):
     """
     백그라운드에서 실행되는 어시스턴트 메시지 처리 파이프라인
     (기존 로직은 유지하면서, 아래 두 가지만 보강)
       1) 분류 결과(mode)를 사용자 마지막 메시지에도 type으로 반영
       2) REFUND일 때 타임라인/알림 생성을 즉시 트리거(선택)
+    중간 단계 상태는 message_bus(메모리)로만 알리고, 최종 상태(done/failed)만 DB에 저장한다.
+    DB 쓰기는 ChatTurnRepository로 모아서 턴 종료 시 1번만 커밋한다.
+    로드/저장은 각각 짧은 세션에서만 하고, LLM 작업 중에는 열린 트랜잭션(커넥션)이 없다.
+    on_event가 주어지면 단계 전환과 답변 토큰을 생성되는 대로 흘려보낸다(/chat/ask/stream).
+    DB에는 기존과 동일하게 최종 content/state를 저장하므로 폴링 클라이언트도 그대로 동작.
     """
-    async with AsyncSessionLocal() as db:
+    async def _emit(event: str, data: Dict[str, Any]) -> None:
+        if on_event is None:
+            return
         try:
-            # Stage 준비 (classifying → analyzing → searching → building)
-            kwargs = dict(
-                db=db,
-                user_id=user_id,
-                text=text,
-                prev_chats=prev_chats or [],
+            await on_event(event, data)
+        except Exception:
+            logger.exception("[BG] on_event failed (event=%s chat=%s)", event, chat_id)
+
+    async def _on_state(state: str) -> None:
+        await _emit("state", {"state": state})
+
+    turn: Optional[ChatTurnRepository] = None
+    try:
+        # chat + 이번 턴의 user/assistant 메시지를 id로 1번만 로드 (이후 변경은 메모리에서)
+        # 짧은 세션에서 로드만 하고 닫음 → 분류/검색/LLM 호출 동안 DB 커넥션을 잡지 않음
+        async with AsyncSessionLocal() as db:
+            turn = await ChatTurnRepository.load(
+                db,
                 chat_id=chat_id,
-                product_id=product_id,
+                user_message_id=user_message_id,
+                assistant_message_id=assistant_message_id,
             )
-            if disease_code:
-                kwargs["disease_code"] = disease_code
-
-            prep = await stage.prepare_llm_request(**kwargs)
-            await db.commit()
-
-            mode = prep["mode"]
-            mode_str = getattr(mode, "name", str(mode))  # e.g. "REFUND"
-            # attachments_used = prep.get("attachments_used", [])
-            static_answer = prep.get("static_answer") or ""
 
-
-            # -------------------------------
-            # (A) type 업데이트(기존): 어시스턴트 placeholder 메시지에 type 세팅
-            # -------------------------------
-            await chatCRUD.update_message_type(db, chat_id, mode_str)
-
-            # -------------------------------
-            # (B) ✅ 추가: 사용자 마지막 메시지에도 같은 type 반영
-            #     → 스캐너가 user 메시지를 집계할 수 있게 됨
-            # -------------------------------
-            try:
-                await chatCRUD.update_last_user_message_type(db, chat_id, mode_str)
-                # 필요시 빠른 반영
-                await db.commit()
-                logger.info("[BG] Tagged last user message with type=%s (chat=%s)", mode_str, chat_id)
-            except Exception:
-                logger.exception("[BG] failed to tag last user message type (chat=%s)", chat_id)
-
-            # -------------------------------
-            # (C) 옵션: REFUND이면 타임라인 즉시 스캔 트리거
-            #     스케줄러를 기다리지 않고 팝업을 바로 띄우고 싶을 때 유용
-            #     scan_and_build_timeline_for_chat 이 없으면 조용히 패스
-            # -------------------------------
-            try:
-                if str(mode_str).upper() == "REFUND":
-                    try:
-                        from app.services.scheduler import scan_and_build_timeline_for_chat  # type: ignore
-                        await scan_and_build_timeline_for_chat(chat_id=chat_id, user_id=user_id)
-                        logger.info("[BG] timeline scan triggered for chat=%s user=%s", chat_id, user_id)
-                    except Exception:
-                        # helper가 없거나 에러면 전체 스캔으로 폴백(무거우면 주석 처리 가능)
-                        try:
-                            from app.services.scheduler import scan_and_build_timeline  # type: ignore
-                            await scan_and_build_timeline()
-                            logger.info("[BG] full timeline scan fallback executed")
-                        except Exception:
-                            logger.exception("[BG] timeline build trigger failed (chat=%s)", chat_id)
-            except Exception:
-                # 어떤 이유로든 트리거 실패해도 본 파이프라인은 진행
-                logger.exception("[BG] timeline trigger outer failed")
-
-            # Fallback (정적 응답)
-            if static_answer:
-                answer = static_answer.get("answer") if isinstance(static_answer, dict) else static_answer
-                await chatCRUD.update_message_state(db, chat_id, "done")
-                await chatCRUD.update_message_content(db, chat_id, answer)
-                await db.commit()
-                logger.info("[BG] FALLBACK complete: chat=%s mode=%s", chat_id, mode_str)
-                return
-
-            # LLM 호출
-            messages = prep["messages"]
-            body_logger.info(
-                "[BG] Calling LLM. mode=%s, messages_len=%d, product_id(effective)=%s",
-                mode_str,
-                len(messages),
-                product_id,
-            )
-            # LLM에 입력되는 값 로깅
-            body_logger.info("##### [FINAL LLM INPUT] #####\n%s", _format_messages_for_log(messages))
+        # Stage 준비 (classifying → analyzing → searching → building)
+        kwargs = dict(
+            user_id=user_id,
+            text=text,
+            prev_chats=prev_chats or [],
+            chat_id=chat_id,
+            product_id=product_id,
+        )
+        if disease_code:
+            kwargs["disease_code"] = disease_code
+
+        prep = await stage.prepare_llm_request(**kwargs, on_state=_on_state if on_event else None)
+
+        mode = prep["mode"]
+        mode_str = getattr(mode, "name", str(mode))  # e.g. "REFUND"
+        # attachments_used = prep.get("attachments_used", [])
+        static_answer = prep.get("static_answer") or ""
+
+        # -------------------------------
+        # (A) type 업데이트: 어시스턴트 placeholder + 사용자 메시지 + chat.type
+        #     → 스캐너가 user 메시지를 집계할 수 있게 됨 (마지막 flush에서 함께 저장)
+        # -------------------------------
+        turn.set_type(mode_str)
+
+        # Fallback (정적 응답)
+        if static_answer:
+            answer = static_answer.get("answer") if isinstance(static_answer, dict) else static_answer
+            turn.complete(answer)
+            async with AsyncSessionLocal() as db:
+                await turn.flush(db)
+            await message_bus.publish(chat_id, "done", user_id=user_id)
+            await _emit("token", {"text": answer})
+            await _emit("done", {"state": "done", "mode": mode_str})
+            logger.info("[BG] FALLBACK complete: chat=%s mode=%s", chat_id, mode_str)
+            await _trigger_timeline(mode_str, chat_id, user_id)
+            return
+
+        # LLM 호출
+        messages = prep["messages"]
+        body_logger.info(
+            "[BG] Calling LLM. mode=%s, messages_len=%d, product_id(effective)=%s",
+            mode_str,
+            len(messages),
+            product_id,
+        )
+        # LLM에 입력되는 값 로깅
+        body_logger.info("##### [FINAL LLM INPUT] #####\n%s", _format_messages_for_log(messages))
+        if on_event is None:
             answer = await llm_gateway.call_llm(messages)
-
-            # content/state 업데이트
-            await chatCRUD.update_message_content(db, chat_id, answer)
-            await chatCRUD.update_message_state(db, chat_id, "done")
-            await db.commit()
-
-            logger.info("[BG] LLM done: chat=%s mode=%s", chat_id, mode_str)
-
-        except Exception as e:
-            logger.exception("[BG] Error in assistant message processing: %s", e)
-            try:
-                await chatCRUD.update_message_state(db, chat_id, "failed")
-                await db.commit()
-            except Exception:
-                pass
+        else:
+            # 스트리밍: 조각은 바로 내보내고, DB에는 완성본만 1번 저장
+            await message_bus.publish(chat_id, "streaming", user_id=user_id)
+            await _emit("state", {"state": "streaming"})
+            parts: List[str] = []
+            async for delta in llm_gateway.stream_llm(messages):
+                parts.append(delta)
+                await _emit("token", {"text": delta})
+            answer = "".join(parts).strip()
+
+        # content/state/type 저장 (턴 종료 시 커밋 1회)
+        turn.complete(answer)
+        async with AsyncSessionLocal() as db:
+            await turn.flush(db)
+        answer_cache.put(prep.get("answer_cache_key"), mode=mode_str, answer=answer, policy_id=product_id)
+        await message_bus.publish(chat_id, "done", user_id=user_id)
+        await _emit("done", {"state": "done", "mode": mode_str})
+
+        logger.info("[BG] LLM done: chat=%s mode=%s", chat_id, mode_str)
+
+        # (C) REFUND이면 타임라인 즉시 스캔 (type이 저장된 뒤에 실행)
+        await _trigger_timeline(mode_str, chat_id, user_id)
+
+    except Exception as e:
+        logger.exception("[BG] Error in assistant message processing: %s", e)
+        try:
+            async with AsyncSessionLocal() as db:
+                if turn is not None:
+                    await turn.fail(db)
+                else:
+                    await chatCRUD.update_message_state(db, chat_id, "failed")
+                    await db.commit()
+        except Exception:
+            pass
+        await message_bus.publish(chat_id, "failed", user_id=user_id)
+        await _emit("error", {"state": "failed"})
@@ -0,0 +1,190 @@
+# app/services/tokenizer.py
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+# HuggingFace tokenizers (pip install tokenizers) — 없으면 휴리스틱 추정으로 동작
+try:
+    from tokenizers import Tokenizer
+except Exception:
+    Tokenizer = None
+
+try:
+    from app.config import settings
+except Exception:
+    settings = None
+
+logger = logging.getLogger(__name__)
+
+# WATSONX_MODEL_ID(접두어) → 같은 어휘를 쓰는 HF 허브 토크나이저. TOKENIZER_PATH/NAME이 없을 때 기본값
+# meta-llama / mistralai 저장소는 gated → HF_TOKEN 필요 (없으면 TOKENIZER_PATH로 tokenizer.json을 배포)
+_WX_TOKENIZERS = (
+    ("meta-llama/llama-4", "meta-llama/Llama-4-Scout-17B-16E-Instruct"),
+    ("meta-llama/llama-3", "meta-llama/Llama-3.3-70B-Instruct"),  # llama 3.x 공통 128k 어휘
+    ("ibm/granite-3", "ibm-granite/granite-3.3-8b-instruct"),
+    ("mistralai/mistral-large", "mistralai/Mistral-Large-Instruct-2411"),
+)
+
+
+def _default_tokenizer_name() -> str:
+    model_id = str(getattr(settings, "WATSONX_MODEL_ID", "") or os.getenv("WATSONX_MODEL_ID", "")).lower()
+    return next((name for prefix, name in _WX_TOKENIZERS if model_id.startswith(prefix)), "")
+
+
+# watsonx 생성 모델과 호환되는 tokenizer.json 경로(우선) 또는 HF 허브 이름 (없으면 WATSONX_MODEL_ID로 선택)
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "")
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "") or _default_tokenizer_name()
+HF_TOKEN = os.getenv("HF_TOKEN", "")
+CACHE_SIZE = int(os.getenv("TOKENIZER_CACHE_SIZE", "50000"))
+
+_lock = threading.Lock()
+_tok: Optional["Tokenizer"] = None
+_tok_loaded = False
+_cache: "OrderedDict[bytes, int]" = OrderedDict()
+
+# 휴리스틱용 패턴: 한글 음절 / 숫자 / 라틴 단어 / 그 외 기호
+_HANGUL_RE = re.compile(r"[가-힣]")
+_DIGITS_RE = re.compile(r"\d+")
+_LATIN_RE = re.compile(r"[A-Za-z]+")
+_SYMBOL_RE = re.compile(r"[^\s\w]", re.UNICODE)
+
+
+def _from_pretrained(name: str) -> "Tokenizer":
+    if not HF_TOKEN:
+        return Tokenizer.from_pretrained(name)
+    try:
+        return Tokenizer.from_pretrained(name, token=HF_TOKEN)
+    except TypeError:
+        # tokenizers < 0.20
+        return Tokenizer.from_pretrained(name, auth_token=HF_TOKEN)
+
+
+def _load() -> Optional["Tokenizer"]:
+    """토크나이저를 프로세스당 1번만 로드 (실패해도 재시도하지 않음)."""
+    global _tok, _tok_loaded
+    if _tok_loaded:
+        return _tok
+    with _lock:
+        if _tok_loaded:
+            return _tok
+        source = TOKENIZER_PATH if (TOKENIZER_PATH and os.path.exists(TOKENIZER_PATH)) else TOKENIZER_NAME
+        if Tokenizer is not None and source:
+            try:
+                _tok = Tokenizer.from_file(source) if source == TOKENIZER_PATH else _from_pretrained(source)
+            except Exception as e:
+                logger.warning("[TOKENIZER] load failed (%s): %s", source, e)
+                _tok = None
+        if _tok is not None:
+            logger.info("[TOKENIZER] loaded %s", source)
+        else:
+            reason = ("tokenizers not installed" if Tokenizer is None
+                      else "no TOKENIZER_PATH/TOKENIZER_NAME and no default for WATSONX_MODEL_ID" if not source
+                      else "load failed")
+            logger.warning("[TOKENIZER] %s → token budgets use the character heuristic", reason)
+        _tok_loaded = True
+        return _tok
+
+
+def warmup() -> bool:
+    """앱 시작 시 1번 로드 (첫 요청 지연 방지 + 휴리스틱 폴백이면 시작 로그에 경고). 로드 여부 반환."""
+    return _load() is not None
+
+
+def _heuristic(text: str) -> int:
+    """
+    토크나이저가 없을 때의 추정치.
+    - 한글 음절: 음절당 ~1토큰 (llama 계열 대형 어휘 기준)
+    - 숫자: 3자리 묶음당 1토큰
+    - 라틴 단어: 4문자당 1토큰
+    - 기호/구두점: 개당 1토큰
+    """
+    if not text:
+        return 0
+    n = len(_HANGUL_RE.findall(text))
+    n += sum((len(d) + 2) // 3 for d in _DIGITS_RE.findall(text))
+    n += sum((len(w) + 3) // 4 for w in _LATIN_RE.findall(text))
+    n += len(_SYMBOL_RE.findall(text))
+    return max(1, n)
+
+
+def _key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _cache_get(k: bytes) -> Optional[int]:
+    with _lock:
+        v = _cache.get(k)
+        if v is not None:
+            _cache.move_to_end(k)
+        return v
+
+
+def _cache_put(k: bytes, v: int) -> None:
+    with _lock:
+        _cache[k] = v
+        _cache.move_to_end(k)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def count_tokens(text: str) -> int:
+    """텍스트 토큰 수 (로컬 계산, 텍스트 해시로 메모이즈)."""
+    if not text:
+        return 0
+    k = _key(text)
+    v = _cache_get(k)
+    if v is not None:
+        return v
+    tok = _load()
+    v = len(tok.encode(text, add_special_tokens=False).ids) if tok is not None else _heuristic(text)
+    _cache_put(k, v)
+    return v
+
+
+def count_tokens_batch(texts: List[str]) -> List[int]:
+    """여러 텍스트를 한 번에 계산. 캐시 미스만 encode_batch로 처리."""
+    out: List[Optional[int]] = []
+    miss: List[int] = []
+    keys: List[bytes] = []
+    for i, t in enumerate(texts):
+        k = _key(t or "")
+        keys.append(k)
+        v = 0 if not t else _cache_get(k)
+        out.append(v)
+        if v is None:
+            miss.append(i)
+    if miss:
+        tok = _load()
+        if tok is not None:
+            encs = tok.encode_batch([texts[i] for i in miss], add_special_tokens=False)
+            vals = [len(e.ids) for e in encs]
+        else:
+            vals = [_heuristic(texts[i]) for i in miss]
+        for i, v in zip(miss, vals):
+            out[i] = v
+            _cache_put(keys[i], v)
+    return [int(v or 0) for v in out]
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """max_tokens 이내로 자른 앞부분. 잘렸으면 끝에 '…'."""
+    if max_tokens <= 0 or not text:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    tok = _load()
+    if tok is not None:
+        enc = tok.encode(text, add_special_tokens=False)
+        end = enc.offsets[max_tokens - 1][1] if len(enc.offsets) >= max_tokens else len(text)
+        return text[:end] + "…"
+    # 휴리스틱: 비율로 자른 뒤 넘치면 10%씩 줄임
+    cut = int(len(text) * max_tokens / max(1, count_tokens(text)))
+    while cut > 0 and _heuristic(text[:cut]) > max_tokens:
+        cut = int(cut * 0.9)
+    return text[:cut] + "…"
@@ -0,0 +1,55 @@
+// /next-js/app/api/jobs/[job_id]/route.ts
+import { cookies } from 'next/headers';
+import { NextRequest, NextResponse } from 'next/server';
+
+async function getAccessToken(){
+  const cookieStore = await cookies();
+  const token = cookieStore.get('access_token')?.value;
+  if (!token) {
+    return new NextResponse('Unauthorized', { status: 401 });
+  }
+  return token
+}
+
+export const dynamic = 'force-dynamic';
+export const revalidate = 0;
+
+// 업로드 색인 작업 상태 (약관 PDF OCR/색인 진행률) 조회
+export async function GET(request: NextRequest, ctx: { params: Promise<{ job_id: string }> }){
+    try {
+        const tokenOrRes = await getAccessToken();
+        if (tokenOrRes instanceof NextResponse) {
+            return tokenOrRes;
+        }
+        const token = tokenOrRes
+        const { job_id } = await ctx.params;
+        const fastApiResponse = await fetch(`http://API:8000/jobs/${encodeURIComponent(job_id)}`, {
+            method: 'GET',
+            headers: {
+                'Accept': 'application/json',
+                'Authorization': `Bearer ${token}`,
+            },
+            cache: "no-store"
+        });
+        if (!fastApiResponse.ok) {
+            const errorBody = await fastApiResponse.text();
+            console.error('FastAPI backend returned an error:', errorBody);
+            return new NextResponse(errorBody, { status: fastApiResponse.status });
+        }
+
+        const responseBody = await fastApiResponse.json();
+        return NextResponse.json(responseBody, {
+            headers: {
+                'Cache-Control': 'no-store, no-cache, must-revalidate, proxy-revalidate',
+                'Pragma': 'no-cache',
+                'Expires': '0',
+            },
+        })
+    } catch(error){
+        console.error('Error in Next.js API route (/api/jobs/[job_id]):',error)
+        if(error instanceof Error){
+            return new NextResponse(error.message, { status: 500 })
+        }
+        return new NextResponse('An unknown error occured.', { status: 500 })
+    }
+}
@@ -471,7 +471,26 @@ export default function ChatPage() {
     handleFAQSelect(`보험 추천부탁: ${recommendationType}`)
   }
 
+  // 약관 PDF는 서버 작업 큐에서 OCR/색인 → 끝날 때까지 진행률을 보여주며 대기
+  const JOB_POLL_MS = 2000
+  const JOB_MAX_WAIT_MS = 30 * 60 * 1000
+  const waitForIngestJob = async (jobId: string) => {
+    const started = Date.now()
+    while (Date.now() - started < JOB_MAX_WAIT_MS) {
+      const res = await fetch(`/api/jobs/${encodeURIComponent(jobId)}`, { cache: "no-store" })
+      if (!res.ok) throw new Error(`Job status failed: ${res.status}`)
+      const job = await res.json()
+      if (job?.status === "done") return job
+      if (job?.status === "failed") throw new Error(job?.error || "약관 분석에 실패했어요.")
+      const progress = job?.pages_total ? ` (${job.pages_done}/${job.pages_total}쪽)` : ""
+      showBanner(job?.stage === "indexing" ? "약관 색인중..." : `약관 읽는 중...${progress}`, "loading")
+      await new Promise((r) => setTimeout(r, JOB_POLL_MS))
+    }
+    throw new Error("약관 분석이 너무 오래 걸리고 있어요. 잠시 후 다시 시도해 주세요.")
+  }
+
   const handleFileSubmit = async (file: File) => {
+    setIsUploading(true)
     try {
       const fd = new FormData()
       fd.append("file", file)
@@ -482,7 +501,6 @@ export default function ChatPage() {
       const raw = await uploadRes.text()
 
       if (!uploadRes.ok) throw new Error(`Upload failed: ${uploadRes.status}`)
-      showBanner("파일 첨부 완료", "success")
 
       let data: any = raw
       if(ct.includes("application/json")){
@@ -492,6 +510,11 @@ export default function ChatPage() {
           console.warn("Failed to parse JSON, using raw text: ", raw)
         }
       }
+      // 색인이 끝나기 전에 product_id를 붙이면 빈 인덱스로 검색하게 되므로 완료까지 대기
+      if (data?.result_code === "SUCCESS" && data?.job_id) {
+        await waitForIngestJob(data.job_id)
+      }
+      showBanner("파일 첨부 완료", "success")
       if (data?.result_code === "SUCCESS") {
         pendingUploadRef.current = {
           product_id: data.product_id ?? null,
@@ -499,6 +522,7 @@ export default function ChatPage() {
         } 
       }
     } catch (e) {
+      hideBanner()
       window.alert(e)
     } finally {
       setIsUploading(false)